@@ -1,3 +1,4 @@
+import ast
 import uuid
 from utils.utils import log_step, log_error
 from action.executor import run_user_code
@@ -7,37 +8,125 @@ import asyncio
 
 executor = ThreadPoolExecutor(max_workers=3)  # Limit to 3 variants
 
-async def execute_step(step_id, code, ctx, session, multi_mcp, variant_used: str = ""):
-    result = None
-    try:
-        result = await run_user_code(code, multi_mcp, ctx.session_id)
-
-        if session:
-            session.add_execution_snapshot(
-                ExecutionSnapshot(
-                    run_id=str(uuid.uuid4()),
-                    step_id=step_id,
-                    variant_used=variant_used,
-                    code=code,
-                    status=result.get("status", "error"),
-                    result=result.get("result"),
-                    error=result.get("error"),
-                    execution_time=result.get("execution_time", ""),
-                    total_time=result.get("total_time", ""),
-                )
+def record_execution(session, step_id, variant_used, code, result):
+    if session:
+        session.add_execution_snapshot(
+            ExecutionSnapshot(
+                run_id=str(uuid.uuid4()),
+                step_id=step_id,
+                variant_used=variant_used,
+                code=code,
+                status=result.get("status", "error"),
+                result=result.get("result"),
+                error=result.get("error"),
+                execution_time=result.get("execution_time", ""),
+                total_time=result.get("total_time", ""),
             )
-    except Exception as e:
-        result = {"status": "error", "error": str(e)}
+        )
+
 
+def apply_result(step_id, ctx, result):
     if result.get("status") == "success":
         ctx.update_step_result(step_id, result["result"])
         ctx.mark_step_completed(step_id)
     else:
         ctx.mark_step_failed(step_id, result.get("error", "Unknown error"))
 
+
+async def execute_step(step_id, code, ctx, session, multi_mcp, variant_used: str = ""):
+    result = None
+    try:
+        result = await run_user_code(code, multi_mcp, ctx.session_id)
+        record_execution(session, step_id, variant_used, code, result)
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+
+    apply_result(step_id, ctx, result)
     return result
 
 
+def step_variants(step_id, code_variants, ctx):
+    """(variant, code) for the step, the suffixes that have won most often in this session first."""
+    return [
+        (f"CODE_{step_id}{suffix}", code_variants[f"CODE_{step_id}{suffix}"])
+        for suffix in ctx.preferred_suffixes()
+        if f"CODE_{step_id}{suffix}" in code_variants
+    ]
+
+
+def _names_parallel_tool(entry) -> bool:
+    """True if a parallel() argument is a ("tool", *args) tuple with a literal tool name."""
+    return (
+        isinstance(entry, (ast.Tuple, ast.List)) and bool(entry.elts)
+        and isinstance(entry.elts[0], ast.Constant) and isinstance(entry.elts[0].value, str)
+    )
+
+
+def calls_stateful_tool(code, multi_mcp) -> bool:
+    """True unless every tool `code` could call is raceable.
+
+    Tool names count wherever they appear: bare or attribute calls,
+    references passed around, string names given to parallel(). Code that
+    does not parse, a computed callee, or a parallel() entry whose tool
+    name is not a literal cannot be resolved and counts as stateful.
+    """
+    if all(multi_mcp.is_raceable(tool.name) for tool in multi_mcp.get_all_tools()):
+        return False
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True
+
+    def stateful(name) -> bool:
+        return isinstance(name, str) and not multi_mcp.is_raceable(name)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and stateful(node.id):
+            return True
+        if isinstance(node, ast.Attribute) and stateful(node.attr):
+            return True
+        if isinstance(node, ast.Constant) and stateful(node.value):
+            return True
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, (ast.Name, ast.Attribute)):
+                return True
+            if isinstance(node.func, ast.Name) and node.func.id == "parallel":
+                if not all(_names_parallel_tool(arg) for arg in node.args):
+                    return True
+    return False
+
+
+async def race_variants(step_id, variants, ctx, session, multi_mcp):
+    """Run all variants at once on this loop; the first success wins and the rest are cancelled."""
+    tasks = {
+        asyncio.create_task(run_user_code(code, multi_mcp, ctx.session_id)): (variant, code)
+        for variant, code in variants
+    }
+    pending, winner, result = set(tasks), None, None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                variant, code = tasks[task]
+                try:
+                    outcome = task.result()
+                except Exception as e:
+                    outcome = {"status": "error", "error": str(e)}
+                record_execution(session, step_id, variant, code, outcome)
+                if winner is None and outcome.get("status") == "success":
+                    winner, result = variant, outcome
+                elif winner is None:
+                    log_error(f"❌ Variant {variant} failed: {outcome.get('error')}")
+                    result = outcome
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if pending:
+        log_step(f"Cancelled {', '.join(sorted(tasks[t][0] for t in pending))}", symbol="✂️")
+    return winner, result
+
+
 def run_step_in_thread(step_id, code, ctx, session, multi_mcp, variant):
     return asyncio.run(execute_step(step_id, code, ctx, session, multi_mcp, variant_used=variant))
 
@@ -79,25 +168,36 @@ async def execute_step_with_mode(step_id, code_variants, ctx, mode, session, mul
 
         return {"status": "error", "results": all_results, "error": "All variants failed."}
 
-    else:  # fallback mode
-        result = None
-        for suffix in ["A", "B", "C"]:
-            variant = f"CODE_{step_id}{suffix}"
-            if variant not in code_variants:
-                continue
-            code = code_variants[variant]
-            try:
-                result = await execute_step(step_id, code, ctx, session, multi_mcp, variant_used=variant)
-                if result.get("status") == "success":
-                    log_step(f"✅ Variant {variant} succeeded.", symbol="✅")
-                    return result
-                else:
-                    log_error(f"❌ Variant {variant} failed: {result.get('error')}")
-            except Exception as e:
-                log_error(f"❌ Exception in variant {variant}: {e}")
-
-        log_error(f"❌ All variants failed during fallback execution for step {step_id}")
-        if result and result.get("status") == "error":
-            log_error(f"↳ Error: {result.get('error')}")
-
-        return {"status": "error", "error": "All fallback variants failed."}
+    if mode == "race":
+        variants = step_variants(step_id, code_variants, ctx)
+        if len(variants) > 1 and any(calls_stateful_tool(code, multi_mcp) for _, code in variants):
+            log_step(f"Step {step_id} uses stateful tools; running its variants one at a time", symbol="↪")
+        elif variants:
+            winner, result = await race_variants(step_id, variants, ctx, session, multi_mcp)
+            apply_result(step_id, ctx, result)
+            if winner:
+                log_step(f"✅ Variant {winner} won the race.", symbol="✅")
+                ctx.record_variant_win(step_id, winner)
+                return {**result, "variant": winner}
+            log_error(f"❌ All variants failed during race execution for step {step_id}")
+            return {"status": "error", "error": "All raced variants failed."}
+
+    # fallback mode (and race steps that touch stateful tools)
+    result = None
+    for variant, code in step_variants(step_id, code_variants, ctx):
+        try:
+            result = await execute_step(step_id, code, ctx, session, multi_mcp, variant_used=variant)
+            if result.get("status") == "success":
+                log_step(f"✅ Variant {variant} succeeded.", symbol="✅")
+                ctx.record_variant_win(step_id, variant)
+                return result
+            else:
+                log_error(f"❌ Variant {variant} failed: {result.get('error')}")
+        except Exception as e:
+            log_error(f"❌ Exception in variant {variant}: {e}")
+
+    log_error(f"❌ All variants failed during fallback execution for step {step_id}")
+    if result and result.get("status") == "error":
+        log_error(f"↳ Error: {result.get('error')}")
+
+    return {"status": "error", "error": "All fallback variants failed."}
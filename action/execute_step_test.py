@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from action.execute_step import calls_stateful_tool
+
+
+class StubMultiMCP:
+    def __init__(self, stateful=("go_to_url", "click_element_by_index")):
+        self.stateful = set(stateful)
+        self.tools = [SimpleNamespace(name=n) for n in ("search_web", "fetch_page", *self.stateful)]
+
+    def get_all_tools(self):
+        return self.tools
+
+    def is_raceable(self, tool_name):
+        return tool_name not in self.stateful
+
+
+def test_plain_raceable_code():
+    code = 'urls = search_web("f22")\npage = fetch_page(urls[0])\nreturn {"page_0A": page.strip()}'
+    assert not calls_stateful_tool(code, StubMultiMCP())
+
+
+def test_bare_and_attribute_calls():
+    assert calls_stateful_tool('go_to_url("https://example.com")', StubMultiMCP())
+    assert calls_stateful_tool('browser.click_element_by_index(3)', StubMultiMCP())
+
+
+def test_references_and_parallel_names():
+    multi_mcp = StubMultiMCP()
+    assert calls_stateful_tool('step = go_to_url\nstep("https://example.com")', multi_mcp)
+    assert calls_stateful_tool('parallel(("search_web", "a"), ("go_to_url", "https://example.com"))', multi_mcp)
+    assert not calls_stateful_tool('parallel(("search_web", "a"), ["fetch_page", "b"])', multi_mcp)
+
+
+def test_unresolvable_calls_are_not_raced():
+    multi_mcp = StubMultiMCP()
+    assert calls_stateful_tool('name = pick()\nparallel((name, "x"))', multi_mcp)
+    assert calls_stateful_tool('parallel(*calls)', multi_mcp)
+    assert calls_stateful_tool('tools["search_web"]("x")', multi_mcp)
+    assert calls_stateful_tool('return search_web("unterminated', multi_mcp)
+
+
+def test_everything_raceable_skips_the_scan():
+    assert not calls_stateful_tool('parallel(*calls)', StubMultiMCP(stateful=()))
+
+
+if __name__ == "__main__":
+    test_plain_raceable_code()
+    test_bare_and_attribute_calls()
+    test_references_and_parallel_names()
+    test_unresolvable_calls_are_not_raced()
+    test_everything_raceable_skips_the_scan()
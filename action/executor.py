@@ -1,11 +1,19 @@
 import ast
 import asyncio
+import atexit
+import copy
 import time
 import builtins
 import textwrap
 import re
 import os
 import json
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from types import CodeType, MappingProxyType
 from datetime import datetime
 from pathlib import Path
 import traceback
@@ -46,6 +54,10 @@ SAFE_BUILTINS = [
 
 MAX_FUNCTIONS = 20
 TIMEOUT_PER_FUNCTION = 50
+CODE_CACHE_SIZE = 256        # compiled variants kept per process
+SANDBOX_STATE_DIR = "action/sandbox_state"
+WRITE_BEHIND_DELAY = 2.0     # seconds between a session-vars update and its write to disk
+MAX_CACHED_SESSIONS = 256    # session-vars dicts kept in memory once flushed
 
 class KeywordStripper(ast.NodeTransformer):
     """Rewrite all function calls to remove keyword args and keep only values as positional."""
@@ -83,8 +95,9 @@ def fix_unterminated_triple_quotes(code: str) -> str:
     return code
 
 
-def build_safe_globals(mcp_funcs: dict, multi_mcp=None, session_id: str = None) -> dict:
-    safe_globals = {
+def build_base_sandbox(mcp_funcs: dict, multi_mcp=None) -> MappingProxyType:
+    """The per-tool-set part of the sandbox globals: safe builtins, allowed modules, tool proxies, parallel()."""
+    base = {
         "__builtins__": {
             k: getattr(builtins, k) for k in SAFE_BUILTINS
         },
@@ -92,18 +105,29 @@ def build_safe_globals(mcp_funcs: dict, multi_mcp=None, session_id: str = None)
     }
 
     for module in ALLOWED_MODULES:
-        safe_globals[module] = __import__(module)
+        base[module] = __import__(module)
+
+    if multi_mcp:
+        async def parallel(*tool_calls):
+            coros = [multi_mcp.function_wrapper(tool_name, *args) for tool_name, *args in tool_calls]
+            return await asyncio.gather(*coros)
+        base["parallel"] = parallel
+
+    return MappingProxyType(base)
+
+
+def build_safe_globals(mcp_funcs: dict, multi_mcp=None, session_id: str = None, base: MappingProxyType = None) -> dict:
+    base = base if base is not None else build_base_sandbox(mcp_funcs, multi_mcp)
+    safe_globals = dict(base)
+    safe_globals["__builtins__"] = dict(base["__builtins__"])  # user code never touches the shared copy
 
     safe_globals["final_answer"] = lambda x: safe_globals.setdefault("result_holder", x)
 
     if session_id:
         safe_globals.update(load_session_vars(session_id))
 
-    if multi_mcp:
-        async def parallel(*tool_calls):
-            coros = [multi_mcp.function_wrapper(tool_name, *args) for tool_name, *args in tool_calls]
-            return await asyncio.gather(*coros)
-        safe_globals["parallel"] = parallel
+    if "parallel" in base:
+        safe_globals["parallel"] = base["parallel"]
 
     # Allow both direct access (`urls`) and schema-style (`globals_schema.get("urls", "")`)
     safe_globals["globals_schema"] = {
@@ -113,30 +137,107 @@ def build_safe_globals(mcp_funcs: dict, multi_mcp=None, session_id: str = None)
     return safe_globals
 
 
-def save_session_vars(session_id: str, variables: dict):
-    os.makedirs("action/sandbox_state", exist_ok=True)
-    path = f"action/sandbox_state/{session_id}.json"
-
-    # Load existing vars if any
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            existing = json.load(f)
-    except FileNotFoundError:
-        existing = {}
+_base_sandboxes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def base_sandbox_for(multi_mcp) -> tuple[frozenset, MappingProxyType]:
+    """(tool-set version, base sandbox) for a MultiMCP, rebuilt only when its tool list changes."""
+    tools = [tool.name for tool in multi_mcp.get_all_tools()]
+    version = frozenset(tools)
+    cached = _base_sandboxes.get(multi_mcp)
+    if cached is None or cached[0] != version:
+        tool_funcs = {name: make_tool_proxy(name, multi_mcp) for name in tools}
+        cached = _base_sandboxes[multi_mcp] = (version, build_base_sandbox(tool_funcs, multi_mcp))
+    return cached
+
+
+class SessionVarStore:
+    """Session variables kept in memory, written behind to action/sandbox_state/<session_id>.json.
+
+    Updates are merged in memory and flushed by a timer WRITE_BEHIND_DELAY
+    later (and at exit), so a step never waits on the JSON round trip.
+    Loads hand out deep copies: code that mutates a variable in place
+    does not change the stored value unless it returns it. Values must be
+    JSON-serializable: save raises TypeError for anything else, as the
+    synchronous json.dump did, rather than failing later in the flush.
+    """
+
+    def __init__(self, directory: str = SANDBOX_STATE_DIR, delay: float = WRITE_BEHIND_DELAY,
+                 max_sessions: int = MAX_CACHED_SESSIONS):
+        self.directory = directory
+        self.delay = delay
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self.dirty: set = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _vars(self, session_id: str) -> dict:
+        if session_id not in self.sessions:
+            try:
+                with open(self._path(session_id), "r", encoding="utf-8") as f:
+                    self.sessions[session_id] = json.load(f)
+            except FileNotFoundError:
+                self.sessions[session_id] = {}
+        self.sessions.move_to_end(session_id)
+        return self.sessions[session_id]
+
+    def load(self, session_id: str) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._vars(session_id))
+
+    def save(self, session_id: str, variables: dict):
+        json.dumps(variables)  # fail the step now, not the background flush
+        with self._lock:
+            self._vars(session_id).update(copy.deepcopy(variables))
+            self.dirty.add(session_id)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        # The timer and atexit flushes can overlap: taking turns keeps an older
+        # snapshot from replacing a newer one, and each write gets its own temp file
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending = {sid: json.dumps(self.sessions[sid], indent=2, ensure_ascii=False) for sid in self.dirty}
+            self.dirty.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            os.makedirs(self.directory, exist_ok=True)
+        for session_id, text in pending.items():
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f"{session_id}.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self._path(session_id))
+        with self._lock:
+            for session_id in list(self.sessions):
+                if len(self.sessions) <= self.max_sessions:
+                    break
+                if session_id not in self.dirty:
+                    del self.sessions[session_id]
+
+
+session_vars = SessionVarStore()
 
-    # Merge
-    merged = {**existing, **variables}
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(merged, f, indent=2, ensure_ascii=False)
+def save_session_vars(session_id: str, variables: dict):
+    session_vars.save(session_id, variables)
 
 
 def load_session_vars(session_id: str) -> dict:
-    try:
-        with open(f"action/sandbox_state/{session_id}.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    return session_vars.load(session_id)
 
 
 def count_function_calls(code: str) -> int:
@@ -149,6 +250,75 @@ def make_tool_proxy(tool_name: str, mcp):
         return await mcp.function_wrapper(tool_name, *args)
     return _tool_fn
 
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def compile_user_code(code: str, tool_names: frozenset) -> tuple[CodeType, int]:
+    """(code object defining async __main, function-call count); cached per (code, tool set).
+
+    The same variant text recurs across retries, raced variants and
+    sessions, so the parse + AST rewrite + compile runs once per tool set.
+    """
+    func_count = count_function_calls(code)
+    cleaned_code = fix_unterminated_triple_quotes(textwrap.dedent(code.strip()))
+    tree = ast.parse(cleaned_code)
+
+    # ─── AST Transformations ─────────────────────────────────────
+    tree = KeywordStripper().visit(tree)
+    tree = AwaitTransformer(set(tool_names)).visit(tree)
+
+    # Rewrite return <varname> → return {"varname": varname}
+    new_body = []
+    return_found = False
+    for node in tree.body:
+        if isinstance(node, ast.Return):
+            return_found = True
+            if isinstance(node.value, ast.Name):
+                varname = node.value.id
+                new_body.append(
+                    ast.Return(
+                        value=ast.Dict(
+                            keys=[ast.Constant(value=varname)],
+                            values=[ast.Name(id=varname, ctx=ast.Load())]
+                        )
+                    )
+                )
+            else:
+                new_body.append(node)
+        else:
+            new_body.append(node)
+
+    # If return is missing but 'result' exists, add `return result`
+    has_result_var = any(
+        isinstance(node, ast.Assign)
+        and any(isinstance(t, ast.Name) and t.id == "result" for t in node.targets)
+        for node in new_body
+    )
+    result_vars = {
+        node.targets[0].id
+        for node in tree.body
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)
+    }
+
+    if not return_found and "result" in result_vars:
+        new_body.append(ast.Return(value=ast.Name(id="result", ctx=ast.Load())))
+
+
+    ast.fix_missing_locations(tree)
+    tree.body = new_body
+    ast.fix_missing_locations(tree)
+
+    # ─── Wrap as async def __main() ──────────────────────────────
+    func_def = ast.AsyncFunctionDef(
+        name="__main",
+        args=ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=tree.body,
+        decorator_list=[]
+    )
+    wrapper = ast.Module(body=[func_def], type_ignores=[])
+    ast.fix_missing_locations(wrapper)
+
+    return compile(wrapper, filename="<user_code>", mode="exec"), func_count
+
+
 async def run_user_code(code: str, multi_mcp, session_id: str = "default_session") -> dict:
     start_time = time.perf_counter()
     start_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -157,7 +327,8 @@ async def run_user_code(code: str, multi_mcp, session_id: str = "default_session
         return isinstance(value, (str, int, float, bool, type(None), list, dict))
 
     try:
-        func_count = count_function_calls(code)
+        tool_names, base = base_sandbox_for(multi_mcp)
+        compiled, func_count = compile_user_code(code, tool_names)
         if func_count > MAX_FUNCTIONS:
             return {
                 "status": "error",
@@ -166,76 +337,11 @@ async def run_user_code(code: str, multi_mcp, session_id: str = "default_session
                 "total_time": str(round(time.perf_counter() - start_time, 3))
             }
 
-        tool_funcs = {
-            tool.name: make_tool_proxy(tool.name, multi_mcp)
-            for tool in multi_mcp.get_all_tools()
-        }
-
-        sandbox = build_safe_globals(tool_funcs, multi_mcp, session_id)
+        sandbox = build_safe_globals({}, multi_mcp, session_id, base=base)
         local_vars = {}
 
         log_step(f"[CODE:]: {code}", symbol="🐍")
 
-        cleaned_code = fix_unterminated_triple_quotes(textwrap.dedent(code.strip()))
-        tree = ast.parse(cleaned_code)
-
-        # ─── AST Transformations ─────────────────────────────────────
-        tree = KeywordStripper().visit(tree)
-        tree = AwaitTransformer(set(tool_funcs)).visit(tree)
-
-        # Rewrite return <varname> → return {"varname": varname}
-        new_body = []
-        return_found = False
-        for node in tree.body:
-            if isinstance(node, ast.Return):
-                return_found = True
-                if isinstance(node.value, ast.Name):
-                    varname = node.value.id
-                    new_body.append(
-                        ast.Return(
-                            value=ast.Dict(
-                                keys=[ast.Constant(value=varname)],
-                                values=[ast.Name(id=varname, ctx=ast.Load())]
-                            )
-                        )
-                    )
-                else:
-                    new_body.append(node)
-            else:
-                new_body.append(node)
-
-        # If return is missing but 'result' exists, add `return result`
-        has_result_var = any(
-            isinstance(node, ast.Assign)
-            and any(isinstance(t, ast.Name) and t.id == "result" for t in node.targets)
-            for node in new_body
-        )
-        result_vars = {
-            node.targets[0].id
-            for node in tree.body
-            if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)
-        }
-
-        if not return_found and "result" in result_vars:
-            new_body.append(ast.Return(value=ast.Name(id="result", ctx=ast.Load())))
-
-
-        ast.fix_missing_locations(tree)
-        tree.body = new_body
-        ast.fix_missing_locations(tree)
-
-        # ─── Wrap as async def __main() ──────────────────────────────
-        func_def = ast.AsyncFunctionDef(
-            name="__main",
-            args=ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
-            body=tree.body,
-            decorator_list=[]
-        )
-        wrapper = ast.Module(body=[func_def], type_ignores=[])
-        ast.fix_missing_locations(wrapper)
-        
-
-        compiled = compile(wrapper, filename="<user_code>", mode="exec")
         exec(compiled, sandbox, local_vars)
 
         # ─── Execute and collect result ──────────────────────────────
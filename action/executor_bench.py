@@ -0,0 +1,97 @@
+"""Per-step executor overhead: run_user_code with instant stub tools.
+
+"cold" clears the compile cache and base sandbox and flushes session vars
+to disk on every call, which is the work each step used to repeat (parse,
+AST rewrite, compile, module imports, tool proxies, JSON round trip).
+"warm" is the steady state: a variant or tool set seen before, session
+vars in memory. Runs in a scratch directory.
+
+    python action/executor_bench.py --tools 40 --iterations 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from action import executor
+
+VARIANT = """urls = search_tool_0('F22 Raptor engine thrust')
+previous = globals_schema.get("summary_0A", "")
+if urls:
+    raw = fetch_tool_1(urls[0])
+    summary = summarize_tool_2(raw, 'engine thrust')
+else:
+    summary = previous
+return { "summary_0A": summary, "urls_0A": urls }
+"""
+
+
+class StubMultiMCP:
+    """Instant tools named <kind>_tool_<i>, each taking positional args."""
+
+    def __init__(self, tools: int):
+        kinds = ["search", "fetch", "summarize", "lookup"]
+        self.tools = [
+            SimpleNamespace(name=f"{kinds[i % len(kinds)]}_tool_{i}", inputSchema={"properties": {"a": {}, "b": {}}})
+            for i in range(tools)
+        ]
+
+    def get_all_tools(self):
+        return self.tools
+
+    async def function_wrapper(self, tool_name, *args):
+        return [f"https://example.com/{tool_name}"] if tool_name.startswith("search") else f"{tool_name} text"
+
+
+async def measure(multi_mcp, iterations: int, cold: bool) -> np.ndarray:
+    timings = []
+    for i in range(iterations):
+        if cold:
+            executor.compile_user_code.cache_clear()
+            executor._base_sandboxes.clear()
+            executor.session_vars.flush()
+            executor.session_vars.sessions.clear()
+        start = time.perf_counter()
+        result = await executor.run_user_code(VARIANT, multi_mcp, session_id="bench-session")
+        timings.append(time.perf_counter() - start)
+        assert result["status"] == "success", result
+    return np.array(timings) * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=40)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix="executor_bench_"))
+    cwd = os.getcwd()
+    os.chdir(scratch)  # action/sandbox_state is relative
+    try:
+        multi_mcp = StubMultiMCP(args.tools)
+        print(f"{args.tools} tools, {args.iterations} calls per mode")
+        print(f"{'mode':<6} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+        for mode in ("cold", "warm"):
+            with contextlib.redirect_stdout(io.StringIO()):  # executor logs
+                await measure(multi_mcp, 5, mode == "cold")  # warm-up
+                us = await measure(multi_mcp, args.iterations, mode == "cold")
+            print(f"{mode:<6} {us.mean():9.0f} {np.percentile(us, 50):9.0f} {np.percentile(us, 99):9.0f}")
+        executor.session_vars.flush()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
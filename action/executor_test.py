@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from action import executor
+from action.executor import SessionVarStore, base_sandbox_for, compile_user_code, run_user_code
+
+
+class StubMultiMCP:
+    def __init__(self, *names):
+        self.tools = [SimpleNamespace(name=n) for n in names]
+        self.calls = []
+
+    def get_all_tools(self):
+        return self.tools
+
+    async def function_wrapper(self, tool_name, *args):
+        self.calls.append((tool_name, *args))
+        return f"{tool_name}:{','.join(map(str, args))}"
+
+
+def test_compile_cache_is_keyed_by_code_and_tool_set():
+    compile_user_code.cache_clear()
+    code = "page = fetch_page('a')\nreturn page"
+    first, count = compile_user_code(code, frozenset({"fetch_page"}))
+    assert compile_user_code(code, frozenset({"fetch_page"}))[0] is first
+    assert count == 1
+    assert compile_user_code(code, frozenset({"fetch_page", "search_web"}))[0] is not first
+    info = compile_user_code.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_base_sandbox_rebuilt_only_when_tools_change():
+    multi_mcp = StubMultiMCP("fetch_page")
+    version, base = base_sandbox_for(multi_mcp)
+    assert base_sandbox_for(multi_mcp)[1] is base
+    multi_mcp.tools.append(SimpleNamespace(name="search_web"))
+    new_version, new_base = base_sandbox_for(multi_mcp)
+    assert new_version == frozenset({"fetch_page", "search_web"}) and new_base is not base
+    assert "search_web" in new_base and "search_web" not in base
+
+
+def test_cached_code_runs_with_fresh_sandboxes():
+    multi_mcp = StubMultiMCP("fetch_page")
+    code = "page = fetch_page(globals_schema.get('n', 0))\nreturn {'n': 1, 'page': page}"
+    with tempfile.TemporaryDirectory() as tmp:
+        store, executor.session_vars = executor.session_vars, SessionVarStore(tmp, delay=60)
+        try:
+            first = asyncio.run(run_user_code(code, multi_mcp, session_id="s1"))
+            second = asyncio.run(run_user_code(code, multi_mcp, session_id="s1"))
+            other = asyncio.run(run_user_code(code, multi_mcp, session_id="s2"))
+        finally:
+            executor.session_vars = store
+    assert first["result"] == {"n": 1, "page": "fetch_page:0"}
+    assert second["result"]["page"] == "fetch_page:1"  # sees s1's saved variables
+    assert other["result"]["page"] == "fetch_page:0"   # but s2 does not
+
+
+def test_session_vars_are_written_behind():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionVarStore(tmp, delay=0.05)
+        store.save("s1", {"urls": ["a"]})
+        path = os.path.join(tmp, "s1.json")
+        assert not os.path.exists(path)
+        assert store.load("s1") == {"urls": ["a"]}
+
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == {"urls": ["a"]}
+        assert not store.dirty
+
+        store.sessions.clear()
+        assert SessionVarStore(tmp).load("s1") == {"urls": ["a"]}  # reloaded from disk
+
+
+def test_session_vars_are_copied_in_and_out():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionVarStore(tmp, delay=60)
+        urls = ["a"]
+        store.save("s1", {"urls": urls})
+        urls.append("b")
+        loaded = store.load("s1")
+        loaded["urls"].append("c")
+        assert store.load("s1") == {"urls": ["a"]}
+        store.flush()
+
+
+def test_flush_evicts_clean_sessions_beyond_the_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionVarStore(tmp, delay=60, max_sessions=2)
+        for i in range(4):
+            store.save(f"s{i}", {"i": i})
+        store.flush()
+        assert list(store.sessions) == ["s2", "s3"]
+        assert store.load("s0") == {"i": 0}
+
+
+
+def test_non_json_values_fail_the_step():
+    multi_mcp = StubMultiMCP()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionVarStore(tmp, delay=60)
+        store.save("s1", {"n": 1})
+        try:
+            store.save("s1", {"n": 2, "seen": {"a", "b"}})
+            assert False, "a set is not JSON"
+        except TypeError:
+            pass
+        assert store.load("s1") == {"n": 1}  # nothing from the bad save was merged
+
+        saved, executor.session_vars = executor.session_vars, store
+        try:
+            out = asyncio.run(run_user_code("return {'seen': [{1, 2}]}", multi_mcp, session_id="s1"))
+        finally:
+            executor.session_vars = saved
+        assert out["status"] == "error" and out["error"].startswith("TypeError")
+        store.flush()
+        with open(os.path.join(tmp, "s1.json"), encoding="utf-8") as f:
+            assert json.load(f) == {"n": 1}
+
+
+def test_overlapping_flushes_take_turns_with_their_own_temp_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionVarStore(tmp, delay=60)
+        store.save("s1", {"n": 0})
+        opened = []
+        other = threading.Thread(target=lambda: (store.save("s1", {"n": 1}), store.flush()))
+        real_mkstemp = executor.tempfile.mkstemp
+
+        def mkstemp(**kwargs):
+            fd, path = real_mkstemp(**kwargs)
+            opened.append(path)
+            if len(opened) == 1:
+                other.start()  # the atexit flush starts while the timer flush is writing
+                other.join(0.2)
+                assert other.is_alive()  # and waits for it
+            return fd, path
+
+        executor.tempfile.mkstemp = mkstemp
+        try:
+            store.flush()
+            other.join(5)
+        finally:
+            executor.tempfile.mkstemp = real_mkstemp
+        assert len(set(opened)) == 2
+        assert all(Path(p).parent == Path(tmp) and Path(p).name.startswith("s1.") for p in opened)
+        assert sorted(os.listdir(tmp)) == ["s1.json"]
+        with open(os.path.join(tmp, "s1.json"), encoding="utf-8") as f:
+            assert json.load(f) == {"n": 1}  # the newer snapshot wins
+
+
+if __name__ == "__main__":
+    test_compile_cache_is_keyed_by_code_and_tool_set()
+    test_base_sandbox_rebuilt_only_when_tools_change()
+    test_cached_code_runs_with_fresh_sandboxes()
+    test_session_vars_are_written_behind()
+    test_session_vars_are_copied_in_and_out()
+    test_flush_evicts_clean_sessions_beyond_the_limit()
+    test_non_json_values_fail_the_step()
+    test_overlapping_flushes_take_turns_with_their_own_temp_files()
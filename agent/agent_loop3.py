@@ -1,5 +1,9 @@
+import asyncio
+import copy
 import uuid
+from collections import defaultdict
 from datetime import datetime
+from typing import Optional
 
 from perception.perception import Perception, build_perception_input
 from decision.decision import Decision, build_decision_input
@@ -7,7 +11,7 @@ from summarization.summarizer import Summarizer
 from agent.contextManager import ContextManager
 from agent.agentSession import AgentSession
 from memory.memory_search import MemorySearch
-from action.execute_step import execute_step_with_mode
+from action.execute_step import calls_stateful_tool, execute_step_with_mode
 from utils.utils import log_step, log_error, save_final_plan, log_json_block
 
 class Route:
@@ -18,18 +22,35 @@ class StepType:
     ROOT = "ROOT"
     CODE = "CODE"
 
+MAX_PARALLEL_STEPS = 3  # independent plan steps executed together in one wave
+EXECUTION_MODE = "race"  # "race" | "fallback" | "parallel", see execute_step_with_mode
+
 
 class AgentLoop:
-    def __init__(self, perception_prompt, decision_prompt, summarizer_prompt, multi_mcp, strategy="exploratory"):
+    def __init__(self, perception_prompt, decision_prompt, summarizer_prompt, multi_mcp, strategy="exploratory",
+                 max_parallel_steps=MAX_PARALLEL_STEPS, execution_mode=EXECUTION_MODE):
         self.perception = Perception(perception_prompt)
         self.decision = Decision(decision_prompt, multi_mcp)
         self.summarizer = Summarizer(summarizer_prompt)
         self.multi_mcp = multi_mcp
         self.strategy = strategy
+        self.max_parallel_steps = max_parallel_steps
+        self.execution_mode = execution_mode
         self.status: str = "in_progress"
 
-    async def run(self, query: str):
-        self._initialize_session(query)
+    async def run(self, query: str, session_id: Optional[str] = None):
+        # Per-run state (ctx, session, p_out, code_variants, ...) lives on a
+        # fresh copy, so concurrent runs on one instance never see each other's.
+        return await self.fork()._run(query, session_id)
+
+    def fork(self) -> "AgentLoop":
+        """A run-scoped copy sharing perception, decision, summarizer and multi_mcp."""
+        run = copy.copy(self)
+        run.status = "in_progress"
+        return run
+
+    async def _run(self, query: str, session_id: Optional[str] = None):
+        await self._initialize_session(query, session_id)
         await self._run_initial_perception()
 
         if self._should_early_exit():
@@ -47,12 +68,13 @@ class AgentLoop:
 
         return await self._handle_failure()
 
-    def _initialize_session(self, query):
-        self.session_id = str(uuid.uuid4())
+    async def _initialize_session(self, query, session_id: Optional[str] = None):
+        self.session_id = session_id or str(uuid.uuid4())
         self.ctx = ContextManager(self.session_id, query)
         self.session = AgentSession(self.session_id, query)
         self.query = query
-        self.memory = MemorySearch().search_memory(query)
+        # Index refresh, NER and embedding are blocking; keep them off the event loop
+        self.memory = await asyncio.to_thread(lambda: MemorySearch().search_memory(query))
         self.ctx.globals = {"memory": self.memory}
 
     async def _run_initial_perception(self):
@@ -84,6 +106,7 @@ class AgentLoop:
 
         self.code_variants = d_out["code_variants"]
         self.next_step_id = d_out["next_step_id"]
+        self.plan_edges = d_out["plan_graph"].get("edges", [])
 
         for node in d_out["plan_graph"]["nodes"]:
             self.ctx.add_step(
@@ -97,7 +120,6 @@ class AgentLoop:
 
     async def _execute_steps_loop(self):
         tracker = StepExecutionTracker(max_steps=12, max_retries=5)
-        AUTO_EXECUTION_MODE = "fallback"
 
         while tracker.should_continue():
             tracker.increment()
@@ -108,38 +130,41 @@ class AgentLoop:
                 self.next_step_id = self._pick_next_step(self.ctx)
                 continue
 
-            retry_step_id = tracker.retry_step_id(self.next_step_id)
-            success = await execute_step_with_mode(
-                retry_step_id,
-                self.code_variants,
-                self.ctx,
-                AUTO_EXECUTION_MODE,
-                self.session,
-                self.multi_mcp
-            )
-
-            if not success:
-                self.ctx.mark_step_failed(self.next_step_id, "All fallback variants failed")
-                tracker.record_failure(self.next_step_id)
-
-                if tracker.has_exceeded_retries(self.next_step_id):
-                    if self.next_step_id == StepType.ROOT:
-                        if tracker.register_root_failure():
-                            log_error("🚨 ROOT failed too many times. Halting execution.")
-                            return
-                    else:
-                        log_error(f"⚠️ Step {self.next_step_id} failed too many times. Forcing replan.")
-                        self.next_step_id = StepType.ROOT
-                continue
-
-            self.ctx.mark_step_completed(self.next_step_id)
+            # Run next_step_id together with any independent pending steps the
+            # decision also wrote variants for; perception then sees the whole wave.
+            wave = self._next_wave()
+            if len(wave) > 1:
+                log_step(f"⚡ Running independent steps {', '.join(wave)} concurrently")
+            results = await asyncio.gather(*(
+                execute_step_with_mode(
+                    step_id,
+                    self.code_variants,
+                    self.ctx,
+                    self.execution_mode,
+                    self.session,
+                    self.multi_mcp
+                )
+                for step_id in wave
+            ))
+
+            for step_id, result in zip(wave, results):
+                if result.get("status") == "success":
+                    self.ctx.mark_step_completed(step_id)
+                else:
+                    tracker.record_failure(step_id)
+
+            exhausted = [step_id for step_id in wave if tracker.has_exceeded_retries(step_id)]
+            if exhausted:
+                log_error(f"🚨 Step {', '.join(exhausted)} failed {tracker.max_retries} times. Halting execution.")
+                return
 
-            # 🔍 Perception after execution
+            # 🔍 Perception once per wave
             p_input = build_perception_input(self.query, self.memory, self.ctx, snapshot_type="step_result")
             self.p_out = await self.perception.run(p_input, session=self.session)
 
-            self.ctx.attach_perception(self.next_step_id, self.p_out)
-            log_json_block(f"📌 Perception output ({self.next_step_id})", self.p_out)
+            for step_id in wave:
+                self.ctx.attach_perception(step_id, self.p_out)
+            log_json_block(f"📌 Perception output ({', '.join(wave)})", self.p_out)
             self.ctx._print_graph(depth=3)
 
             if self.p_out.get("original_goal_achieved") or self.p_out.get("route") == Route.SUMMARIZE:
@@ -160,6 +185,7 @@ class AgentLoop:
             self.next_step_id = d_out["next_step_id"]
             self.code_variants = d_out["code_variants"]
             plan_graph = d_out["plan_graph"]
+            self.plan_edges = plan_graph.get("edges", [])
             self.update_plan_graph(self.ctx, plan_graph, self.next_step_id)
 
 
@@ -191,6 +217,37 @@ class AgentLoop:
                     continue
             ctx.add_step(step_id, description=node["description"], step_type=StepType.CODE, from_node=from_step_id)
 
+    def _uses_stateful_tool(self, step_id) -> bool:
+        return any(
+            calls_stateful_tool(self.code_variants[f"CODE_{step_id}{suffix}"], self.multi_mcp)
+            for suffix in "ABC" if f"CODE_{step_id}{suffix}" in self.code_variants
+        )
+
+    def _next_wave(self) -> list[str]:
+        """next_step_id plus pending steps whose plan dependencies are all completed
+        and that the decision wrote code variants for, up to max_parallel_steps.
+        A step calling a non-raceable tool (the shared browser, ...) always runs alone."""
+        wave = [self.next_step_id]
+        if self.max_parallel_steps <= 1 or self._uses_stateful_tool(self.next_step_id):
+            return wave
+        depends_on = defaultdict(set)
+        for edge in self.plan_edges:
+            depends_on[str(edge.get("to"))].add(str(edge.get("from")))
+
+        for node_id in self.ctx.graph.nodes:
+            if len(wave) >= self.max_parallel_steps:
+                break
+            node = self.ctx.graph.nodes[node_id]["data"]
+            if node_id in wave or node.status != "pending":
+                continue
+            if not any(f"CODE_{node_id}{suffix}" in self.code_variants for suffix in "ABC"):
+                continue
+            if self._uses_stateful_tool(node_id):
+                continue
+            if all(dep == StepType.ROOT or self.ctx.is_step_completed(dep) for dep in depends_on[node_id]):
+                wave.append(node_id)
+        return wave
+
     def _pick_next_step(self, ctx) -> str:
         for node_id in ctx.graph.nodes:
             node = ctx.graph.nodes[node_id]["data"]
@@ -198,10 +255,6 @@ class AgentLoop:
                 return node.index
         return StepType.ROOT
 
-    def _get_retry_step_id(self, step_id, failed_step_attempts):
-        attempts = failed_step_attempts.get(step_id, 0)
-        return f"{step_id}F{attempts}" if attempts > 0 else step_id
-
 
 class StepExecutionTracker:
     def __init__(self, max_steps=12, max_retries=3):
@@ -209,7 +262,6 @@ class StepExecutionTracker:
         self.max_retries = max_retries
         self.attempts = {}
         self.tries = 0
-        self.root_failures = 0
 
     def increment(self):
         self.tries += 1
@@ -217,16 +269,8 @@ class StepExecutionTracker:
     def record_failure(self, step_id):
         self.attempts[step_id] = self.attempts.get(step_id, 0) + 1
 
-    def retry_step_id(self, step_id):
-        attempts = self.attempts.get(step_id, 0)
-        return f"{step_id}F{attempts}" if attempts > 0 else step_id
-
     def should_continue(self):
         return self.tries < self.max_steps
 
     def has_exceeded_retries(self, step_id):
         return self.attempts.get(step_id, 0) >= self.max_retries
-
-    def register_root_failure(self):
-        self.root_failures += 1
-        return self.root_failures >= 2
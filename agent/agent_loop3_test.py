@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from agent import agent_loop3
+from agent.agent_loop3 import AgentLoop, StepType
+from agent.contextManager import ContextManager
+
+# perception/ and decision/ tests import perception.py and decision.py as
+# top-level modules (pytest puts the test's directory first on sys.path);
+# the packages of the same name that agent_loop3 pulled in would shadow them.
+for name in [n for n in sys.modules if n.split(".")[0] in ("perception", "decision")]:
+    del sys.modules[name]
+
+
+class StubMultiMCP:
+    stateful = {"go_to_url", "click_element_by_index"}
+
+    def get_all_tools(self):
+        return [SimpleNamespace(name=n) for n in ("search_web", *self.stateful)]
+
+    def is_raceable(self, tool_name):
+        return tool_name not in self.stateful
+
+
+def make_loop(code_variants: dict, edges=(), next_step_id="0", max_parallel_steps=3) -> AgentLoop:
+    """An AgentLoop with a plan in place, skipping the LLM-backed components."""
+    loop = AgentLoop.__new__(AgentLoop)
+    loop.multi_mcp = StubMultiMCP()
+    loop.max_parallel_steps = max_parallel_steps
+    loop.execution_mode = "race"
+    loop.ctx = ContextManager("test-session", "query")
+    loop.ctx.add_step(StepType.ROOT, "initial query", StepType.ROOT)
+    loop.ctx.mark_step_completed(StepType.ROOT)
+    for step_id in sorted({key[5:-1] for key in code_variants} | {next_step_id}):
+        loop.ctx.add_step(step_id, f"step {step_id}", StepType.CODE, from_node=StepType.ROOT)
+    loop.code_variants = code_variants
+    loop.plan_edges = [{"from": a, "to": b} for a, b in edges]
+    loop.next_step_id = next_step_id
+    return loop
+
+
+def test_independent_steps_share_a_wave():
+    loop = make_loop({f"CODE_{i}A": f"return search_web('{i}')" for i in "0123"})
+    assert loop._next_wave() == ["0", "1", "2"]
+
+
+def test_dependent_steps_wait():
+    loop = make_loop({f"CODE_{i}A": f"return search_web('{i}')" for i in "012"}, edges=[("0", "1"), ("ROOT", "2")])
+    assert loop._next_wave() == ["0", "2"]
+
+
+def test_stateful_steps_run_alone():
+    variants = {
+        "CODE_0A": "return search_web('a')",
+        "CODE_1A": "return go_to_url('https://example.com')",
+        "CODE_2A": "return search_web('b')",
+        "CODE_3A": "browser.click_element_by_index(2)",
+    }
+    assert make_loop(variants)._next_wave() == ["0", "2"]
+    assert make_loop(variants, next_step_id="1")._next_wave() == ["1"]
+    assert make_loop(variants, next_step_id="3")._next_wave() == ["3"]
+
+
+def test_repeated_failures_halt_the_loop():
+    loop = make_loop({"CODE_0A": "return search_web('a')", "CODE_1A": "return search_web('b')"})
+    loop.query, loop.memory, loop.strategy, loop.session, loop.status = "query", [], "exploratory", None, "in_progress"
+    runs = []
+
+    async def failing_step(step_id, code_variants, ctx, mode, session, multi_mcp):
+        runs.append(step_id)
+        ctx.mark_step_failed(step_id, "boom")
+        return {"status": "error", "error": "boom"}
+
+    async def perceive(*args, **kwargs):
+        return {"route": "decision"}
+
+    async def decide(*args, **kwargs):
+        return {"next_step_id": "0", "code_variants": {"CODE_0A": "return search_web('a')"},
+                "plan_graph": {"nodes": [{"id": "0", "description": "step 0"}], "edges": []}}
+
+    loop.perception = SimpleNamespace(run=perceive)
+    loop.decision = SimpleNamespace(run=decide)
+    original = agent_loop3.execute_step_with_mode
+    agent_loop3.execute_step_with_mode = failing_step
+    try:
+        asyncio.run(loop._execute_steps_loop())
+    finally:
+        agent_loop3.execute_step_with_mode = original
+
+    assert runs.count("0") == 5  # StepExecutionTracker(max_retries=5)
+    assert loop.status == "in_progress"
+
+
+if __name__ == "__main__":
+    test_independent_steps_share_a_wave()
+    test_dependent_steps_wait()
+    test_stateful_steps_run_alone()
+    test_repeated_failures_halt_the_loop()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from agent.agent_loop3 import AgentLoop
+from utils.utils import log_step, log_error
+
+MAX_CONCURRENT_SESSIONS = 4   # agent runs in flight at once
+MAX_QUEUED_SESSIONS = 32      # waiting beyond that are refused
+SESSION_TIMEOUT = 600         # seconds per run, queueing excluded
+
+
+class ServerBusy(Exception):
+    """Raised by AgentServer.submit when the session queue is full."""
+
+
+@dataclass
+class SessionRequest:
+    session_id: str
+    query: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class AgentServer:
+    """Runs many independent agent sessions concurrently on one event loop.
+
+    Queries are admitted into a bounded queue and picked up by
+    `max_concurrent` worker tasks; a query arriving while the queue is full
+    is refused with ServerBusy instead of waiting unboundedly. Each run uses
+    its own AgentLoop fork (context, session, plan state) while the LLM
+    clients and the MultiMCP tool connections are shared.
+    """
+
+    def __init__(self, agent: AgentLoop, max_concurrent: int = MAX_CONCURRENT_SESSIONS,
+                 max_queue: int = MAX_QUEUED_SESSIONS, session_timeout: Optional[float] = SESSION_TIMEOUT):
+        self.agent = agent
+        self.max_concurrent = max_concurrent
+        self.session_timeout = session_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.workers: List[asyncio.Task] = []
+        self.active = 0
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0}
+        # Totals rather than per-session lists, so a long-running server stays bounded
+        self.run_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.runs = 0
+        self.started_at: Optional[float] = None
+
+    async def start(self):
+        if self.workers:
+            return
+        self.started_at = time.perf_counter()
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent)]
+        log_step(f"Agent server ready: {self.max_concurrent} concurrent sessions, queue of {self.queue.maxsize}", symbol="🚀")
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        while not self.queue.empty():
+            request = self.queue.get_nowait()
+            if not request.future.done():
+                request.future.set_exception(ServerBusy("Server shutting down"))
+
+    def submit(self, query: str, session_id: Optional[str] = None) -> SessionRequest:
+        """Admit a query; raises ServerBusy if the queue is full."""
+        if not self.workers:
+            raise RuntimeError("AgentServer.start() has not been called")
+        request = SessionRequest(session_id or str(uuid.uuid4()), query, asyncio.get_running_loop().create_future())
+        try:
+            self.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise ServerBusy(f"{self.queue.maxsize} sessions already waiting; try again later")
+        return request
+
+    async def ask(self, query: str, session_id: Optional[str] = None) -> Dict[str, str]:
+        """Submit a query and wait for its answer."""
+        request = self.submit(query, session_id)
+        return {"session_id": request.session_id, "answer": await request.future}
+
+    async def _worker(self, worker_id: int):
+        while True:
+            request = await self.queue.get()
+            self.active += 1
+            started = time.perf_counter()
+            try:
+                answer = await asyncio.wait_for(self.agent.run(request.query, request.session_id), self.session_timeout)
+                self.counts["completed"] += 1
+                if not request.future.done():
+                    request.future.set_result(answer)
+            except asyncio.CancelledError:
+                if not request.future.done():
+                    request.future.cancel()
+                raise
+            except Exception as e:
+                self.counts["failed"] += 1
+                log_error(f"Session {request.session_id} failed", e)
+                if not request.future.done():
+                    request.future.set_exception(e)
+            finally:
+                self.wait_seconds += started - request.enqueued_at
+                self.run_seconds += time.perf_counter() - started
+                self.runs += 1
+                self.active -= 1
+                self.queue.task_done()
+
+    def stats(self) -> Dict:
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        done = self.counts["completed"] + self.counts["failed"]
+        return {
+            **self.counts,
+            "active": self.active,
+            "queued": self.queue.qsize(),
+            "sessions_per_min": round(done / elapsed * 60, 2) if elapsed else 0.0,
+            "avg_run_s": round(self.run_seconds / self.runs, 3) if self.runs else 0.0,
+            "avg_wait_s": round(self.wait_seconds / self.runs, 3) if self.runs else 0.0,
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from agent.agent_server import AgentServer, ServerBusy
+
+# agent_server imports agent_loop3, which pulls in the perception/ and decision/
+# packages; drop them so those directories' own tests import their modules.
+for name in [n for n in sys.modules if n.split(".")[0] in ("perception", "decision")]:
+    del sys.modules[name]
+
+
+class StubAgent:
+    """Stands in for AgentLoop: answers after `delay`, or once `gate` is set."""
+
+    def __init__(self, delay: float = 0.0, gate: asyncio.Event = None):
+        self.delay = delay
+        self.gate = gate
+        self.in_flight = 0
+        self.peak = 0
+        self.seen = []
+
+    async def run(self, query: str, session_id: str) -> str:
+        self.seen.append(session_id)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            await asyncio.sleep(self.delay)
+            if query == "fail":
+                raise RuntimeError("tool crashed")
+            return f"answer to {query}"
+        finally:
+            self.in_flight -= 1
+
+
+def test_submit_requires_start():
+    async def go():
+        server = AgentServer(StubAgent())
+        try:
+            server.submit("q")
+        except RuntimeError:
+            return
+        raise AssertionError("submit before start should fail")
+
+    asyncio.run(go())
+
+
+def test_full_queue_raises_server_busy():
+    async def go():
+        gate = asyncio.Event()
+        server = AgentServer(StubAgent(gate=gate), max_concurrent=1, max_queue=2)
+        await server.start()
+        first = server.submit("q0")
+        await asyncio.sleep(0)  # the worker takes q0, freeing its queue slot
+        waiting = [server.submit("q1"), server.submit("q2")]
+        try:
+            server.submit("q3")
+        except ServerBusy:
+            pass
+        else:
+            raise AssertionError("a full queue should refuse new sessions")
+        assert server.stats()["rejected"] == 1
+        assert server.stats()["queued"] == 2 and server.stats()["active"] == 1
+
+        gate.set()
+        answers = await asyncio.gather(*(r.future for r in [first, *waiting]))
+        assert answers == ["answer to q0", "answer to q1", "answer to q2"]
+        server.submit("q4")  # room again once the queue drains
+        await server.stop()
+
+    asyncio.run(go())
+
+
+def test_workers_bound_concurrency():
+    async def go():
+        agent = StubAgent(delay=0.02)
+        server = AgentServer(agent, max_concurrent=3, max_queue=10)
+        await server.start()
+        results = await asyncio.gather(*(server.ask(f"q{i}", session_id=f"s{i}") for i in range(7)))
+        assert agent.peak == 3
+        assert [r["session_id"] for r in results] == [f"s{i}" for i in range(7)]
+        assert [r["answer"] for r in results] == [f"answer to q{i}" for i in range(7)]
+        await server.stop()
+
+    asyncio.run(go())
+
+
+def test_stats_keep_running_totals():
+    async def go():
+        agent = StubAgent(delay=0.02)
+        server = AgentServer(agent, max_concurrent=1, max_queue=10)
+        await server.start()
+        requests = [server.submit(q) for q in ("a", "fail", "b")]
+        results = await asyncio.gather(*(r.future for r in requests), return_exceptions=True)
+        assert isinstance(results[1], RuntimeError)
+
+        stats = server.stats()
+        assert stats["completed"] == 2 and stats["failed"] == 1 and stats["rejected"] == 0
+        assert server.runs == 3
+        assert stats["avg_run_s"] >= 0.02
+        # one worker: the second and third sessions waited for the ones before them
+        assert server.wait_seconds >= 0.02 + 0.04
+        assert stats["avg_wait_s"] == round(server.wait_seconds / 3, 3)
+        assert stats["sessions_per_min"] > 0
+        await server.stop()
+
+    asyncio.run(go())
+
+
+def test_session_timeout_counts_as_failure():
+    async def go():
+        server = AgentServer(StubAgent(delay=1.0), max_concurrent=1, session_timeout=0.05)
+        await server.start()
+        request = server.submit("slow")
+        try:
+            await request.future
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("the run should have timed out")
+        assert server.stats()["failed"] == 1
+        await server.stop()
+
+    asyncio.run(go())
+
+
+def test_stop_refuses_queued_sessions():
+    async def go():
+        server = AgentServer(StubAgent(gate=asyncio.Event()), max_concurrent=1, max_queue=4)
+        await server.start()
+        running = server.submit("q0")
+        await asyncio.sleep(0)
+        queued = server.submit("q1")
+        await server.stop()
+        assert running.future.cancelled()
+        try:
+            await queued.future
+        except ServerBusy:
+            pass
+        else:
+            raise AssertionError("queued sessions should be refused on shutdown")
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    test_submit_requires_start()
+    test_full_queue_raises_server_busy()
+    test_workers_bound_concurrency()
+    test_stats_keep_running_totals()
+    test_session_timeout_counts_as_failure()
+    test_stop_refuses_queued_sessions()
@@ -4,7 +4,7 @@ import networkx as nx
 from typing import Any, Dict, Optional
 from dataclasses import dataclass
 import json
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 
 @dataclass
@@ -30,6 +30,7 @@ class ContextManager:
         self.graph = nx.DiGraph()
         self.latest_node_id: Optional[str] = None
         self.executed_variants: Dict[str, Set[str]] = defaultdict(set)
+        self.variant_wins: Counter = Counter()  # suffix ("A", "B", "C") -> steps it won
 
 
         root_node = StepNode(index="ROOT", description=original_query, type="ROOT", status="completed")
@@ -74,6 +75,15 @@ class ContextManager:
         })
         # self._print_graph(depth=2)
 
+    def record_variant_win(self, step_id: str, variant: str):
+        """Remember which code variant (e.g. CODE_1B) completed a step."""
+        self.executed_variants[step_id].add(variant)
+        self.variant_wins[variant[-1]] += 1
+
+    def preferred_suffixes(self, suffixes: str = "ABC") -> list[str]:
+        """Variant suffixes ordered by how often they have won in this session (ties keep A, B, C order)."""
+        return sorted(suffixes, key=lambda s: -self.variant_wins[s])
+
     def attach_perception(self, step_id: str, perception: dict):
         if step_id not in self.graph.nodes:
             fallback_node = StepNode(index=step_id, description="Perception-only node", type="PERCEPTION")
@@ -4,8 +4,12 @@ import yaml
 import requests
 from pathlib import Path
 from google import genai
-from google.genai.errors import ServerError
+from google.genai.errors import APIError
 from dotenv import load_dotenv
+from agent.rate_governor import (
+    MAX_RETRIES, RETRY_STATUSES, backoff_delay, error_status, estimate_tokens, get_rate_governor
+)
+from utils.utils import log_error
 
 load_dotenv()
 
@@ -22,6 +26,12 @@ class ModelManager:
         self.model_info = self.config["models"][self.text_model_key]
         self.model_type = self.model_info["type"]
 
+        # Shared by every ModelManager (and session) using this provider/model
+        limits = self.model_info.get("rate_limit", {})
+        self.governor = get_rate_governor(
+            f"{self.model_type}:{self.model_info['model']}", rpm=limits.get("rpm"), tpm=limits.get("tpm")
+        )
+
         # ✅ Gemini initialization with new library
         if self.model_type == "gemini":
             api_key = os.getenv("GEMINI_API_KEY")
@@ -29,33 +39,48 @@ class ModelManager:
 
     async def generate_text(self, prompt: str) -> str:
         if self.model_type == "gemini":
-            return await self._gemini_generate(prompt)
-
+            generate = self._gemini_generate
         elif self.model_type == "ollama":
-            return await self._ollama_generate(prompt)
+            generate = self._ollama_generate
+        else:
+            raise NotImplementedError(f"Unsupported model type: {self.model_type}")
 
-        raise NotImplementedError(f"Unsupported model type: {self.model_type}")
+        estimated = estimate_tokens(prompt)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.governor.acquire(estimated)  # waits only when the RPM/TPM quota requires it
+            try:
+                text, used_tokens = await generate(prompt)
+            except Exception as e:
+                if error_status(e) not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt, e)
+                log_error(f"{self.model_info['model']} returned {error_status(e)}; backing off {delay:.1f}s")
+                self.governor.penalize(delay)
+                continue
+            self.governor.settle(estimated, used_tokens)
+            return text
 
-    async def _gemini_generate(self, prompt: str) -> str:
+    async def _gemini_generate(self, prompt: str) -> tuple[str, int | None]:
         try:
             # ✅ CORRECT: Use truly async method
             response = await self.client.aio.models.generate_content(
                 model=self.model_info["model"],
                 contents=prompt
             )
-            return response.text.strip()
+            usage = getattr(response, "usage_metadata", None)
+            return response.text.strip(), getattr(usage, "total_token_count", None)
 
-        except ServerError as e:
-            # ✅ FIXED: Raise the exception instead of returning it
+        except APIError as e:
+            # ✅ FIXED: Raise the exception instead of returning it (429/503 are retried by generate_text)
             raise e
         except Exception as e:
             # ✅ Handle other potential errors
             raise RuntimeError(f"Gemini generation failed: {str(e)}")
 
-    async def _ollama_generate(self, prompt: str) -> str:
+    async def _ollama_generate(self, prompt: str) -> tuple[str, int | None]:
+        # ✅ Use aiohttp for truly async requests
+        import aiohttp
         try:
-            # ✅ Use aiohttp for truly async requests
-            import aiohttp
             async with aiohttp.ClientSession() as session:
                 async with session.post(
                     self.model_info["url"]["generate"],
@@ -63,6 +88,11 @@ class ModelManager:
                 ) as response:
                     response.raise_for_status()
                     result = await response.json()
-                    return result["response"].strip()
+                    used_tokens = result.get("prompt_eval_count", 0) + result.get("eval_count", 0)
+                    return result["response"].strip(), used_tokens or None
+        except aiohttp.ClientResponseError as e:
+            if e.status in RETRY_STATUSES:
+                raise  # retried by generate_text
+            raise RuntimeError(f"Ollama generation failed: {str(e)}")
         except Exception as e:
             raise RuntimeError(f"Ollama generation failed: {str(e)}")
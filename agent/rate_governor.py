@@ -0,0 +1,135 @@
+import asyncio
+import random
+import re
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+RETRY_STATUSES = {429, 503}
+MAX_RETRIES = 4
+BACKOFF_BASE = 2.0    # seconds; doubles per retry, with jitter
+BACKOFF_MAX = 60.0
+CHARS_PER_TOKEN = 4   # prompt size estimate until the provider reports usage
+OUTPUT_TOKEN_ESTIMATE = 512
+
+
+def estimate_tokens(prompt: str) -> int:
+    return len(prompt) // CHARS_PER_TOKEN + OUTPUT_TOKEN_ESTIMATE
+
+
+def error_status(err: Exception) -> Optional[int]:
+    """HTTP status of a provider error (google-genai APIError.code, aiohttp ClientResponseError.status)."""
+    for attr in ("code", "status", "status_code"):
+        value = getattr(err, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def retry_after(err: Exception) -> Optional[float]:
+    """Server-suggested wait: a Retry-After header or Gemini's RetryInfo retryDelay."""
+    headers = getattr(err, "headers", None) or {}
+    if headers.get("Retry-After", "").replace(".", "", 1).isdigit():
+        return float(headers["Retry-After"])
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", str(getattr(err, "details", "") or err))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Holds up to `per_minute` units, refilled continuously at per_minute / 60 per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount  # may go negative when actual usage exceeds the estimate
+
+
+class RateGovernor:
+    """Async RPM/TPM quota for one provider/model, shared by every caller in the process.
+
+    `acquire()` waits only as long as the buckets require. Waiters are
+    served first-come first-served (one asyncio.Lock per event loop), so
+    overlapping sessions share the quota fairly instead of racing for it.
+    A 429/503 pauses every caller of this model via `penalize()`, not just
+    the one that saw it.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._state_lock = threading.Lock()
+        self._loop_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def _queue_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            lock = self._loop_locks.get(loop)
+            if lock is None:
+                lock = self._loop_locks[loop] = asyncio.Lock()
+            return lock
+
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = max(0.0, self.blocked_until - now)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        async with self._queue_lock():
+            while True:
+                with self._state_lock:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        if self.requests:
+                            self.requests.take(1)
+                        if self.tokens:
+                            self.tokens.take(tokens)
+                        return
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the TPM bucket once the provider reports real usage."""
+        if self.tokens and actual is not None:
+            with self._state_lock:
+                self.tokens.take(actual - estimated)
+
+    def penalize(self, delay: float):
+        with self._state_lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+def backoff_delay(attempt: int, err: Exception) -> float:
+    suggested = retry_after(err)
+    if suggested is not None:
+        return min(suggested, BACKOFF_MAX)
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+_governors: Dict[str, RateGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_rate_governor(key: str, rpm: Optional[float] = None, tpm: Optional[float] = None) -> RateGovernor:
+    """One RateGovernor per provider/model key in this process."""
+    with _governors_lock:
+        if key not in _governors:
+            _governors[key] = RateGovernor(rpm, tpm)
+        return _governors[key]
@@ -0,0 +1,145 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from agent import model_manager
+from agent.model_manager import ModelManager
+from agent.rate_governor import (
+    BACKOFF_MAX, MAX_RETRIES, RateGovernor, TokenBucket, backoff_delay, error_status, retry_after
+)
+
+
+class StatusError(Exception):
+    """Stands in for google-genai APIError (status in `.code`)."""
+
+    def __init__(self, code, details="", headers=None):
+        super().__init__(f"{code} {details}")
+        self.code = code
+        self.details = details
+        self.headers = headers or {}
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(60)  # one unit per second
+    bucket.level, bucket.updated = 0.0, 100.0
+    assert bucket.wait_time(1, now=100.0) == 1.0
+    assert abs(bucket.wait_time(1, now=100.5) - 0.5) < 1e-9
+    assert bucket.wait_time(1, now=101.0) == 0.0
+    assert bucket.wait_time(10, now=1000.0) == 0.0
+    assert bucket.level == 60  # never above capacity
+    bucket.take(70)
+    assert bucket.level == -10  # usage beyond the estimate is owed
+    assert bucket.wait_time(500, now=1000.0) == 70  # oversized request waits for a full bucket only
+
+
+def test_waiters_are_served_in_arrival_order():
+    governor = RateGovernor(rpm=6000)  # 100 requests/s once drained
+    governor.requests.level = 0.0
+    order = []
+
+    async def caller(i):
+        await governor.acquire()
+        order.append(i)
+
+    async def run():
+        tasks = []
+        for i in range(6):
+            tasks.append(asyncio.create_task(caller(i)))
+            await asyncio.sleep(0)  # arrive in index order
+        await asyncio.gather(*tasks)
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert order == list(range(6))
+    assert time.monotonic() - start >= 0.05  # six units at 100/s from an empty bucket
+
+
+def test_penalize_pauses_every_caller():
+    governor = RateGovernor()
+    governor.penalize(0.2)
+    governor.penalize(0.05)  # a shorter pause never cuts an existing one
+    start = time.monotonic()
+    asyncio.run(governor.acquire())
+    assert time.monotonic() - start >= 0.19
+
+
+def test_settle_charges_actual_usage():
+    governor = RateGovernor(tpm=600)
+    asyncio.run(governor.acquire(100))
+    assert abs(governor.tokens.level - 500) < 1
+    governor.settle(100, 300)
+    assert abs(governor.tokens.level - 300) < 1
+    governor.settle(100, None)  # provider reported nothing: keep the estimate
+    assert abs(governor.tokens.level - 300) < 1
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(12):
+        delay = backoff_delay(attempt, StatusError(429))
+        assert 0 < delay <= BACKOFF_MAX
+    assert 1.0 <= backoff_delay(0, StatusError(429)) <= 2.0
+    assert backoff_delay(0, StatusError(429, headers={"Retry-After": "7"})) == 7
+    assert backoff_delay(0, StatusError(429, details="{'retryDelay': '31s'}")) == 31
+    assert backoff_delay(0, StatusError(503, details="{'retryDelay': '900s'}")) == BACKOFF_MAX
+    assert retry_after(StatusError(429)) is None
+    assert error_status(StatusError(503)) == 503 and error_status(ValueError()) is None
+
+
+def make_manager(generate) -> ModelManager:
+    manager = ModelManager.__new__(ModelManager)
+    manager.model_type = "gemini"
+    manager.model_info = {"model": "stub"}
+    manager.governor = RateGovernor()
+    manager._gemini_generate = generate
+    return manager
+
+
+def run_with_errors(errors):
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok", 10
+
+    original = model_manager.backoff_delay
+    model_manager.backoff_delay = lambda attempt, err: 0.0
+    try:
+        return asyncio.run(make_manager(generate).generate_text("prompt")), len(calls)
+    finally:
+        model_manager.backoff_delay = original
+
+
+def test_generate_text_retries_only_rate_limit_statuses():
+    assert run_with_errors([StatusError(429), StatusError(503)]) == ("ok", 3)
+    for error in (StatusError(400), StatusError(500), RuntimeError("boom")):
+        try:
+            run_with_errors([error])
+        except type(error) as raised:
+            assert raised is error
+        else:
+            raise AssertionError(f"{error!r} was retried")
+
+
+def test_generate_text_gives_up_after_max_retries():
+    try:
+        run_with_errors([StatusError(429)] * (MAX_RETRIES + 1))
+    except StatusError as e:
+        assert e.code == 429
+    else:
+        raise AssertionError("kept retrying past MAX_RETRIES")
+    assert run_with_errors([StatusError(429)] * MAX_RETRIES) == ("ok", MAX_RETRIES + 1)
+
+
+if __name__ == "__main__":
+    test_token_bucket_refills_continuously()
+    test_waiters_are_served_in_arrival_order()
+    test_penalize_pauses_every_caller()
+    test_settle_charges_actual_usage()
+    test_backoff_delay_is_bounded()
+    test_generate_text_retries_only_rate_limit_statuses()
+    test_generate_text_gives_up_after_max_retries()
@@ -0,0 +1,175 @@
+"""Sessions per minute through AgentServer with stubbed LLM and tool backends.
+
+Every model call sleeps --llm-latency and returns a
+canned reply: decision plans --fanout independent tool steps (with
+variants for every pending one, so AgentLoop may run them as one wave),
+and perception routes to summarize once all of them are done. Every tool
+call sleeps --tool-latency. Everything else (rate governor, context graph, executor
+sandbox, session store, memory index) is the real code, run in a scratch directory so the
+real history is untouched. Reports throughput for each --concurrency;
+--rpm/--tpm put a shared quota on the stub model (default: none), and
+--parallel-steps 1 gives the one-step-per-round-trip baseline.
+
+    python agent/server_bench.py --sessions 40 --concurrency 1 4 16 --fanout 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+
+from agent.agent_loop3 import AgentLoop
+from agent.agent_server import AgentServer, ServerBusy
+from agent.model_manager import ModelManager
+from agent.rate_governor import RateGovernor
+
+PERCEPTION_REPLY = {
+    "entities": ["stub"], "result_requirement": "one fact", "original_goal_achieved": False,
+    "reasoning": "needs a lookup", "local_goal_achieved": False, "local_reasoning": "n/a",
+    "last_tooluse_summary": "None", "solution_summary": "Not ready yet", "confidence": "0.5", "route": "decision",
+}
+DONE_REPLY = {**PERCEPTION_REPLY, "original_goal_achieved": True, "local_goal_achieved": True,
+              "solution_summary": "Found it", "confidence": "0.9", "route": "summarize"}
+LLM_CALLS = [0]
+
+
+def decision_reply(completed: set, fanout: int) -> dict:
+    steps = [str(i) for i in range(fanout)]
+    pending = [s for s in steps if s not in completed] or steps[-1:]
+    return {
+        "plan_graph": {
+            "nodes": [{"id": s, "description": f"Look up fact {s}"} for s in steps],
+            "edges": [{"from": "ROOT", "to": s, "type": "normal"} for s in steps],
+        },
+        "next_step_id": pending[0],
+        "code_variants": {f"CODE_{s}A": f"result_{s} = search_stub('fact {s}')\nreturn result_{s}" for s in pending},
+    }
+
+
+class StubMultiMCP:
+    """The MultiMCP surface AgentLoop uses, with one slow tool."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.tool = SimpleNamespace(name="search_stub", description="Stub search",
+                                    inputSchema={"properties": {"query": {"type": "string"}}})
+
+    def get_all_tools(self):
+        return [self.tool]
+
+    def is_raceable(self, tool_name):
+        return True
+
+    def tool_description_wrapper(self):
+        return ["search_stub(query: string) # Stub search"]
+
+    async def function_wrapper(self, tool_name, *args):
+        await asyncio.sleep(self.latency)
+        return f"stub result for {args[0]}"
+
+    async def shutdown(self):
+        pass
+
+
+def stub_llm(latency: float, fanout: int):
+    """Stands in for the provider call (_gemini_generate / _ollama_generate), below the rate governor."""
+    async def generate(self, prompt: str):
+        LLM_CALLS[0] += 1
+        await asyncio.sleep(latency)
+        if prompt.startswith("Current Time:"):
+            return "Stub summary of the answer.", None
+        payload = json.loads(prompt.rsplit("```json\n", 1)[1].rsplit("```", 1)[0])
+        completed = {step["index"] for step in payload.get("completed_steps", [])}
+        if "### The ONLY Available Tools" in prompt:
+            return json.dumps(decision_reply(completed, fanout)), None
+        done = completed >= {str(i) for i in range(fanout)}
+        return json.dumps(DONE_REPLY if done else PERCEPTION_REPLY), None
+    return generate
+
+
+async def run_load(agent: AgentLoop, sessions: int, concurrency: int, queue: int) -> dict:
+    server = AgentServer(agent, max_concurrent=concurrency, max_queue=queue)
+    await server.start()
+    latencies = []
+
+    async def one(i: int):
+        submitted = time.perf_counter()
+        while True:
+            try:
+                request = server.submit(f"Query {i}: what is the stub fact number {i}?")
+                break
+            except ServerBusy:  # admission control: back off and retry
+                await asyncio.sleep(0.05)
+        await request.future
+        latencies.append(time.perf_counter() - submitted)
+
+    LLM_CALLS[0] = 0
+    start = time.perf_counter()
+    pending = [asyncio.create_task(one(i)) for i in range(sessions)]
+    await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    await server.stop()
+    return {"elapsed": elapsed, "latencies": latencies, "llm_calls": LLM_CALLS[0], **stats}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queue", type=int, default=8, help="bounded queue size (smaller than --sessions exercises rejection)")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--fanout", type=int, default=3, help="independent tool steps per plan")
+    parser.add_argument("--parallel-steps", type=int, default=3, help="AgentLoop max_parallel_steps")
+    parser.add_argument("--rpm", type=float, help="requests/min quota shared by all sessions")
+    parser.add_argument("--tpm", type=float, help="tokens/min quota shared by all sessions")
+    args = parser.parse_args()
+
+    ModelManager._gemini_generate = ModelManager._ollama_generate = stub_llm(args.llm_latency, args.fanout)
+    scratch = Path(tempfile.mkdtemp(prefix="server_bench_"))
+    cwd = os.getcwd()
+    os.chdir(scratch)  # memory/, action/sandbox_state/ etc. are relative paths
+    try:
+        agent = AgentLoop(
+            perception_prompt=str(ROOT / "prompts/perception_prompt.txt"),
+            decision_prompt=str(ROOT / "prompts/decision_prompt.txt"),
+            summarizer_prompt=str(ROOT / "prompts/summarizer_prompt.txt"),
+            multi_mcp=StubMultiMCP(args.tool_latency),
+            max_parallel_steps=args.parallel_steps,
+        )
+        governor = RateGovernor(args.rpm, args.tpm)
+        for component in (agent.perception, agent.decision, agent.summarizer):
+            component.model.governor = governor
+        print(f"{args.sessions} sessions, LLM {args.llm_latency}s/call, tool {args.tool_latency}s/call, "
+              f"queue {args.queue}, quota rpm={args.rpm} tpm={args.tpm}, "
+              f"{args.fanout} steps/plan, up to {args.parallel_steps} per wave")
+        print(f"{'concurrency':>11} {'sessions/min':>13} {'p50 s':>7} {'p95 s':>7} {'LLM calls/session':>18} "
+              f"{'rejected':>9} {'failed':>7}")
+        for concurrency in args.concurrency:
+            with contextlib.redirect_stdout(io.StringIO()):  # agent logs
+                result = await run_load(agent, args.sessions, concurrency, args.queue)
+            done = result["completed"] + result["failed"]
+            print(f"{concurrency:11d} {done / result['elapsed'] * 60:13.1f} "
+                  f"{np.percentile(result['latencies'], 50):7.2f} {np.percentile(result['latencies'], 95):7.2f} "
+                  f"{result['llm_calls'] / args.sessions:18.1f} {result['rejected']:9d} {result['failed']:7d}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,7 +8,6 @@ from utils.json_parser import parse_llm_json
 from agent.agentSession import DecisionSnapshot
 from mcp_servers.multiMCP import MultiMCP
 import ast
-import time
 from utils.utils import log_step
 import asyncio
 from typing import Any, Literal, Optional
@@ -33,7 +32,6 @@ class Decision:
         raw_text = ""
         try:
             log_step("[SENDING PROMPT TO DECISION...]", symbol="→")
-            time.sleep(2)
             response = await self.model.generate_text(
                 prompt=full_prompt
             )
@@ -1,9 +1,11 @@
 from utils.utils import log_step, log_error
 import asyncio
+import sys
 import yaml
 from dotenv import load_dotenv
 from mcp_servers.multiMCP import MultiMCP
 from agent.agent_loop3 import AgentLoop  # 🆕 Use loop3
+from agent.agent_server import AgentServer, ServerBusy
 from pprint import pprint
 
 BANNER = """
@@ -14,8 +16,7 @@ Type 'exit' or 'quit' to leave.
 ──────────────────────────────────────────────────────
 """
 
-async def interactive() -> None:
-    log_step(BANNER, symbol="")
+async def load_agent():
     log_step('Loading MCP Servers...', symbol="📥")
 
     # Load MCP server configs
@@ -36,6 +37,11 @@ async def interactive() -> None:
         multi_mcp=multi_mcp,
         strategy="exploratory"
     )
+    return multi_mcp, loop
+
+async def interactive() -> None:
+    log_step(BANNER, symbol="")
+    multi_mcp, loop = await load_agent()
 
     conversation_history = []  # stores (query, response) tuples
 
@@ -71,6 +77,37 @@ async def interactive() -> None:
     finally:
         await multi_mcp.shutdown()
 
+async def serve(host: str = "127.0.0.1", port: int = 8000) -> None:
+    """HTTP mode: POST /query {"query": ...} runs sessions concurrently over one MultiMCP."""
+    import uvicorn
+    from fastapi import Body, FastAPI, HTTPException
+
+    multi_mcp, loop = await load_agent()
+    server = AgentServer(loop)
+    app = FastAPI(title="Agentic Query Assistant")
+
+    @app.post("/query")
+    async def query(query: str = Body(..., embed=True)):
+        try:
+            return await server.ask(query)
+        except ServerBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    @app.get("/stats")
+    async def stats():
+        return server.stats()
+
+    await server.start()
+    try:
+        await uvicorn.Server(uvicorn.Config(app, host=host, port=port)).serve()
+    finally:
+        await server.stop()
+        await multi_mcp.shutdown()
+
 if __name__ == "__main__":
     load_dotenv()
-    asyncio.run(interactive())
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        # python main.py serve [port]
+        asyncio.run(serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000))
+    else:
+        asyncio.run(interactive())
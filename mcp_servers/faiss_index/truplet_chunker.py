@@ -1,102 +1,45 @@
-import json
-import time
-from pathlib import Path
-
-# Config
-INPUT_JSON_PATH = "metadata.json"
-OUTPUT_JSON_PATH = "triplet_output.json"
-MODEL_NAME = "qwen2.5:32b-instruct-q4_0"
-PROMPT_HEADER = """Extract all factual triplets from the following text in the format: (subject, relation, object).
-
-Each triplet must represent a factual relationship between two entities or concepts, clearly grounded in the text. Use the format:
+"""Extract triplets for every indexed document, outside the ingestion pipeline.
 
-(subject, relation_subtype, object)
+Segments are the chunks stored in chunks.sqlite, grouped per document, so
+a rerun only sends chunks it has not seen before (see rag/triplets.py).
 
-✅ RULES FOR RELATION FORMAT:
-- The relation MUST be a two-word phrase using the format: relation_subtype (e.g., 'scores_run', 'represents_symbol', 'uses_technology')
-- Do NOT use generic or vague verbs like 'is', 'has', 'does', 'are', etc.
-- Do NOT use long phrases or full clauses as relation names.
-- The two words must meaningfully describe the action or relationship — avoid filler verbs.
-- Example good relations: 'represents_symbol', 'scores_run', 'uses_tool', 'develops_product'
-- Example bad relations: 'is_a', 'does_work', 'has_property', 'is_part_of'
-
-✅ RULES FOR TRIPLET COMPLETENESS:
-- Do NOT return incomplete triplets.
-- No field in the triplet (subject, relation, or object) can be empty or vague.
-- You MUST infer missing elements using context from nearby sentences. Look both forward and backward in the text to resolve ambiguities or implied references.
-- If necessary, rephrase or complete implied relations using concrete nouns or phrases available in the context.
-
-✅ OTHER GUIDELINES:
-- Focus only on factual or narrative text. Ignore metadata, code, log statements, or markup.
-- Avoid repeating the same triplet unless clearly stated multiple times with new context.
-- Do not add explanations or notes — just return the raw triplet list, one per line.
-
-Your output should be a clean list of factual triplets, one per line, formatted exactly as:  
-(subject, relation_subtype, object)
+    python faiss_index/truplet_chunker.py --concurrency 2
 """
+import argparse
+import asyncio
+import sys
+from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from rag.chunk_store import ChunkStore
+from rag.index_manager import CHUNKS_FILENAME
+from rag.triplets import TripletExtractor
 
-# Simulated model call
-def call_ollama(model_name, prompt):
-    # Replace with your actual call logic
-    import subprocess
-    result = subprocess.run(
-        ["ollama", "run", model_name],
-        input=prompt.encode("utf-8"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    return result.stdout.decode("utf-8")
-
-# Text chunking
-def chunk_text(text, word_limit=200):
-    words = text.split()
-    return [" ".join(words[i:i + word_limit]) for i in range(0, len(words), word_limit)]
-
-# Load JSON
-with open(INPUT_JSON_PATH, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Support your metadata.json format: list of dicts with 'chunk' fields
-if isinstance(data, list) and "chunk" in data[0]:
-    full_text = " ".join(item["chunk"] for item in data)
-else:
-    raise ValueError("Unsupported JSON structure — must contain 'chunk' fields in a list of objects.")
-
-
-# Prepare output file
-Path(OUTPUT_JSON_PATH).write_text("[]", encoding="utf-8")  # start with empty list
-
-# Process in 200-word chunks
-results = []
-for i, segment in enumerate(chunk_text(full_text, word_limit=200)):
-    print(f"\n🔹 [Segment {i}] First 200 words:\n")
-    print(segment[:500] + "...\n")
+INDEX_DIR = Path(__file__).resolve().parent
+OUTPUT_JSONL_PATH = INDEX_DIR / "triplets.jsonl"
+MODEL_NAME = "qwen2.5:32b-instruct-q4_0"
 
-    prompt = f"{PROMPT_HEADER}\n\n{segment}"
-    try:
-        output = call_ollama(MODEL_NAME, prompt).strip()
-        triplet_record = {
-            "segment_index": i,
-            "text": segment,
-            "triplets": output
-        }
 
-        # Load current output
-        with open(OUTPUT_JSON_PATH, "r", encoding="utf-8") as f:
-            current_data = json.load(f)
+async def run(args):
+    store = ChunkStore(INDEX_DIR / CHUNKS_FILENAME)
+    docs: dict[str, list[str]] = {}
+    for row in store.iter_rows():
+        docs.setdefault(row["doc"], []).append(row["chunk"])
 
-        current_data.append(triplet_record)
+    extractor = TripletExtractor(args.output, args.model, args.base_url, concurrency=args.concurrency)
+    added = await asyncio.gather(*(extractor.extract(doc, chunks) for doc, chunks in docs.items()))
+    print(f"✅ {sum(added)} new segments extracted across {len(docs)} documents → {args.output}")
 
-        # Save back to file so you can see it grow
-        with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(current_data, f, indent=2)
 
-        print(f"✅ Triplets saved for segment {i}")
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=OUTPUT_JSONL_PATH)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--concurrency", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
 
-    except Exception as e:
-        print(f"❌ Error in segment {i}: {e}")
-        continue
 
-    time.sleep(1)  # Optional: throttle requests
+if __name__ == "__main__":
+    main()
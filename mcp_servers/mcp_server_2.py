@@ -13,7 +13,7 @@ from pathlib import Path
 import requests
 from markitdown import MarkItDown
 import time
-from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput
+from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput, RelationLookupInput
 from tqdm import tqdm
 import hashlib
 from pydantic import BaseModel
@@ -24,11 +24,29 @@ import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
 import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+from rag.common import mcp_log
+from rag.index_manager import IndexManager, IndexSnapshot
+from rag.embeddings import EmbeddingEngine
+from rag.embedding_cache import EmbeddingCache
+from rag.doc_index import DocumentIndex
+from rag.index_factory import IndexConfig
+from rag.extract import document_image_dir, extract_markdown, stream_document, stream_pdf_pages
+from rag.ingest import IngestionPipeline, IngestStages
+from rag.captions import CaptionCache, ImageCaptioner
+from rag.query_cache import QueryCache
+from rag.triplets import TripletExtractor
+from rag.knowledge_graph import KnowledgeGraph
+from rag.chunking import make_chunker, ollama_chat
+from functools import partial
 
 
 
 mcp = FastMCP("Local Storage RAG")
 
+OLLAMA_BASE_URL = "http://localhost:11434"
 EMBED_URL = "http://localhost:11434/api/embeddings"
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 OLLAMA_URL = "http://localhost:11434/api/generate"
@@ -36,132 +54,137 @@ EMBED_MODEL = "nomic-embed-text"
 GEMMA_MODEL = "gemma3:12b"
 PHI_MODEL = "phi4:latest"
 QWEN_MODEL = "qwen2.5:32b-instruct-q4_0 "
-CHUNK_SIZE = 256
+CHUNK_SIZE = 256  # max words per chunk
+CHUNK_MIN_WORDS = 40  # shorter sections are merged into the next one
+# structural | embedding | llm (the old phi4 segmenter); compare with rag/chunk_bench.py
+CHUNKER = "structural"
+LLM_REFINE_CHUNKS = False  # ask phi4 whether adjacent small chunks belong together
 CHUNK_OVERLAP = 40
 MAX_CHUNK_LENGTH = 512  # characters
 TOP_K = 3  # FAISS top-K matches
+EMBED_BATCH_SIZE = 32  # texts per /api/embed request
+EMBED_CONCURRENCY = 8  # in-flight embedding requests
+INGEST_WORKERS = 4  # processes for PDF/Office extraction
+LLM_CONCURRENCY = 2  # files captioned/chunked against Ollama at once
+COMPACT_THRESHOLD = 0.3  # compact once this fraction of indexed vectors belongs to removed chunks
+HYBRID_SEARCH = True  # fuse BM25 keyword hits with vector hits (RRF); see rag/hybrid_bench.py
+HYBRID_CANDIDATES = 20  # hits taken from each ranking before fusion
+QUERY_CACHE_SIZE = 512  # cached search results, LRU; cleared whenever a new index generation is published
+QUERY_CACHE_THRESHOLD = 0.95  # cosine similarity at which a new query reuses a cached query's results
+TOOL_WORKERS = 8  # threads for blocking tool work (FAISS search, SQLite, file I/O)
+PDF_WORKERS = 2  # processes for on-demand PDF conversion
+PDF_STREAMING = True  # convert PDFs page range by page range instead of whole-file
+PDF_PAGES_PER_TASK = 4  # pages per worker-process task when streaming
+OLLAMA_TIMEOUT = 300.0  # seconds; captioning a large image on CPU is slow
+EXTRACT_TRIPLETS = False  # run TRIPLET_MODEL over new/changed chunks after indexing (faiss_index/triplets.jsonl)
+TRIPLET_MODEL = "qwen2.5:32b-instruct-q4_0"
+TRIPLET_CONCURRENCY = 2  # in-flight triplet requests across all documents
+CAPTION_CONCURRENCY = 2  # images described by the vision model at once, across all documents
+CAPTION_PROMPT = "Look only at the attached image. If it's code, output it exactly as text. If it's a visual scene, describe it as you would for an image alt-text. Never generate new code. Return only the contents of the image."
 ROOT = Path(__file__).parent.resolve()
-
-
-def get_embedding(text: str) -> np.ndarray:
-    result = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
-    result.raise_for_status()
-    return np.array(result.json()["embedding"], dtype=np.float32)
-
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    words = text.split()
-    for i in range(0, len(words), size - overlap):
-        yield " ".join(words[i:i+size])
-
-def mcp_log(level: str, message: str) -> None:
-    sys.stderr.write(f"{level}: {message}\n")
-    sys.stderr.flush()
-
-# === CHUNKING ===
-
-
-
-
-
-def are_related(chunk1: str, chunk2: str, index: int) -> bool:
-    prompt = f"""
-You are helping to segment a document into topic-based chunks. Unfortunately, the sentences are mixed up.
-
-CHUNK 1: "{chunk1}"
-CHUNK 2: "{chunk2}"
-
-Should these two chunks appear in the **same paragraph or flow of writing**?
-
-Even if the subject changes slightly (e.g., One person to another), treat them as related **if they belong to the same broader context or topic** (like cricket, AI, or real estate). 
-
-Also consider cues like continuity words (e.g., "However", "But", "Also") or references that link the sentences.
-
-Answer with:
-Yes – if the chunks should appear together in the same paragraph or section  
-No – if they are about different topics and should be separated
-
-Just respond in one word (Yes or No), and do not provide any further explanation.
-"""
-    print(f"\nComparing chunk {index} and {index+1}")
-    print(f"  Chunk {index} → {chunk1[:60]}{'...' if len(chunk1) > 60 else ''}")
-    print(f"  Chunk {index+1} → {chunk2[:60]}{'...' if len(chunk2) > 60 else ''}")
-
-    result = requests.post(OLLAMA_CHAT_URL, json={
-        "model": PHI_MODEL,
-        "messages": [{"role": "user", "content": prompt}],
-        "stream": False
-    })
-    result.raise_for_status()
-    reply = result.json().get("message", {}).get("content", "").strip().lower()
-    print(f"Model reply: {reply}")
-    return reply.startswith("yes")
-
+INDEX_DIR = ROOT / "faiss_index"
+# flat | ivf_flat | ivf_pq | hnsw. ANN tiers are trained once the corpus reaches min_vectors;
+# compare recall/latency with rag/index_bench.py before switching.
+INDEX_CONFIG = IndexConfig(kind="flat", min_vectors=10_000, nprobe=16, ef_search=64)
+
+index_manager = IndexManager(INDEX_DIR, config=INDEX_CONFIG)
+# Shared by indexing and query embedding: unchanged chunks and repeat queries never hit Ollama twice
+embedding_cache = EmbeddingCache(INDEX_DIR / "embedding_cache.sqlite")
+embedding_engine = EmbeddingEngine(
+    EMBED_MODEL, OLLAMA_BASE_URL,
+    batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY, cache=embedding_cache
+)
+
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_THRESHOLD)
+triplet_extractor = TripletExtractor(
+    INDEX_DIR / "triplets.jsonl", TRIPLET_MODEL, OLLAMA_BASE_URL, concurrency=TRIPLET_CONCURRENCY
+)
+# Built from the extractor's JSONL (and the legacy truplet_chunker output); refreshed incrementally
+knowledge_graph = KnowledgeGraph(INDEX_DIR / "graph.sqlite")
+TRIPLET_SOURCES = [INDEX_DIR / "triplet_output.json", INDEX_DIR / "triplets.jsonl"]
+
+# Chunking runs in ingestion worker threads, so it uses the blocking embed/chat wrappers
+phi_chat = ollama_chat(PHI_MODEL, OLLAMA_CHAT_URL)
+chunker = make_chunker(
+    CHUNKER, max_words=CHUNK_SIZE, min_words=CHUNK_MIN_WORDS,
+    embed=embedding_engine.embed, chat=phi_chat, refine=LLM_REFINE_CHUNKS
+)
+
+# Tool handlers run on the event loop; anything that blocks goes to these pools
+# so one slow call (a PDF conversion, a large search) never stalls the others.
+tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="rag-tool")
+pdf_pool: Optional[ProcessPoolExecutor] = None  # created on first conversion
+ingestion_task: Optional[asyncio.Task] = None
+
+
+async def offload(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(tool_pool, partial(fn, *args, **kwargs))
+
+
+async def get_embedding(text: str) -> np.ndarray:
+    # Same engine (and endpoint) as indexing, so query and document vectors match
+    return (await embedding_engine.embed_async([text]))[0]
 
 
 @mcp.tool()
-def search_stored_documents_rag(input: SearchDocumentsInput) -> list[str]:
+async def search_stored_documents_rag(input: SearchDocumentsInput) -> list[str]:
     """Search old stored documents like PDF, DOCX, TXT, etc. to get relevant extracts. """
 
-    ensure_faiss_ready()
     query = input.query
     mcp_log("SEARCH", f"Query: {query}")
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
-        query_vec = get_embedding(query ).reshape(1, -1)
-        D, I = index.search(query_vec, k=5)
+        snapshot = await ensure_faiss_ready()
+        generation = snapshot.generation if snapshot is not None else -1
+        cached = query_cache.get_exact(query, generation)
+        if cached is not None:
+            mcp_log("CACHE", f"Exact query hit; {query_cache.stats()}")
+            return list(cached)
+        query_vec = (await get_embedding(query)).reshape(1, -1)
+        cached = query_cache.get_similar(query, query_vec, generation)
+        if cached is not None:
+            mcp_log("CACHE", f"Near-duplicate query hit; {query_cache.stats()}")
+            return list(cached)
         results = []
-        for idx in I[0]:
-            data = metadata[idx]
+        if HYBRID_SEARCH:
+            hits = await offload(index_manager.hybrid_search, query_vec, query, k=5, candidates=HYBRID_CANDIDATES)
+        else:
+            hits = await offload(index_manager.search, query_vec, k=5)
+        for data in hits:
             results.append(f"{data['chunk']}\n[Source: {data['doc']}, ID: {data['chunk_id']}]")
-        return results
+        query_cache.put(query, query_vec, generation, results)
+        return list(results)
     except Exception as e:
         return [f"ERROR: Failed to search: {str(e)}"]
 
 
-def caption_image(img_url_or_path: str) -> str:
-    mcp_log("CAPTION", f"Attempting to caption image: {img_url_or_path}")
-
+async def load_image(img_url_or_path: str) -> bytes:
     # Check if input is a URL
     if img_url_or_path.startswith("http://") or img_url_or_path.startswith("https://"):
-        try:
-            result = requests.get(img_url_or_path)
+        async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
+            result = await client.get(img_url_or_path)
             if result.status_code != 200:
                 raise Exception(f"HTTP {result.status_code}")
-            encoded_image = base64.b64encode(result.content).decode("utf-8")
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to download image from URL: {e}")
-            return f"[Image could not be downloaded: {img_url_or_path}]"
-    else:
-        full_path = Path(__file__).parent / "documents" / img_url_or_path
-        full_path = full_path.resolve()
+            return result.content
 
-        if not full_path.exists():
-            mcp_log("ERROR", f"Image file not found: {full_path}")
-            return f"[Image file not found: {img_url_or_path}]"
+    full_path = (Path(__file__).parent / "documents" / img_url_or_path).resolve()
+    if not full_path.exists():
+        raise FileNotFoundError(f"Image file not found: {full_path}")
+    return await asyncio.to_thread(full_path.read_bytes)
 
-        with open(full_path, "rb") as img_file:
-            encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
 
-
-    try:
-        if img_url_or_path.startswith("http"): # for extract_web_pages
-            result = requests.get(img_url_or_path)
-            encoded_image = base64.b64encode(result.content).decode("utf-8")
-        else:
-            with open(full_path, "rb") as img_file:
-                encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
-
-        # Set stream=True to get the full generator-style output
-        with requests.post(OLLAMA_URL, json={
+async def describe_image(image_bytes: bytes) -> str:
+    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
+    async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
+        # Streamed so long captions don't hit a single read timeout
+        async with client.stream("POST", OLLAMA_URL, json={
                 "model": GEMMA_MODEL,
-                "prompt": "Look only at the attached image. If it's code, output it exactly as text. If it's a visual scene, describe it as you would for an image alt-text. Never generate new code. Return only the contents of the image.",
+                "prompt": CAPTION_PROMPT,
                 "images": [encoded_image],
                 "stream": True
-            }, stream=True) as result:
-
+            }) as result:
+            result.raise_for_status()
             caption_parts = []
-            for line in result.iter_lines():
+            async for line in result.aiter_lines():
                 if not line:
                     continue
                 try:
@@ -171,36 +194,43 @@ def caption_image(img_url_or_path: str) -> str:
                         break
                 except json.JSONDecodeError:
                     continue  # skip malformed lines
+    return "".join(caption_parts).strip()
 
-            caption = "".join(caption_parts).strip()
-            mcp_log("CAPTION", f"Caption generated: {caption}")
-            return caption if caption else "[No caption returned]"
 
-    except Exception as e:
-        mcp_log("ERROR", f"Failed to caption image {img_url_or_path}: {e}")
-        return f"[Image could not be processed: {img_url_or_path}]"
+caption_cache = CaptionCache(INDEX_DIR / "caption_cache.sqlite")
+# The prompt is part of the cache key: changing it re-captions everything
+image_captioner = ImageCaptioner(
+    load_image, describe_image,
+    model=f"{GEMMA_MODEL}:{hashlib.sha256(CAPTION_PROMPT.encode()).hexdigest()[:12]}",
+    cache=caption_cache, concurrency=CAPTION_CONCURRENCY,
+)
 
 
+async def caption_image(img_url_or_path: str) -> str:
+    mcp_log("CAPTION", f"Attempting to caption image: {img_url_or_path}")
+    caption = (await image_captioner.caption_sources([img_url_or_path]))[img_url_or_path]
+    return caption if caption else f"[Image could not be processed: {img_url_or_path}]"
 
 
+async def replace_images_with_captions(markdown: str) -> str:
+    def render(src: str, caption: Optional[str]) -> str:
+        return f"**Image:** {caption}" if caption else f"[Image could not be processed: {src}]"
 
-def replace_images_with_captions(markdown: str) -> str:
-    def replace(match):
-        alt, src = match.group(1), match.group(2)
-        try:
-            caption = caption_image(src)
-            # Attempt to delete only if local and file exists
-            if not src.startswith("http"):
+    markdown, captions = await image_captioner.caption_markdown(markdown, render)
+    for src, caption in captions.items():
+        # Attempt to delete only if local and file exists
+        if caption and not src.startswith("http"):
+            try:
                 img_path = Path(__file__).parent / "documents" / src
                 if img_path.exists():
                     img_path.unlink()
                     mcp_log("INFO", f"Deleted image after captioning: {img_path}")
-            return f"**Image:** {caption}"
-        except Exception as e:
-            mcp_log("WARN", f"Image deletion failed: {e}")
-            return f"[Image could not be processed: {src}]"
-
-    return re.sub(r'!\[(.*?)\]\((.*?)\)', replace, markdown)
+                folder = img_path.parent
+                if folder != ROOT / "documents" / "images" and folder.is_dir() and not any(folder.iterdir()):
+                    folder.rmdir()  # per-document image folder is done
+            except Exception as e:
+                mcp_log("WARN", f"Image deletion failed: {e}")
+    return markdown
 
 
 # @mcp.tool()
@@ -223,233 +253,163 @@ def replace_images_with_captions(markdown: str) -> str:
 #     return MarkdownOutput(markdown=markdown)
 
 @mcp.tool()
-def convert_pdf_to_markdown(input: FilePathInput) -> MarkdownOutput:
+async def convert_pdf_to_markdown(input: FilePathInput) -> MarkdownOutput:
     """Convert PDF to markdown. """
-
+    global pdf_pool
 
     if not os.path.exists(input.file_path):
         return MarkdownOutput(markdown=f"File not found: {input.file_path}")
 
-    ROOT = Path(__file__).parent.resolve()
-    global_image_dir = ROOT / "documents" / "images"
-    global_image_dir.mkdir(parents=True, exist_ok=True)
-
-    # Actual markdown with relative image paths
-    markdown = pymupdf4llm.to_markdown(
-        input.file_path,
-        write_images=True,
-        image_path=str(global_image_dir)
-    )
-
-
-    # Re-point image links in the markdown
-    markdown = re.sub(
-        r'!\[\]\((.*?/images/)([^)]+)\)',
-        r'![](images/\2)',
-        markdown.replace("\\", "/")
-    )
-
-    markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
+    if pdf_pool is None:
+        pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    image_dir = document_image_dir(str(ROOT / "documents" / "images"), input.file_path)
+    # Pages are captioned as they arrive while later ranges are still converting
+    pages = []
+    async for page in stream_pdf_pages(input.file_path, image_dir, pdf_pool, PDF_PAGES_PER_TASK):
+        pages.append(await replace_images_with_captions(page))
+    return MarkdownOutput(markdown="\n\n".join(pages))
 
 
 @mcp.tool()
-def caption_images(img_url_or_path: str) -> str:
-    caption = caption_image(img_url_or_path)
+async def caption_images(img_url_or_path: str) -> str:
+    caption = await caption_image(img_url_or_path)
     return "The contents of this image are: " + caption
 
 
-def semantic_merge(text: str) -> list[str]:
-    """Splits text semantically using LLM: detects second topic and reuses leftover intelligently."""
-    WORD_LIMIT = 512
-    words = text.split()
-    i = 0
-    final_chunks = []
-
-    while i < len(words):
-        # 1. Take next chunk of words (and prepend leftovers if any)
-        chunk_words = words[i:i + WORD_LIMIT]
-        chunk_text = " ".join(chunk_words).strip()
+@mcp.tool()
+async def lookup_relations(input: RelationLookupInput) -> list[str]:
+    """Look up how entities in stored documents are related, e.g. "Gensol" and "Go-Auto". Returns 1-2 hop relation paths from the knowledge graph."""
+    mcp_log("GRAPH", f"Relations: {input.entity} -> {input.other or '*'}")
+    try:
+        await offload(knowledge_graph.refresh, TRIPLET_SOURCES)
+        docs = await offload(index_manager.store.docs)
+        paths = await offload(
+            knowledge_graph.paths, input.entity, input.other,
+            hops=input.hops, limit=input.max_results, docs=docs
+        )
+        if not paths:
+            return [f"No relations found for {input.entity}" + (f" and {input.other}" if input.other else "")]
+        return [knowledge_graph.describe(start, path) for start, path in paths]
+    except Exception as e:
+        return [f"ERROR: Failed to look up relations: {str(e)}"]
 
-        prompt = f"""
-You are a markdown document segmenter.
 
-Here is a portion of a markdown document:
+async def extract_triplets(doc: str, chunks: list[str]):
+    """after_index hook: extract triplets for the new chunks, then fold them into the graph."""
+    if await triplet_extractor.extract(doc, chunks):
+        await offload(knowledge_graph.refresh, TRIPLET_SOURCES)
 
----
-{chunk_text}
----
 
-If this chunk clearly contains **more than one distinct topic or section**, reply ONLY with the **second part**, starting from the first sentence or heading of the new topic.
+def chunk_markdown(markdown: str) -> list[str]:
+    if len(markdown.split()) < 10:
+        mcp_log("WARN", "Content too short for chunking → Skipping chunking.")
+        return [markdown.strip()]
+    return chunker(markdown)
 
-If it's only one topic, reply with NOTHING.
 
-Keep markdown formatting intact.
-"""
+async def process_documents():
+    """Process documents and create FAISS index using unified multimodal strategy."""
+    mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
+    DOC_PATH = ROOT / "documents"
+    INDEX_DIR.mkdir(exist_ok=True)
+
+    doc_index = await offload(DocumentIndex, INDEX_DIR, index_manager, INDEX_CONFIG, embed=embedding_engine.embed)
+    pipeline = IngestionPipeline(
+        doc_index,
+        IngestStages(
+            extract=partial(extract_markdown, image_root=str(DOC_PATH / "images")),
+            enrich=replace_images_with_captions,
+            chunk=chunk_markdown,
+            embed=embedding_engine.embed_async,
+            stream=partial(stream_document, image_root=str(DOC_PATH / "images"), pages_per_task=PDF_PAGES_PER_TASK)
+            if PDF_STREAMING else None,
+            after_index=extract_triplets if EXTRACT_TRIPLETS else None,
+        ),
+        work_dir=INDEX_DIR / "ingest",
+        workers=INGEST_WORKERS,
+        llm_concurrency=LLM_CONCURRENCY,
+    )
+    files = sorted(DOC_PATH.glob("*.*"))
+    await pipeline.run(files)
+    mcp_log("CACHE", f"Embedding cache: {embedding_cache.stats()}")
+    mcp_log("CACHE", f"Caption cache: {caption_cache.stats()}")
+    await offload(finish_index, doc_index, [f.name for f in files])
+    print("READY")
 
-        try:
-            result = requests.post(OLLAMA_CHAT_URL, json={
-                "model": PHI_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "stream": False
-            })
-            reply = result.json().get("message", {}).get("content", "").strip()
-
-            if reply:
-                # If LLM returned second part, separate it
-                split_point = chunk_text.find(reply)
-                if split_point != -1:
-                    first_part = chunk_text[:split_point].strip()
-                    second_part = reply.strip()
-
-                    final_chunks.append(first_part)
-
-                    # Get remaining words from second_part and re-use them in next batch
-                    leftover_words = second_part.split()
-                    words = leftover_words + words[i + WORD_LIMIT:]
-                    i = 0  # restart loop with leftover + remaining
-                    continue
-                else:
-                    # fallback: if split point not found
-                    final_chunks.append(chunk_text)
-            else:
-                final_chunks.append(chunk_text)
 
-        except Exception as e:
-            mcp_log("ERROR", f"Semantic chunking LLM error: {e}")
-            final_chunks.append(chunk_text)
+def finish_index(doc_index: DocumentIndex, present: list[str]):
+    """Drop deleted files, compact if needed and publish whatever changed."""
+    for name in doc_index.stale_documents(present):
+        mcp_log("INFO", f"Removing deleted file from index: {name}")
+        doc_index.remove_document(name)
+    if doc_index.tombstone_ratio() > COMPACT_THRESHOLD or doc_index.needs_rebuild():
+        doc_index.compact()
+    if doc_index.dirty:
+        doc_index.save()
 
-        i += WORD_LIMIT
 
-    return final_chunks
+def start_ingestion() -> asyncio.Task:
+    """Run process_documents() in the background, once; searches keep using the published generation.
 
+    A pass that failed is started again on the next call instead of
+    handing every later search the same exception.
+    """
+    global ingestion_task
+    if ingestion_task is None or ingestion_failed(ingestion_task):
+        ingestion_task = asyncio.create_task(process_documents())
+        ingestion_task.add_done_callback(log_ingestion_failure)
+    return ingestion_task
 
 
+def ingestion_failed(task: asyncio.Task) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
 
 
+def log_ingestion_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        mcp_log("ERROR", f"Document processing failed: {task.exception()}")
 
 
-def process_documents():
-    """Process documents and create FAISS index using unified multimodal strategy."""
-    mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
-    ROOT = Path(__file__).parent.resolve()
-    DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
-    INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
-
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
-    CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-
-    for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
-            mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
-            continue
-
-        mcp_log("PROC", f"Processing: {file.name}")
-        try:
-            ext = file.suffix.lower()
-            markdown = ""
-
-            if ext == ".pdf":
-                mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
-                markdown = convert_pdf_to_markdown(FilePathInput(file_path=str(file))).markdown
-
-            elif ext in [".html", ".htm", ".url"]:
-                mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
-                markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
-
-            else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
-                mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
-
-            if not markdown.strip():
-                mcp_log("WARN", f"No content extracted from {file.name}")
-                continue
-
-            if len(markdown.split()) < 10:
-                mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
-                chunks = [markdown.strip()]
-            else:
-                mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
-                chunks = semantic_merge(markdown)
-
-
-            embeddings_for_file = []
-            new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
-                new_metadata.append({
-                    "doc": file.name,
-                    "chunk": chunk,
-                    "chunk_id": f"{file.stem}_{i}"
-                })
-
-            if embeddings_for_file:
-                if index is None:
-                    dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
-                metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
-
-                # ✅ Immediately save index and metadata
-                CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-                METADATA_FILE.write_text(json.dumps(metadata, indent=2))
-                faiss.write_index(index, str(INDEX_FILE))
-                mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
-
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
-    print("READY")
+def compact_index():
+    """Rebuild the index from live vectors regardless of the tombstone threshold."""
+    doc_index = DocumentIndex(ROOT / "faiss_index", index_manager, INDEX_CONFIG, embed=embedding_engine.embed)
+    mcp_log("INFO", f"Tombstone ratio before compaction: {doc_index.tombstone_ratio():.2%}")
+    doc_index.compact()
+    generation = doc_index.save()
+    mcp_log("SAVE", f"Published compacted index generation {generation}")
 
 
 
-def ensure_faiss_ready():
-    from pathlib import Path
-    index_path = ROOT / "faiss_index" / "index.bin"
-    meta_path = ROOT / "faiss_index" / "metadata.json"
-    if not (index_path.exists() and meta_path.exists()):
-        mcp_log("INFO", "Index not found — running process_documents()...")
-        process_documents()
-    else:
-        mcp_log("INFO", "Index already exists. Skipping regeneration.")
+async def ensure_faiss_ready() -> Optional[IndexSnapshot]:
+    snapshot = await offload(index_manager.current)
+    if snapshot is not None:
+        return snapshot
+    # Nothing published yet: wait for the first ingestion pass instead of starting another.
+    mcp_log("INFO", "Index not found — waiting for process_documents()...")
+    await asyncio.shield(start_ingestion())
+    return await offload(index_manager.current)
 
 
 async def main():
     print("STARTING THE SERVER AT AMAZING LOCATION")
 
-    if len(sys.argv) > 1 and sys.argv[1] == "dev":
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        compact_index()
+    elif len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
     else:
-        # Start the server in a separate thread
-        import threading
-        server_thread = threading.Thread(target=lambda: mcp.run(transport="stdio"))
-        server_thread.daemon = True
-        server_thread.start()
-        
-        # Wait a moment for the server to start
-        await asyncio.sleep(2)
-        
-        # Process documents after server is running
-        process_documents()
-        
-        # Keep the main thread alive
+        # Serve tool calls and ingest documents on the same event loop
+        start_ingestion()
         try:
-            while True:
-                await asyncio.sleep(1)
+            await mcp.run_stdio_async()
         except KeyboardInterrupt:
             print("\nShutting down...")
+        finally:
+            ingestion_task.cancel()
+            await embedding_engine.aclose()
+            tool_pool.shutdown(wait=False, cancel_futures=True)
+            if pdf_pool is not None:
+                pdf_pool.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,94 @@
+import asyncio
+import importlib.util
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE))
+
+from models import RelationLookupInput, SearchDocumentsInput
+from rag.doc_index import DocumentIndex
+from rag.embeddings import l2_normalize
+
+DIM = 8
+SLOW = 0.5  # seconds a stubbed blocking handler holds its thread
+
+
+def load_server(tmp: Path):
+    """Import mcp_server_2 from a copy in `tmp`, so its faiss_index/ and caches live there, not in the repo."""
+    shutil.copy(HERE / "mcp_server_2.py", tmp / "mcp_server_2.py")
+    spec = importlib.util.spec_from_file_location("mcp_server_2_under_test", tmp / "mcp_server_2.py")
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+
+    vectors = l2_normalize(np.random.default_rng(0).standard_normal((3, DIM)).astype(np.float32))
+    doc_index = DocumentIndex(server.INDEX_DIR, server.index_manager)
+    doc_index.replace_document("f22.md", "h", vectors, [
+        {"doc": "f22.md", "chunk_id": f"f22_{i}", "chunk": f"F22 engine fact {i}"} for i in range(3)
+    ])
+    doc_index.save()
+
+    async def embed_async(texts):
+        return vectors[:len(texts)]
+
+    server.embedding_engine.embed_async = embed_async  # no Ollama
+    return server
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+def test_slow_tool_does_not_block_a_concurrent_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        server = load_server(Path(tmp))
+        # A large triplet file makes the graph refresh slow, and it blocks its thread while it runs
+        server.knowledge_graph.refresh = lambda sources: time.sleep(SLOW) or 0
+
+        async def go():
+            lookup = asyncio.create_task(timed(server.lookup_relations(RelationLookupInput(entity="Gensol"))))
+            await asyncio.sleep(0.05)  # the refresh is now running in the tool pool
+            search = await timed(server.search_stored_documents_rag(SearchDocumentsInput(query="F22 engine")))
+            return search, await lookup
+
+        (hits, search_s), (relations, lookup_s) = asyncio.run(go())
+        assert hits and hits[0].startswith("F22 engine fact") and "[Source: f22.md" in hits[0]
+        assert relations == ["No relations found for Gensol"]
+        assert lookup_s >= SLOW
+        assert search_s < SLOW / 2, f"search waited {search_s:.2f}s behind the slow tool"
+        server.tool_pool.shutdown(wait=True)
+
+
+def test_slow_searches_run_side_by_side():
+    with tempfile.TemporaryDirectory() as tmp:
+        server = load_server(Path(tmp))
+        search = server.index_manager.hybrid_search
+
+        def slow_search(*args, **kwargs):
+            time.sleep(SLOW)
+            return search(*args, **kwargs)
+
+        server.index_manager.hybrid_search = slow_search
+
+        async def go():
+            queries = [f"F22 engine question {i}" for i in range(3)]
+            return await timed(asyncio.gather(*(
+                server.search_stored_documents_rag(SearchDocumentsInput(query=q)) for q in queries
+            )))
+
+        results, elapsed = asyncio.run(go())
+        assert all(r and r[0].startswith("F22 engine fact") for r in results)
+        assert elapsed < 2 * SLOW, f"three searches took {elapsed:.2f}s; they ran one after another"
+        server.tool_pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    test_slow_tool_does_not_block_a_concurrent_search()
+    test_slow_searches_run_side_by_side()
@@ -167,6 +167,12 @@ class SearchInput(BaseModel):
 class SearchDocumentsInput(BaseModel):
     query: str
 
+class RelationLookupInput(BaseModel):
+    entity: str
+    other: Optional[str] = Field(default=None, description="Second entity; only relations linking the two are returned")
+    hops: int = Field(default=2, description="Maximum path length, 1 or 2")
+    max_results: int = Field(default=20, description="Maximum number of relations to return")
+
 class UrlInput(BaseModel):
     url: str
 
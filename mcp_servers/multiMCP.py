@@ -29,11 +29,17 @@ class MCP:
         self.transport = transport
         self.session: Optional[ClientSession] = None
         self.session_context = None
+        self._session_lock = asyncio.Lock()  # concurrent agent sessions share one client
 
     async def ensure_session(self):
         if self.session:
             return self.session
+        async with self._session_lock:
+            if self.session:
+                return self.session
+            return await self._open_session()
 
+    async def _open_session(self):
         if self.transport == "stdio":
             params = StdioServerParameters(
                 command=self.server_command,
@@ -49,10 +55,11 @@ class MCP:
             raise ValueError(f"Unsupported transport: {self.transport}")
 
         read, write = await self.session_context.__aenter__()
-        self.session = ClientSession(read, write)
-        await self.session.__aenter__()
-        await self.session.initialize()
-        return self.session
+        session = ClientSession(read, write)
+        await session.__aenter__()
+        await session.initialize()
+        self.session = session  # published only once initialized
+        return session
 
     async def list_tools(self):
         session = await self.ensure_session()
@@ -187,6 +194,15 @@ class MultiMCP:
     def get_all_tools(self) -> List[Any]:
         return [entry["tool"] for entry in self.tool_map.values()]
 
+    def is_raceable(self, tool_name: str) -> bool:
+        """False for tools with state or side effects (server `raceable: false`, or listed in its
+        `stateful_tools`); running two code variants that call them at once is unsafe."""
+        entry = self.tool_map.get(tool_name)
+        if not entry:
+            return True
+        config = entry["config"]
+        return config.get("raceable", True) and tool_name not in config.get("stateful_tools", [])
+
     def get_tools_from_servers(self, selected_servers: List[str]) -> List[Any]:
         tools = []
         for server in selected_servers:
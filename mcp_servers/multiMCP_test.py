@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from mcp_servers.multiMCP import MultiMCP
+
+
+def configured_multi_mcp(tools_by_server: dict) -> MultiMCP:
+    """MultiMCP over config/mcp_server_config.yaml, with tool lists filled in instead of connecting."""
+    with open(ROOT / "config" / "mcp_server_config.yaml", "r") as f:
+        configs = yaml.safe_load(f)["mcp_servers"]
+    multi_mcp = MultiMCP(configs)
+    for config in configs:
+        for name in tools_by_server.get(config["id"], []):
+            multi_mcp.tool_map[name] = {"config": config, "tool": SimpleNamespace(name=name)}
+    return multi_mcp
+
+
+def test_pdf_conversion_and_browser_are_not_raced():
+    multi_mcp = configured_multi_mcp({
+        "documents": ["search_stored_documents_rag", "convert_pdf_to_markdown", "lookup_relations"],
+        "webbrowsing": ["go_to_url", "get_page_structure"],
+    })
+    assert multi_mcp.is_raceable("search_stored_documents_rag")
+    assert multi_mcp.is_raceable("lookup_relations")
+    assert not multi_mcp.is_raceable("convert_pdf_to_markdown")
+    assert not multi_mcp.is_raceable("go_to_url") and not multi_mcp.is_raceable("get_page_structure")
+    assert multi_mcp.is_raceable("unknown_tool")
+
+
+if __name__ == "__main__":
+    test_pdf_conversion_and_browser_are_not_raced()
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+from rag.common import mcp_log
+
+IMAGE_REF = re.compile(r'!\[(.*?)\]\((.*?)\)')
+
+
+class CaptionCache:
+    """Persistent captions keyed by (model, sha256 of the image bytes)."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS captions ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, caption TEXT NOT NULL,"
+            " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def image_hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, str]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):  # stay under SQLite's variable limit
+                batch = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, caption FROM captions WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put(self, model: str, image_hash: str, caption: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO captions VALUES (?, ?, ?)", (model, image_hash, caption))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ImageCaptioner:
+    """Captions a batch of image sources with one model call per distinct image.
+
+    Every source is loaded once, sources with identical bytes (a logo or page
+    header repeated on every page) share one caption, cached captions are
+    reused across documents and runs, and the remaining images are described
+    concurrently, bounded by `concurrency` across all callers.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Awaitable[bytes]],
+        describe: Callable[[bytes], Awaitable[str]],
+        model: str,
+        cache: Optional[CaptionCache] = None,
+        concurrency: int = 2,
+    ):
+        self.load = load
+        self.describe = describe
+        self.model = model  # cache namespace; include anything that changes the caption, e.g. the prompt
+        self.cache = cache
+        self._slots = asyncio.Semaphore(concurrency)  # model calls
+        self._io = asyncio.Semaphore(8)               # downloads / file reads
+
+    async def _load(self, src: str) -> Optional[bytes]:
+        try:
+            async with self._io:
+                return await self.load(src)
+        except Exception as e:
+            mcp_log("ERROR", f"Failed to load image {src}: {e}")
+            return None
+
+    async def _describe(self, image_hash: str, data: bytes, sources: list[str]) -> Optional[str]:
+        try:
+            async with self._slots:
+                caption = (await self.describe(data)).strip()
+        except Exception as e:
+            mcp_log("ERROR", f"Failed to caption image {sources[0]}: {e}")
+            return None
+        if not caption:
+            return None
+        mcp_log("CAPTION", f"Caption generated for {len(sources)} reference(s): {caption}")
+        if self.cache is not None:
+            self.cache.put(self.model, image_hash, caption)
+        return caption
+
+    async def caption_sources(self, sources: Iterable[str]) -> dict[str, Optional[str]]:
+        """Caption for every source, or None where it could not be loaded or described."""
+        sources = list(dict.fromkeys(sources))
+        blobs = await asyncio.gather(*(self._load(src) for src in sources))
+
+        by_hash: dict[str, list[str]] = {}
+        data: dict[str, bytes] = {}
+        captions: dict[str, Optional[str]] = {}
+        for src, blob in zip(sources, blobs):
+            if blob is None:
+                captions[src] = None
+                continue
+            h = CaptionCache.image_hash(blob)
+            by_hash.setdefault(h, []).append(src)
+            data[h] = blob
+
+        known = self.cache.get_many(self.model, list(by_hash)) if self.cache is not None else {}
+        missing = [h for h in by_hash if h not in known]
+        if by_hash:
+            mcp_log("CAPTION", f"{len(sources)} images, {len(by_hash)} distinct, {len(missing)} to caption")
+        described = await asyncio.gather(*(self._describe(h, data[h], by_hash[h]) for h in missing))
+        known.update(zip(missing, described))
+
+        for h, srcs in by_hash.items():
+            for src in srcs:
+                captions[src] = known[h]
+        return captions
+
+    async def caption_markdown(self, markdown: str, render: Callable[[str, Optional[str]], str]) -> tuple[str, dict[str, Optional[str]]]:
+        """Caption every image reference, then substitute `render(src, caption)` in one pass."""
+        captions = await self.caption_sources(m.group(2) for m in IMAGE_REF.finditer(markdown))
+        if not captions:
+            return markdown, captions
+        return IMAGE_REF.sub(lambda m: render(m.group(2), captions[m.group(2)]), markdown), captions
@@ -0,0 +1,115 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.captions import CaptionCache, ImageCaptioner
+
+# Three references to one logo, a chart, and a broken link
+IMAGES = {"logo-p1.png": b"LOGO", "logo-p2.png": b"LOGO", "logo-p3.png": b"LOGO", "chart.png": b"CHART"}
+PHOTOS = {f"photo{i}.png": f"PHOTO{i}".encode() for i in range(6)}
+
+
+class StubModel:
+    """Image loader and captioning model that record how often they are called."""
+
+    def __init__(self, fail_on: bytes = b""):
+        self.loaded: list[str] = []
+        self.described: list[bytes] = []
+        self.in_flight = 0
+        self.peak = 0
+        self.fail_on = fail_on
+
+    async def load(self, src: str) -> bytes:
+        self.loaded.append(src)
+        data = IMAGES.get(src) or PHOTOS.get(src)
+        if data is None:
+            raise FileNotFoundError(src)
+        return data
+
+    async def describe(self, data: bytes) -> str:
+        self.described.append(data)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if data == self.fail_on:
+                raise TimeoutError("model timed out")
+            return f" a {data.decode().lower()} "
+        finally:
+            self.in_flight -= 1
+
+
+def captioner(model: StubModel, cache: CaptionCache = None, concurrency: int = 2) -> ImageCaptioner:
+    return ImageCaptioner(model.load, model.describe, "gemma3:12b", cache, concurrency)
+
+
+def test_identical_images_share_one_caption():
+    model = StubModel()
+    captions = asyncio.run(captioner(model).caption_sources(
+        ["logo-p1.png", "chart.png", "logo-p2.png", "logo-p1.png", "logo-p3.png", "missing.png"]
+    ))
+    assert captions == {
+        "logo-p1.png": "a logo", "logo-p2.png": "a logo", "logo-p3.png": "a logo",
+        "chart.png": "a chart", "missing.png": None,
+    }
+    assert sorted(model.described) == [b"CHART", b"LOGO"]
+    assert model.loaded.count("logo-p1.png") == 1  # repeated references load once
+
+
+def test_cache_is_reused_across_runs_and_keyed_by_model():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "captions.sqlite"
+        first = StubModel()
+        asyncio.run(captioner(first, CaptionCache(path)).caption_sources(["logo-p1.png", "chart.png"]))
+        assert len(first.described) == 2
+
+        cache = CaptionCache(path)  # a later run, another document with the same logo
+        again = StubModel()
+        captions = asyncio.run(captioner(again, cache).caption_sources(["logo-p3.png", "chart.png"]))
+        assert captions == {"logo-p3.png": "a logo", "chart.png": "a chart"}
+        assert again.described == []
+        assert cache.stats() == {"hits": 2, "misses": 0, "hit_rate": 1.0}
+
+        other = StubModel()
+        asyncio.run(ImageCaptioner(other.load, other.describe, "llava", cache).caption_sources(["chart.png"]))
+        assert other.described == [b"CHART"]
+
+
+def test_failed_captions_are_not_cached():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CaptionCache(Path(tmp) / "captions.sqlite")
+        failing = StubModel(fail_on=b"CHART")
+        captions = asyncio.run(captioner(failing, cache).caption_sources(["chart.png", "logo-p1.png"]))
+        assert captions == {"chart.png": None, "logo-p1.png": "a logo"}
+
+        retry = StubModel()
+        captions = asyncio.run(captioner(retry, cache).caption_sources(["chart.png", "logo-p1.png"]))
+        assert captions["chart.png"] == "a chart" and retry.described == [b"CHART"]
+
+
+def test_model_calls_are_bounded():
+    model = StubModel()
+    asyncio.run(captioner(model, concurrency=2).caption_sources(list(PHOTOS)))
+    assert len(model.described) == 6 and model.peak == 2
+
+
+def test_caption_markdown_substitutes_every_reference():
+    markdown = "Intro ![](logo-p1.png) text ![fig](chart.png)\n![x](logo-p2.png) ![](missing.png)"
+    render = lambda src, caption: f"**Image:** {caption}" if caption else f"[Image: {src}]"
+    model = StubModel()
+    out, captions = asyncio.run(captioner(model).caption_markdown(markdown, render))
+    assert out == "Intro **Image:** a logo text **Image:** a chart\n**Image:** a logo [Image: missing.png]"
+    assert len(captions) == 4 and len(model.described) == 2
+
+    assert asyncio.run(captioner(model).caption_markdown("no images here", render)) == ("no images here", {})
+
+
+if __name__ == "__main__":
+    test_identical_images_share_one_caption()
+    test_cache_is_reused_across_runs_and_keyed_by_model()
+    test_failed_captions_are_not_cached()
+    test_model_calls_are_bounded()
+    test_caption_markdown_substitutes_every_reference()
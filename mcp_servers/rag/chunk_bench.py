@@ -0,0 +1,101 @@
+"""Throughput and retrieval quality of the chunking strategies.
+
+Runs each strategy over the plain-text documents in documents/ (markdown
+and .txt, so no extraction is involved) and reports chunks/sec and
+words/sec. Unless --no-retrieval is given it then embeds the chunks with
+Ollama and asks sentence queries cut from the documents: a hit means a
+top-k chunk contains the sentence.
+
+    python rag/chunk_bench.py --strategies structural,embedding,llm --k 3
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.chunking import CHUNKERS, SENTENCE_END, make_chunker, ollama_chat, word_count
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import EmbeddingEngine
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def sample_queries(docs: dict[str, str], per_doc: int, rng: np.random.Generator) -> list[str]:
+    queries = []
+    for text in docs.values():
+        sentences = [s for s in SENTENCE_END.split(re.sub(r"\s+", " ", text)) if 8 <= word_count(s) <= 40]
+        picks = rng.choice(len(sentences), size=min(per_doc, len(sentences)), replace=False) if sentences else []
+        queries.extend(sentences[int(i)] for i in picks)
+    return queries
+
+
+def retrieval(engine: EmbeddingEngine, chunks: list[str], queries: list[str], k: int) -> tuple[float, float]:
+    vectors = engine.embed(chunks)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    _, I = index.search(engine.embed(queries), k)
+    chunk_text = [normalise(c) for c in chunks]
+    hits, rr = 0, 0.0
+    for query, row in zip(queries, I):
+        needle = normalise(query)
+        for rank, idx in enumerate(row, start=1):
+            if idx >= 0 and needle in chunk_text[idx]:
+                hits += 1
+                rr += 1 / rank
+                break
+    return hits / len(queries), rr / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=Path, default=SERVER_DIR / "documents")
+    parser.add_argument("--strategies", default="structural,embedding")
+    parser.add_argument("--max-words", type=int, default=256)
+    parser.add_argument("--refine", action="store_true", help="add the LLM refinement pass")
+    parser.add_argument("--queries-per-doc", type=int, default=20)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--no-retrieval", action="store_true")
+    parser.add_argument("--embed-model", default="nomic-embed-text")
+    parser.add_argument("--chat-model", default="phi4:latest")
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    docs = {p.name: p.read_text(encoding="utf-8", errors="ignore")
+            for p in sorted(args.docs.glob("*")) if p.suffix in (".md", ".txt")}
+    total_words = sum(word_count(t) for t in docs.values())
+    engine = EmbeddingEngine(args.embed_model, args.base_url,
+                             cache=EmbeddingCache(SERVER_DIR / "faiss_index" / "embedding_cache.sqlite"))
+    chat = ollama_chat(args.chat_model, f"{args.base_url}/api/chat")
+    queries = sample_queries(docs, args.queries_per_doc, np.random.default_rng(args.seed))
+    print(f"{len(docs)} documents, {total_words} words, {len(queries)} sentence queries, hit@{args.k}\n")
+    print(f"{'strategy':<12} {'chunks':>7} {'avg words':>10} {'chunks/s':>10} {'words/s':>10} {'hit':>6} {'mrr':>6}")
+
+    for strategy in args.strategies.split(","):
+        if strategy not in CHUNKERS:
+            sys.exit(f"Unknown strategy '{strategy}', expected one of {CHUNKERS}")
+        chunker = make_chunker(strategy, max_words=args.max_words, embed=engine.embed, chat=chat, refine=args.refine)
+        start = time.perf_counter()
+        chunks = [chunk for text in docs.values() for chunk in chunker(text) if chunk.strip()]
+        elapsed = time.perf_counter() - start
+
+        hit = mrr = float("nan")
+        if not args.no_retrieval:
+            hit, mrr = retrieval(engine, chunks, queries, args.k)
+        label = strategy + ("+refine" if args.refine and strategy != "llm" else "")
+        print(f"{label:<12} {len(chunks):7d} {total_words / len(chunks):10.1f} "
+              f"{len(chunks) / elapsed:10.1f} {total_words / elapsed:10.0f} {hit:6.3f} {mrr:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
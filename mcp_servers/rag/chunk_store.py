@@ -0,0 +1,165 @@
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE chunks_fts USING fts5(
+    text, doc, content='chunks', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER chunks_fts_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text, doc) VALUES (new.id, new.text, new.doc);
+END;
+CREATE TRIGGER chunks_fts_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text, doc) VALUES ('delete', old.id, old.text, old.doc);
+END;
+"""
+
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 OR-query of quoted terms, so punctuation can't break the syntax."""
+    terms = dict.fromkeys(t.lower() for t in re.findall(r"\w+", query))
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class ChunkStore:
+    """SQLite table of chunks keyed by FAISS vector ID.
+
+    Searches fetch only the rows for the IDs FAISS returned; ingestion inserts
+    and deletes rows per document instead of rewriting a JSON list. An FTS5
+    index over the chunk text is kept in step by triggers, which gives BM25
+    keyword search over the same rows.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA recursive_triggers=ON")  # INSERT OR REPLACE must fire the delete trigger
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                doc TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_doc ON chunks(doc);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        has_fts = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+        ).fetchone()
+        if not has_fts:
+            # Stores created before keyword search: index the existing rows once.
+            self._conn.executescript(FTS_SCHEMA)
+            self._conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+        self._conn.commit()
+
+    # ── reads ────────────────────────────────────────────────────
+
+    def fetch(self, ids: Iterable[int]) -> dict[int, dict]:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, doc, chunk_id, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {r[0]: {"id": r[0], "doc": r[1], "chunk_id": r[2], "chunk": r[3]} for r in rows}
+
+    def keyword_search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Top-k (id, bm25) pairs for `query`; lower scores are better matches."""
+        expr = match_expression(query)
+        if not expr:
+            return []
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rowid, bm25(chunks_fts, 1.0, 0.5) AS score FROM chunks_fts "
+                "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+                (expr, k),
+            ).fetchall()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def all_ids(self) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks ORDER BY id").fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    def ids_for_doc(self, doc: str) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks WHERE doc = ? ORDER BY id", (doc,)).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    def doc_ranges(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT doc, MIN(id), MAX(id) + 1 FROM chunks GROUP BY doc").fetchall()
+        return {doc: (start, end) for doc, start, end in rows}
+
+    def docs(self) -> set[str]:
+        with self._lock:
+            return {r[0] for r in self._conn.execute("SELECT DISTINCT doc FROM chunks")}
+
+    def texts(self, ids: np.ndarray) -> list[str]:
+        rows = self.fetch(ids)
+        return [rows[int(i)]["chunk"] for i in ids]
+
+    def iter_rows(self, batch: int = 1000):
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, doc, chunk_id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield {"id": r[0], "doc": r[1], "chunk_id": r[2], "chunk": r[3]}
+            last = rows[-1][0]
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    # ── writes ───────────────────────────────────────────────────
+
+    def insert(self, entries: list[dict]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, doc, chunk_id, text) VALUES (?, ?, ?, ?)",
+                [(e["id"], e["doc"], e["chunk_id"], e["chunk"]) for e in entries],
+            )
+            self._conn.commit()
+
+    def delete_ids(self, ids: Iterable[int]):
+        ids = [(int(i),) for i in ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", ids)
+            self._conn.commit()
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def import_json(self, metadata_file: Path) -> int:
+        """One-off migration from the old metadata.json list (positional IDs unless rows carry one)."""
+        entries = json.loads(Path(metadata_file).read_text())
+        for i, entry in enumerate(entries):
+            entry.setdefault("id", i)
+        self.insert(entries)
+        return len(entries)
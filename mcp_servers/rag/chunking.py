@@ -0,0 +1,373 @@
+"""Chunking strategies for the ingestion pipeline.
+
+Every chunker is a plain `markdown -> list[str]` callable, so strategies can
+be swapped (see `make_chunker`) or stacked with the optional LLM refinement
+pass without the pipeline knowing which one it runs.
+
+  structural  headings, paragraphs and sentences packed into a word budget
+  embedding   same units, split where adjacent sentence embeddings diverge
+  llm         the original phi4 segmenter, one chat call per 512-word window
+"""
+import re
+from typing import Callable, Optional
+
+import numpy as np
+import requests
+
+from rag.common import mcp_log
+
+CHUNKERS = ("structural", "embedding", "llm")
+
+HEADING = re.compile(r"^#{1,6}\s")
+SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+# Lines that must stay whole: tables, list items, image captions, code fences
+ATOMIC_LINE = re.compile(r"^\s*(\||[-*+]\s|\d+[.)]\s|\*\*Image:\*\*|```)")
+
+RELATED_PROMPT = """
+You are helping to segment a document into topic-based chunks. Unfortunately, the sentences are mixed up.
+
+CHUNK 1: "{chunk1}"
+CHUNK 2: "{chunk2}"
+
+Should these two chunks appear in the **same paragraph or flow of writing**?
+
+Even if the subject changes slightly (e.g., One person to another), treat them as related **if they belong to the same broader context or topic** (like cricket, AI, or real estate).
+
+Also consider cues like continuity words (e.g., "However", "But", "Also") or references that link the sentences.
+
+Answer with:
+Yes – if the chunks should appear together in the same paragraph or section
+No – if they are about different topics and should be separated
+
+Just respond in one word (Yes or No), and do not provide any further explanation.
+"""
+
+SEGMENT_PROMPT = """
+You are a markdown document segmenter.
+
+Here is a portion of a markdown document:
+
+---
+{chunk_text}
+---
+
+If this chunk clearly contains **more than one distinct topic or section**, reply ONLY with the **second part**, starting from the first sentence or heading of the new topic.
+
+If it's only one topic, reply with NOTHING.
+
+Keep markdown formatting intact.
+"""
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def ollama_chat(model: str, chat_url: str) -> Callable[[str], str]:
+    """Blocking single-turn chat against Ollama; meant to run in a worker thread."""
+    session = requests.Session()
+
+    def chat(prompt: str) -> str:
+        result = session.post(chat_url, json={
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False
+        })
+        result.raise_for_status()
+        return result.json().get("message", {}).get("content", "").strip()
+
+    return chat
+
+
+# ── units ────────────────────────────────────────────────────────
+
+def split_sections(markdown: str) -> list[str]:
+    """Split before every heading; each section starts with its heading line."""
+    sections, current = [], []
+    for line in markdown.splitlines():
+        if HEADING.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return sections
+
+
+def split_units(section: str) -> list[str]:
+    """Sentences of prose paragraphs; tables, lists, headings and code stay line- or block-whole."""
+    units = []
+    in_code = False
+    for block in re.split(r"\n\s*\n", section):
+        lines = block.strip().splitlines()
+        prose: list[str] = []
+
+        def flush():
+            if prose:
+                units.extend(s.strip() for s in SENTENCE_END.split(" ".join(prose)) if s.strip())
+                prose.clear()
+
+        for line in lines:
+            if line.strip().startswith("```"):
+                flush()
+                if in_code:
+                    units[-1] += "\n" + line
+                else:
+                    units.append(line)
+                in_code = not in_code
+            elif in_code:
+                units[-1] += "\n" + line
+            elif HEADING.match(line) or ATOMIC_LINE.match(line):
+                flush()
+                units.append(line.strip())
+            else:
+                prose.append(line.strip())
+        flush()
+    return units
+
+
+def split_oversized(unit: str, max_words: int) -> list[str]:
+    """Split a unit over `max_words` on line boundaries, keeping code and tables line-intact.
+
+    Only a single line that is itself too long is cut between words.
+    """
+    if word_count(unit) <= max_words:
+        return [unit]
+    pieces, current, size = [], [], 0
+    for line in unit.splitlines():
+        n = word_count(line)
+        if n > max_words:
+            if current:
+                pieces.append("\n".join(current))
+                current, size = [], 0
+            words = line.split()
+            pieces.extend(" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words))
+            continue
+        if current and size + n > max_words:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += n
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def join_units(units: list[str]) -> str:
+    out = ""
+    for unit in units:
+        if not out:
+            out = unit
+        elif HEADING.match(unit) or ATOMIC_LINE.match(unit) or ATOMIC_LINE.match(out.splitlines()[-1]):
+            out += "\n" + unit
+        else:
+            out += " " + unit
+    return out
+
+
+# ── chunkers ─────────────────────────────────────────────────────
+
+class StructuralChunker:
+    """Greedy packing of sentence/line units into chunks of at most `max_words`.
+
+    Chunks never straddle a heading; sections shorter than `min_words` are
+    merged into the following one so headings aren't indexed on their own.
+    """
+
+    def __init__(self, max_words: int = 256, min_words: int = 40):
+        self.max_words = max_words
+        self.min_words = min_words
+
+    def sections(self, markdown: str) -> list[list[str]]:
+        sections = []
+        carry: list[str] = []
+        for section in split_sections(markdown):
+            units = [u for unit in split_units(section) for u in split_oversized(unit, self.max_words)]
+            units = carry + units
+            if sum(word_count(u) for u in units) < self.min_words:
+                carry = units
+                continue
+            sections.append(units)
+            carry = []
+        if carry:
+            if sections:
+                sections[-1].extend(carry)
+            else:
+                sections.append(carry)
+        return sections
+
+    def pack(self, units: list[str], breaks: Optional[set[int]] = None) -> list[str]:
+        """Pack units greedily, also starting a new chunk before any index in `breaks`."""
+        chunks, current, size = [], [], 0
+        for i, unit in enumerate(units):
+            n = word_count(unit)
+            if current and (size + n > self.max_words or (breaks and i in breaks and size >= self.min_words)):
+                chunks.append(join_units(current))
+                current, size = [], 0
+            current.append(unit)
+            size += n
+        if current:
+            chunks.append(join_units(current))
+        return chunks
+
+    def __call__(self, markdown: str) -> list[str]:
+        return [chunk for units in self.sections(markdown) for chunk in self.pack(units)]
+
+
+class EmbeddingBoundaryChunker(StructuralChunker):
+    """Structural chunking that also breaks where the topic shifts.
+
+    All units of a document are embedded in one batched call; a boundary is
+    placed between units whose cosine similarity (each side averaged over a
+    `window` of neighbouring units) falls in the lowest `percentile` of the
+    document.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[list[str]], np.ndarray],
+        max_words: int = 256,
+        min_words: int = 40,
+        window: int = 2,
+        percentile: float = 20.0,
+    ):
+        super().__init__(max_words, min_words)
+        self.embed = embed
+        self.window = window
+        self.percentile = percentile
+
+    def boundaries(self, units: list[str]) -> set[int]:
+        if len(units) < 3:
+            return set()
+        vectors = np.asarray(self.embed(units), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        # Rolling sums give each gap a left and right context window in O(n)
+        cumulative = np.vstack([np.zeros((1, vectors.shape[1]), dtype=np.float32), np.cumsum(vectors, axis=0)])
+        gaps = np.arange(1, len(units))
+        left = cumulative[gaps] - cumulative[np.maximum(gaps - self.window, 0)]
+        right = cumulative[np.minimum(gaps + self.window, len(units))] - cumulative[gaps]
+        similarity = (left * right).sum(axis=1) / (
+            np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1) + 1e-12
+        )
+        cutoff = np.percentile(similarity, self.percentile)
+        return {int(g) for g, s in zip(gaps, similarity) if s <= cutoff}
+
+    def __call__(self, markdown: str) -> list[str]:
+        sections = self.sections(markdown)
+        units = [u for section in sections for u in section]
+        breaks = self.boundaries(units)
+        chunks, offset = [], 0
+        for section in sections:
+            local = {i - offset for i in breaks if offset < i < offset + len(section)}
+            chunks.extend(self.pack(section, local))
+            offset += len(section)
+        return chunks
+
+
+class LLMSegmenter:
+    """The original segmenter: asks the LLM for the second topic in each 512-word window."""
+
+    def __init__(self, chat: Callable[[str], str], window_words: int = 512):
+        self.chat = chat
+        self.window_words = window_words
+
+    def __call__(self, text: str) -> list[str]:
+        words = text.split()
+        i = 0
+        final_chunks = []
+
+        while i < len(words):
+            # 1. Take next chunk of words (and prepend leftovers if any)
+            chunk_words = words[i:i + self.window_words]
+            chunk_text = " ".join(chunk_words).strip()
+
+            try:
+                reply = self.chat(SEGMENT_PROMPT.format(chunk_text=chunk_text))
+
+                if reply:
+                    # If LLM returned second part, separate it
+                    split_point = chunk_text.find(reply)
+                    if split_point != -1:
+                        first_part = chunk_text[:split_point].strip()
+                        second_part = reply.strip()
+
+                        final_chunks.append(first_part)
+
+                        # Get remaining words from second_part and re-use them in next batch
+                        leftover_words = second_part.split()
+                        words = leftover_words + words[i + self.window_words:]
+                        i = 0  # restart loop with leftover + remaining
+                        continue
+                    else:
+                        # fallback: if split point not found
+                        final_chunks.append(chunk_text)
+                else:
+                    final_chunks.append(chunk_text)
+
+            except Exception as e:
+                mcp_log("ERROR", f"Semantic chunking LLM error: {e}")
+                final_chunks.append(chunk_text)
+
+            i += self.window_words
+
+        return final_chunks
+
+
+def llm_related(chat: Callable[[str], str], chunk1: str, chunk2: str) -> bool:
+    return chat(RELATED_PROMPT.format(chunk1=chunk1, chunk2=chunk2)).strip().lower().startswith("yes")
+
+
+class LLMRefiner:
+    """Optional pass over another chunker's output: merge adjacent chunks the LLM calls related.
+
+    Only pairs that would still fit in `max_words` together are asked about,
+    so the number of LLM calls is bounded by the number of small chunks
+    rather than by document length.
+    """
+
+    def __init__(self, base: Callable[[str], list[str]], chat: Callable[[str], str], max_words: int = 256):
+        self.base = base
+        self.chat = chat
+        self.max_words = max_words
+
+    def __call__(self, markdown: str) -> list[str]:
+        chunks = self.base(markdown)
+        merged: list[str] = []
+        for chunk in chunks:
+            if merged and word_count(merged[-1]) + word_count(chunk) <= self.max_words:
+                try:
+                    if llm_related(self.chat, merged[-1], chunk):
+                        merged[-1] = merged[-1] + "\n\n" + chunk
+                        continue
+                except Exception as e:
+                    mcp_log("ERROR", f"Chunk refinement LLM error: {e}")
+            merged.append(chunk)
+        return merged
+
+
+def make_chunker(
+    strategy: str,
+    max_words: int = 256,
+    min_words: int = 40,
+    embed: Optional[Callable[[list[str]], np.ndarray]] = None,
+    chat: Optional[Callable[[str], str]] = None,
+    refine: bool = False,
+) -> Callable[[str], list[str]]:
+    if strategy == "structural":
+        chunker = StructuralChunker(max_words, min_words)
+    elif strategy == "embedding":
+        if embed is None:
+            raise ValueError("The embedding chunker needs an embed function")
+        chunker = EmbeddingBoundaryChunker(embed, max_words, min_words)
+    elif strategy == "llm":
+        if chat is None:
+            raise ValueError("The llm chunker needs a chat function")
+        chunker = LLMSegmenter(chat)
+    else:
+        raise ValueError(f"Unknown chunker '{strategy}', expected one of {CHUNKERS}")
+
+    if refine:
+        if chat is None:
+            raise ValueError("LLM refinement needs a chat function")
+        chunker = LLMRefiner(chunker, chat, max_words)
+    return chunker
@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.chunking import (
+    EmbeddingBoundaryChunker,
+    LLMRefiner,
+    LLMSegmenter,
+    StructuralChunker,
+    make_chunker,
+    split_oversized,
+    split_units,
+    word_count,
+)
+
+DOC = """# Engines
+
+The F-22 uses two Pratt & Whitney F119 engines. Each engine produces about 35,000 lbf of thrust. Thrust vectoring improves agility.
+
+| Engine | Thrust |
+| --- | --- |
+| F119 | 35,000 lbf |
+
+# Airframe
+
+The airframe uses titanium alloys and composites. Stealth shaping reduces the radar cross section.
+
+- internal weapons bays
+- serrated panel edges
+"""
+
+
+def test_split_units_keeps_tables_and_lists_whole():
+    units = split_units(DOC)
+    assert "# Engines" in units
+    assert "| F119 | 35,000 lbf |" in units
+    assert "- internal weapons bays" in units
+    assert "Each engine produces about 35,000 lbf of thrust." in units
+
+
+def test_split_oversized_prefers_line_boundaries():
+    code = "```python\n" + "\n".join(f"x{i} = compute(a, b, c)" for i in range(6)) + "\n```"
+    pieces = split_oversized(code, max_words=10)
+    assert all(word_count(p) <= 10 for p in pieces)
+    # every line survives intact, in order, with its own newline
+    assert "\n".join(pieces).splitlines() == code.splitlines()
+
+    long_line = " ".join(f"w{i}" for i in range(25))
+    mixed = "short line here\n" + long_line + "\nlast line"
+    pieces = split_oversized(mixed, max_words=10)
+    assert pieces[0] == "short line here"
+    assert pieces[-1] == "last line"
+    assert " ".join(pieces[1:-1]) == long_line  # only the over-long line is cut between words
+
+    assert split_oversized("fits as is", 10) == ["fits as is"]
+
+
+def test_structural_chunker_respects_budget_and_headings():
+    chunks = StructuralChunker(max_words=30, min_words=5)(DOC)
+    assert all(word_count(c) <= 30 for c in chunks)
+    assert not any("# Engines" in c and "# Airframe" in c for c in chunks)
+    assert any(c.startswith("# Airframe") for c in chunks)
+    assert "| F119 | 35,000 lbf |" in "\n".join(chunks).splitlines()
+
+
+def test_structural_chunker_merges_short_sections():
+    chunks = StructuralChunker(max_words=100, min_words=20)("# Title\n\n# Body\n\n" + "word " * 30)
+    assert len(chunks) == 1 and chunks[0].startswith("# Title")
+
+
+def test_embedding_chunker_breaks_on_topic_shift():
+    def embed(texts):
+        # two orthogonal topics: sentences about engines vs. about food
+        return np.array([[1.0, 0.0] if "engine" in t else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+    text = " ".join(["The engine runs hot."] * 4 + ["Pasta needs salt."] * 4)
+    chunks = EmbeddingBoundaryChunker(embed, max_words=100, min_words=1, window=2, percentile=10)(text)
+    assert len(chunks) == 2
+    assert "engine" in chunks[0] and "Pasta" not in chunks[0]
+    assert "Pasta" in chunks[1] and "engine" not in chunks[1]
+
+
+def test_llm_segmenter_splits_on_reply():
+    text = "alpha beta gamma. delta epsilon zeta."
+    segmenter = LLMSegmenter(lambda prompt: "delta epsilon zeta." if "alpha" in prompt else "")
+    assert segmenter(text) == ["alpha beta gamma.", "delta epsilon zeta."]
+
+
+def test_refiner_merges_related_chunks_within_budget():
+    refiner = LLMRefiner(lambda md: ["one two", "three four", "five " * 10], lambda prompt: "Yes", max_words=6)
+    assert refiner("ignored") == ["one two\n\nthree four", ("five " * 10)]
+
+
+def test_make_chunker():
+    chat = lambda prompt: ""
+    embed = lambda texts: np.ones((len(texts), 2), dtype=np.float32)
+    assert isinstance(make_chunker("structural"), StructuralChunker)
+    assert isinstance(make_chunker("embedding", embed=embed), EmbeddingBoundaryChunker)
+    assert isinstance(make_chunker("llm", chat=chat), LLMSegmenter)
+
+    refined = make_chunker("llm", chat=chat, refine=True)
+    assert isinstance(refined, LLMRefiner) and isinstance(refined.base, LLMSegmenter)
+    refined = make_chunker("structural", chat=chat, refine=True)
+    assert isinstance(refined, LLMRefiner) and isinstance(refined.base, StructuralChunker)
+
+    for kwargs in ({"strategy": "embedding"}, {"strategy": "llm"}, {"strategy": "structural", "refine": True},
+                   {"strategy": "sentences"}):
+        try:
+            make_chunker(**kwargs)
+        except ValueError:
+            continue
+        raise AssertionError(f"expected ValueError for {kwargs}")
+
+
+if __name__ == "__main__":
+    test_split_units_keeps_tables_and_lists_whole()
+    test_split_oversized_prefers_line_boundaries()
+    test_structural_chunker_respects_budget_and_headings()
+    test_structural_chunker_merges_short_sections()
+    test_embedding_chunker_breaks_on_topic_shift()
+    test_llm_segmenter_splits_on_reply()
+    test_refiner_merges_related_chunks_within_budget()
+    test_make_chunker()
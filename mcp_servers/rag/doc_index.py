@@ -0,0 +1,187 @@
+import json
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import faiss
+import numpy as np
+
+from rag.common import mcp_log, atomic_write_text
+from rag.embeddings import NORMALIZATION, l2_normalize
+from rag.index_manager import IndexManager
+from rag.index_factory import IndexConfig, build_index, effective_kind, is_lossy, kind_of, supports_removal
+
+CACHE_FILENAME = "doc_index_cache.json"
+
+
+class DocumentIndex:
+    """Writer-side view of the document store.
+
+    Vectors live in an ID-addressed index (see `index_factory`) and their
+    chunk rows in the manager's `ChunkStore`; every document owns one
+    contiguous vector-ID range, recorded next to its md5 in
+    doc_index_cache.json. When a file changes or disappears its vectors are
+    removed from the index, and its rows are deleted only after the next
+    generation is published, so readers still on the old generation can
+    resolve them. IDs are never reused. HNSW cannot delete vectors, so there
+    the removed IDs stay in the graph as tombstones that searches filter out.
+    `compact()` rebuilds the index in the configured tier once tombstones
+    pile up, or once the corpus is large enough to train an ANN tier.
+    Indexes written before embeddings were L2-normalized are rebuilt from
+    normalized vectors on load, so they match the unit query vectors.
+    """
+
+    def __init__(
+        self,
+        index_dir: Path,
+        manager: IndexManager,
+        config: Optional[IndexConfig] = None,
+        embed: Optional[Callable[[list[str]], np.ndarray]] = None,
+    ):
+        self.index_dir = Path(index_dir)
+        self.manager = manager
+        self.store = manager.store
+        self.config = config or IndexConfig()
+        self.embed = embed  # exact vectors for rebuilds when the index only keeps PQ codes
+        self.cache_file = self.index_dir / CACHE_FILENAME
+        self.index = None
+        self.docs: dict[str, dict] = {}
+        self.next_id = 0
+        self._removed: list[np.ndarray] = []  # row IDs to delete once the next generation is live
+        self.dirty = False  # in-memory state differs from what is on disk
+        self._load()
+
+    # ── loading ──────────────────────────────────────────────────
+
+    def _load(self):
+        if self.manager.index_file.exists():
+            self.index = faiss.read_index(str(self.manager.index_file))
+
+        if self.index is not None and type(self.index) is faiss.IndexFlatL2:
+            mcp_log("INFO", "Migrating positional FAISS index to IndexIDMap2")
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+            self.index = build_index(IndexConfig("flat"), vectors, np.arange(len(vectors), dtype=np.int64), self.index.d)
+            self.dirty = True
+
+        cache = json.loads(self.cache_file.read_text()) if self.cache_file.exists() else {}
+        for name, value in cache.items():
+            # Older caches stored only the md5 per file
+            self.docs[name] = {"hash": value} if isinstance(value, str) else dict(value)
+
+        self._rebuild_ranges()
+
+        if self.index is not None and self.store.get_meta("normalization") != NORMALIZATION:
+            self._normalize_vectors()
+
+    def _normalize_vectors(self):
+        mcp_log("INFO", f"Re-normalizing {self.index.ntotal} vectors from an index built with raw embeddings")
+        ids = self._live_ids()
+        dim = self.index.d
+        vectors = l2_normalize(self._live_vectors(ids)) if len(ids) else np.empty((0, dim), dtype=np.float32)
+        self.index = build_index(self.config, vectors, ids, dim)
+        self.dirty = True
+
+    def _rebuild_ranges(self):
+        for name, (start, end) in self.store.doc_ranges().items():
+            self.docs.setdefault(name, {"hash": None}).update(start=start, end=end)
+        last = max((r.get("end", 0) for r in self.docs.values()), default=0)
+        self.next_id = max(int(self.store.get_meta("next_id", "0")), last)
+
+    # ── document operations ──────────────────────────────────────
+
+    def is_current(self, name: str, file_hash: str) -> bool:
+        return self.docs.get(name, {}).get("hash") == file_hash
+
+    def stale_documents(self, present: Iterable[str]) -> list[str]:
+        present = set(present)
+        return [name for name in self.docs if name not in present]
+
+    def live_count(self) -> int:
+        return self.store.count() - sum(len(ids) for ids in self._removed)
+
+    def _live_ids(self) -> np.ndarray:
+        ids = self.store.all_ids()
+        if self._removed:
+            ids = np.setdiff1d(ids, np.concatenate(self._removed), assume_unique=True)
+        return ids
+
+    def remove_document(self, name: str) -> int:
+        record = self.docs.pop(name, None)
+        if record is None or self.index is None:
+            return 0
+        self.dirty = True
+        # Remove by exact IDs: indexes migrated from the append-only layout can
+        # hold several non-contiguous ranges for one document.
+        ids = self.store.ids_for_doc(name)
+        if self._removed:
+            ids = np.setdiff1d(ids, np.concatenate(self._removed), assume_unique=True)
+        if not len(ids):
+            return 0
+        self._removed.append(ids)
+        if not supports_removal(self.index):
+            mcp_log("INFO", f"Tombstoned {len(ids)} vectors for {name}")
+            return len(ids)
+        removed = self.index.remove_ids(ids)
+        mcp_log("INFO", f"Removed {removed} vectors for {name}")
+        return removed
+
+    def replace_document(self, name: str, file_hash: str, vectors: np.ndarray, entries: list[dict]):
+        self.remove_document(name)
+        if self.index is None:
+            self.index = build_index(self.config, vectors[:0], np.empty(0, dtype=np.int64))
+
+        start = self.next_id
+        ids = np.arange(start, start + len(entries), dtype=np.int64)
+        self.index.add_with_ids(vectors, ids)
+        for vector_id, entry in zip(ids, entries):
+            entry["id"] = int(vector_id)
+        # New rows are invisible to readers until a generation holds their vectors.
+        self.store.insert(entries)
+        self.docs[name] = {"hash": file_hash, "start": start, "end": start + len(entries)}
+        self.next_id = start + len(entries)
+        self.store.set_meta("next_id", str(self.next_id))
+        self.dirty = True
+
+    # ── maintenance ──────────────────────────────────────────────
+
+    def tombstone_ratio(self) -> float:
+        """Fraction of indexed vectors that belong to removed chunks."""
+        if self.index is None or not self.index.ntotal:
+            return 0.0
+        return max(0, self.index.ntotal - self.live_count()) / self.index.ntotal
+
+    def needs_rebuild(self) -> bool:
+        """True when the corpus size calls for a different tier than the one on disk."""
+        return self.index is not None and kind_of(self.index) != effective_kind(self.config, self.live_count())
+
+    def _live_vectors(self, ids: np.ndarray) -> np.ndarray:
+        if self.embed is not None and is_lossy(self.index):
+            return self.embed(self.store.texts(ids))
+        return self.index.reconstruct_batch(ids)
+
+    def _tombstones(self) -> np.ndarray:
+        if self.index is None or supports_removal(self.index) or self.index.ntotal == self.live_count():
+            return np.empty(0, dtype=np.int64)
+        return np.setdiff1d(faiss.vector_to_array(self.index.id_map), self._live_ids())
+
+    def compact(self):
+        """Rebuild the index from live vectors in the configured tier, keeping their IDs."""
+        if self.index is None:
+            return
+        ids = self._live_ids()
+        dim = self.index.d
+        vectors = self._live_vectors(ids) if len(ids) else np.empty((0, dim), dtype=np.float32)
+
+        self.index = build_index(self.config, vectors, ids, dim)
+        self.dirty = True
+        mcp_log("INFO", f"Compacted index to {len(ids)} vectors ({kind_of(self.index)})")
+
+    def save(self) -> int:
+        """Publish the index as a new generation, then drop rows no generation needs any more."""
+        generation = self.manager.publish(self.index, self._tombstones()) if self.index is not None else 0
+        for ids in self._removed:
+            self.store.delete_ids(ids)
+        self._removed = []
+        self.store.set_meta("normalization", NORMALIZATION)
+        atomic_write_text(self.cache_file, json.dumps(self.docs, indent=2))
+        self.dirty = False
+        return generation
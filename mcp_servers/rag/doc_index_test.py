@@ -0,0 +1,141 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.doc_index import DocumentIndex
+from rag.embeddings import NORMALIZATION, l2_normalize
+from rag.index_factory import IndexConfig, kind_of
+from rag.index_manager import IndexManager
+
+DIM = 8
+
+
+def write_legacy_index(index_dir: Path, vectors: np.ndarray) -> IndexManager:
+    """The pre-IDMap layout: a positional IndexFlatL2 of raw /api/embeddings vectors."""
+    manager = IndexManager(index_dir)
+    manager.store.insert([
+        {"id": i, "doc": "a.md", "chunk_id": f"a_{i}", "chunk": f"text {i}"} for i in range(len(vectors))
+    ])
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    faiss.write_index(index, str(manager.index_file))
+    return manager
+
+
+def test_legacy_vectors_are_renormalized_once():
+    rng = np.random.default_rng(0)
+    vectors = (rng.standard_normal((6, 8)) * 18).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = write_legacy_index(Path(tmp), vectors)
+
+        doc_index = DocumentIndex(Path(tmp), manager)
+        assert doc_index.dirty
+        stored = doc_index.index.reconstruct_batch(np.arange(len(vectors)))
+        assert np.allclose(np.linalg.norm(stored, axis=1), 1.0, atol=1e-5)
+        assert np.allclose(stored, vectors / np.linalg.norm(vectors, axis=1, keepdims=True), atol=1e-5)
+
+        doc_index.save()
+        assert manager.store.get_meta("normalization") == NORMALIZATION
+        hits = manager.search(stored[2:3], k=1)
+        assert hits[0]["chunk_id"] == "a_2"
+
+        assert not DocumentIndex(Path(tmp), manager).dirty
+
+
+def unit_vectors(n: int, seed: int) -> np.ndarray:
+    return l2_normalize(np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32))
+
+
+def add(doc_index: DocumentIndex, name: str, vectors: np.ndarray):
+    stem = name.split(".")[0]
+    entries = [{"doc": name, "chunk_id": f"{stem}_{i}", "chunk": f"{stem} text {i}"} for i in range(len(vectors))]
+    doc_index.replace_document(name, f"md5-{name}", vectors, entries)
+
+
+def open_index(index_dir: Path, config: IndexConfig = None) -> DocumentIndex:
+    return DocumentIndex(index_dir, IndexManager(index_dir, config=config), config)
+
+
+def test_removed_document_is_not_served():
+    a, b = unit_vectors(4, 1), unit_vectors(3, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_index = open_index(Path(tmp))
+        add(doc_index, "a.md", a)
+        add(doc_index, "b.md", b)
+        doc_index.save()
+        assert doc_index.manager.search(a[:1], k=1)[0]["doc"] == "a.md"
+
+        assert doc_index.remove_document("a.md") == 4
+        assert doc_index.remove_document("a.md") == 0  # already gone
+        doc_index.save()
+        hits = doc_index.manager.search(a[:1], k=10)
+        assert {h["doc"] for h in hits} == {"b.md"} and len(hits) == 3
+        assert doc_index.store.ids_for_doc("a.md").size == 0
+        assert doc_index.index.ntotal == 3 and doc_index.tombstone_ratio() == 0.0
+
+
+def test_hnsw_removal_leaves_filtered_tombstones():
+    config = IndexConfig("hnsw", min_vectors=0)
+    a, b = unit_vectors(4, 1), unit_vectors(3, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_index = open_index(Path(tmp), config)
+        add(doc_index, "a.md", a)
+        add(doc_index, "b.md", b)
+        doc_index.save()
+        assert kind_of(doc_index.index) == "hnsw"
+
+        assert doc_index.remove_document("a.md") == 4
+        doc_index.save()
+        # the vectors stay in the graph; the published tombstones hide them
+        assert doc_index.index.ntotal == 7
+        assert doc_index.manager.current().params is not None
+        assert np.isclose(doc_index.tombstone_ratio(), 4 / 7)
+        for query in a:
+            assert {h["doc"] for h in doc_index.manager.search(query[None, :], k=10)} == {"b.md"}
+
+        # a fresh reader (another process) applies the same tombstones
+        reader = IndexManager(Path(tmp), config=config)
+        assert {h["doc"] for h in reader.search(a[:1], k=10)} == {"b.md"}
+
+
+def test_compact_then_reload():
+    config = IndexConfig("hnsw", min_vectors=0)
+    a, b = unit_vectors(4, 1), unit_vectors(3, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_index = open_index(Path(tmp), config)
+        add(doc_index, "a.md", a)
+        add(doc_index, "b.md", b)
+        doc_index.save()
+        doc_index.remove_document("a.md")
+        doc_index.save()
+
+        doc_index.compact()
+        doc_index.save()
+        assert doc_index.index.ntotal == 3 and doc_index.tombstone_ratio() == 0.0
+        assert not (Path(tmp) / "tombstones.npy").exists()
+
+        reopened = open_index(Path(tmp), config)
+        assert not reopened.dirty
+        assert reopened.is_current("b.md", "md5-b.md") and "a.md" not in reopened.docs
+        assert reopened.index.ntotal == 3 and kind_of(reopened.index) == "hnsw"
+        hits = reopened.manager.search(b[1:2], k=1)
+        assert hits[0]["chunk_id"] == "b_1"
+        assert np.allclose(reopened.index.reconstruct(hits[0]["id"]), b[1], atol=1e-6)
+
+        # IDs are never reused after a compaction either
+        add(reopened, "c.md", unit_vectors(2, 3))
+        assert reopened.docs["c.md"]["start"] == 7
+        reopened.save()
+        assert reopened.manager.search(unit_vectors(2, 3)[:1], k=1)[0]["chunk_id"] == "c_0"
+
+
+if __name__ == "__main__":
+    test_legacy_vectors_are_renormalized_once()
+    test_removed_document_is_not_served()
+    test_hnsw_removal_leaves_filtered_tombstones()
+    test_compact_then_reload()
@@ -0,0 +1,112 @@
+"""Throughput benchmark for EmbeddingEngine against a local stub Ollama server.
+
+    python rag/embedding_bench.py --chunks 512 --latency 0.02
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.embeddings import EmbeddingEngine
+
+DIM = 768
+
+
+def make_handler(latency: float, per_item: float, batch_enabled: bool):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path == "/api/embed" and batch_enabled:
+                inputs = payload["input"]
+                time.sleep(latency + per_item * len(inputs))
+                self._reply(200, {"embeddings": [self._vector(t) for t in inputs]})
+            elif self.path == "/api/embeddings":
+                time.sleep(latency + per_item)
+                self._reply(200, {"embedding": self._vector(payload["prompt"])})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        @staticmethod
+        def _vector(text: str) -> list[float]:
+            rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+            return rng.standard_normal(DIM).round(6).tolist()
+
+    return StubHandler
+
+
+def start_stub(latency: float, per_item: float, batch_enabled: bool) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency, per_item, batch_enabled))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_serial(url: str, texts: list[str]) -> float:
+    start = time.perf_counter()
+    with requests.Session() as http:
+        for text in texts:
+            r = http.post(f"{url}/api/embeddings", json={"model": "stub", "prompt": text})
+            r.raise_for_status()
+            np.array(r.json()["embedding"], dtype=np.float32)
+    return time.perf_counter() - start
+
+
+def bench_engine(url: str, texts: list[str], batch_size: int, concurrency: int) -> float:
+    engine = EmbeddingEngine("stub", base_url=url, batch_size=batch_size, concurrency=concurrency)
+    start = time.perf_counter()
+    matrix = engine.embed(texts)
+    elapsed = time.perf_counter() - start
+    assert matrix.shape == (len(texts), DIM) and matrix.dtype == np.float32
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--latency", type=float, default=0.02, help="fixed seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.002, help="extra seconds per embedded text")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} " + "lorem ipsum " * 40 for i in range(args.chunks)]
+
+    batch_server = start_stub(args.latency, args.per_item, batch_enabled=True)
+    single_server = start_stub(args.latency, args.per_item, batch_enabled=False)
+    batch_url = f"http://127.0.0.1:{batch_server.server_address[1]}"
+    single_url = f"http://127.0.0.1:{single_server.server_address[1]}"
+
+    rows = [
+        ("serial requests.post", bench_serial(single_url, texts)),
+        ("engine fan-out (no /api/embed)", bench_engine(single_url, texts, args.batch_size, args.concurrency)),
+        ("engine batched /api/embed", bench_engine(batch_url, texts, args.batch_size, args.concurrency)),
+    ]
+
+    print(f"{args.chunks} chunks, {args.latency * 1000:.0f} ms/request + {args.per_item * 1000:.1f} ms/item")
+    for name, elapsed in rows:
+        print(f"  {name:<34} {elapsed:7.2f} s  {args.chunks / elapsed:9.1f} chunks/s")
+
+    batch_server.shutdown()
+    single_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
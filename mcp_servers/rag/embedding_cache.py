@@ -0,0 +1,100 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: an in-memory LRU in front of SQLite.
+
+    Rows are keyed by (model, sha256(text)) and store the raw float32 bytes,
+    so any caller embedding with the same model can share hits.
+    """
+
+    def __init__(self, db_path: Path, memory_items: int = 4096):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self._lru: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: tuple[str, str], vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[np.ndarray]]:
+        hashes = [self.text_hash(t) for t in texts]
+        found: list[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            pending: dict[str, list[int]] = {}
+            for i, h in enumerate(hashes):
+                key = (model, h)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[i] = self._lru[key]
+                    self.memory_hits += 1
+                else:
+                    pending.setdefault(h, []).append(i)
+
+            keys = list(pending)
+            for start in range(0, len(keys), 500):  # stay under SQLite's variable limit
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember((model, h), vector)
+                    for i in pending.pop(h):
+                        found[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(v) for v in pending.values())
+        return found
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: list[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                h = self.text_hash(text)
+                vector = vector.copy()
+                self._remember((model, h), vector)
+                rows.append((model, h, vector.shape[0], vector.tobytes()))
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._lru),
+        }
@@ -0,0 +1,107 @@
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.embedding_cache import EmbeddingCache
+
+MODEL = "nomic-embed-text#l2"
+
+
+def vectors(n: int, dim: int = 4) -> np.ndarray:
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_lru_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "cache.sqlite", memory_items=2)
+        cache.put_many(MODEL, ["a", "b"], vectors(2))
+        assert cache.get(MODEL, "a") is not None  # "a" is now the most recent
+        cache.put_many(MODEL, ["c"], vectors(1))
+        assert list(cache._lru) == [(MODEL, cache.text_hash("a")), (MODEL, cache.text_hash("c"))]
+
+        assert cache.stats()["memory_items"] == 2
+        # the evicted entry is still on disk, and reading it brings it back into memory
+        assert np.array_equal(cache.get(MODEL, "b"), vectors(2)[1])
+        assert cache.stats()["disk_hits"] == 1
+        assert (MODEL, cache.text_hash("b")) in cache._lru and len(cache._lru) == 2
+
+
+def test_persists_across_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite"
+        EmbeddingCache(path).put_many(MODEL, ["alpha", "beta"], vectors(2))
+
+        reopened = EmbeddingCache(path)
+        found = reopened.get_many(MODEL, ["beta", "gamma", "alpha"])
+        assert np.array_equal(found[0], vectors(2)[1])
+        assert found[1] is None
+        assert np.array_equal(found[2], vectors(2)[0])
+        assert found[0].dtype == np.float32
+
+        # rows are per model: the same text under another model is a miss
+        assert reopened.get("other-model", "alpha") is None
+
+
+def test_stats_count_memory_disk_and_misses():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite"
+        EmbeddingCache(path).put_many(MODEL, ["a", "b"], vectors(2))
+        cache = EmbeddingCache(path)
+        assert cache.stats() == {"memory_hits": 0, "disk_hits": 0, "misses": 0, "hit_rate": 0.0, "memory_items": 0}
+
+        cache.get_many(MODEL, ["a", "a", "x"])  # both "a" lookups come from the one disk row
+        cache.get_many(MODEL, ["a", "b"])
+        assert cache.stats() == {
+            "memory_hits": 1, "disk_hits": 3, "misses": 1, "hit_rate": 0.8, "memory_items": 2,
+        }
+
+
+def test_put_overwrites_and_copies():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "cache.sqlite")
+        batch = vectors(1)
+        cache.put_many(MODEL, ["a"], batch)
+        batch[0, 0] = 99  # the caller reusing its buffer must not change the cached vector
+        assert cache.get(MODEL, "a")[0] == 0
+
+        cache.put_many(MODEL, ["a"], np.ones((1, 4), dtype=np.float64))
+        assert np.array_equal(EmbeddingCache(Path(tmp) / "cache.sqlite").get(MODEL, "a"), np.ones(4, dtype=np.float32))
+
+
+def test_many_keys_and_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "cache.sqlite", memory_items=10)
+        texts = [f"text {i}" for i in range(1200)]  # more than one 500-key SQL batch
+        cache.put_many(MODEL, texts, vectors(len(texts)))
+
+        errors = []
+
+        def reader(offset: int):
+            try:
+                for i in range(offset, len(texts), 97):
+                    assert np.array_equal(cache.get(MODEL, texts[i]), vectors(len(texts))[i])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+
+        found = EmbeddingCache(Path(tmp) / "cache.sqlite").get_many(MODEL, texts)
+        assert all(v is not None for v in found)
+
+
+if __name__ == "__main__":
+    test_lru_evicts_least_recently_used()
+    test_persists_across_instances()
+    test_stats_count_memory_disk_and_misses()
+    test_put_overwrites_and_copies()
+    test_many_keys_and_threads()
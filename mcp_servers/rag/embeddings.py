@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import numpy as np
+
+from rag.common import mcp_log, run_sync
+from rag.embedding_cache import EmbeddingCache
+
+NORMALIZATION = "l2"
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length; all-zero rows are left as they are."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=vectors.copy(), where=norms > 0)
+
+
+class EmbeddingEngine:
+    """Batched, bounded-concurrency client for the Ollama embedding API.
+
+    Uses the multi-input `/api/embed` endpoint when the server has it and
+    falls back to one `/api/embeddings` request per text otherwise. Results
+    are written straight into a preallocated float32 matrix in input order.
+    Both endpoints' vectors are L2-normalized (`/api/embed` already returns
+    unit vectors, `/api/embeddings` does not), so L2 distance ranks like
+    cosine whichever one produced them. With a `cache`, only texts it has
+    never seen reach the server. One HTTP client is kept per event loop;
+    call `aclose()` from that loop on shutdown.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        base_url: str = "http://localhost:11434",
+        batch_size: int = 32,
+        concurrency: int = 8,
+        timeout: float = 120.0,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.supports_batch: Optional[bool] = None  # probed on first use
+        # Cached vectors are keyed by model and normalization, so raw and unit vectors never mix
+        self.cache_key = f"{model}#{NORMALIZATION}"
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+                client = self._clients[loop] = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout)
+            return client
+
+    async def aclose(self):
+        """Close the HTTP client of the running event loop, if it has one."""
+        with self._clients_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def _embed_batch(self, client: httpx.AsyncClient, texts: list[str]) -> Optional[list[list[float]]]:
+        response = await client.post("/api/embed", json={"model": self.model, "input": texts})
+        if response.status_code in (404, 405):
+            return None
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def _embed_one(self, client: httpx.AsyncClient, text: str) -> list[float]:
+        response = await client.post("/api/embeddings", json={"model": self.model, "prompt": text})
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    async def embed_async(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return await self._embed_uncached(texts)
+
+        cached = self.cache.get_many(self.cache_key, texts)
+        # Embed each distinct missing text once, even if it repeats in `texts`.
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if not missing:
+            return np.stack(cached)
+
+        fresh = await self._embed_uncached(missing)
+        self.cache.put_many(self.cache_key, missing, fresh)
+        if len(missing) == len(texts):
+            return fresh
+
+        rows = dict(zip(missing, fresh))
+        out = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+        for i, (text, vector) in enumerate(zip(texts, cached)):
+            out[i] = vector if vector is not None else rows[text]
+        return out
+
+    async def _embed_uncached(self, texts: list[str]) -> np.ndarray:
+        out: Optional[np.ndarray] = None
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        def store(start: int, vectors: list[list[float]]):
+            nonlocal out
+            if out is None:
+                out = np.empty((len(texts), len(vectors[0])), dtype=np.float32)
+            out[start:start + len(vectors)] = l2_normalize(vectors)
+
+        client = self._client()
+        done = 0
+        if self.supports_batch is not False:
+            first = await self._embed_batch(client, texts[:self.batch_size])
+            self.supports_batch = first is not None
+            if first is None:
+                mcp_log("INFO", "Embedding server has no /api/embed; falling back to per-text requests")
+            else:
+                store(0, first)
+                done = len(first)
+
+        if self.supports_batch:
+            async def run_batch(start: int):
+                async with semaphore:
+                    store(start, await self._embed_batch(client, texts[start:start + self.batch_size]))
+
+            await asyncio.gather(*(run_batch(s) for s in range(done, len(texts), self.batch_size)))
+        else:
+            async def run_one(i: int):
+                async with semaphore:
+                    store(i, [await self._embed_one(client, texts[i])])
+
+            # Size the matrix from the first reply, then fan out the rest.
+            await run_one(0)
+            await asyncio.gather(*(run_one(i) for i in range(1, len(texts))))
+
+        return out
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Synchronous wrapper; safe to call from inside a running event loop."""
+        async def embed_once():
+            # run_sync gives every call a fresh loop, so its client goes with it
+            try:
+                return await self.embed_async(texts)
+            finally:
+                await self.aclose()
+
+        return run_sync(embed_once())
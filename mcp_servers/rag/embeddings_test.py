@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.embedding_bench import DIM, start_stub
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import EmbeddingEngine, l2_normalize
+
+
+def stub_url(batch_enabled: bool) -> str:
+    server = start_stub(0.0, 0.0, batch_enabled=batch_enabled)
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_vectors_are_unit_length_from_both_endpoints():
+    texts = [f"chunk {i}" for i in range(5)]
+    for batch_enabled in (True, False):
+        engine = EmbeddingEngine("stub", stub_url(batch_enabled), batch_size=2)
+        vectors = engine.embed(texts)
+        assert vectors.shape == (len(texts), DIM)
+        assert engine.supports_batch is batch_enabled
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+
+
+def test_l2_normalize_keeps_zero_rows():
+    vectors = l2_normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_cache_key_separates_raw_and_normalized_vectors():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "cache.sqlite")
+        raw = np.full((1, DIM), 5.0, dtype=np.float32)
+        cache.put_many("stub", ["hello"], raw)  # written under the bare model name by an older engine
+        engine = EmbeddingEngine("stub", stub_url(True), cache=cache)
+
+        vector = engine.embed(["hello"])[0]
+        assert np.isclose(np.linalg.norm(vector), 1.0, atol=1e-5)
+        assert not np.allclose(vector, l2_normalize(raw)[0])
+        assert np.allclose(cache.get_many(engine.cache_key, ["hello"])[0], vector)
+        assert np.allclose(engine.embed(["hello"])[0], vector)
+
+
+def test_async_client_is_reused_until_closed():
+    engine = EmbeddingEngine("stub", stub_url(True))
+
+    async def run():
+        await engine.embed_async(["a"])
+        client = engine._client()
+        await engine.embed_async(["b"])
+        assert engine._client() is client
+        await engine.aclose()
+        assert client.is_closed
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_vectors_are_unit_length_from_both_endpoints()
+    test_l2_normalize_keeps_zero_rows()
+    test_cache_key_separates_raw_and_normalized_vectors()
+    test_async_client_is_reused_until_closed()
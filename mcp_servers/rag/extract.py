@@ -0,0 +1,141 @@
+"""CPU-bound document extraction.
+
+Kept free of server state so the functions can run in worker processes:
+importing this module does not start an MCP server, open the index or
+touch the network.
+"""
+import asyncio
+import hashlib
+import re
+from collections import deque
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+
+def document_image_dir(image_root: str, file_path: str) -> str:
+    """Per-document image folder under `image_root`, so two files with the same page/image names can't collide."""
+    path = Path(file_path)
+    digest = hashlib.md5(str(path.resolve()).encode("utf-8")).hexdigest()[:8]
+    return str(Path(image_root) / f"{path.stem}-{digest}")
+
+
+def relink_images(markdown: str) -> str:
+    """Re-point image links so they are relative to documents/ (images/<doc dir>/<name>)."""
+    return re.sub(
+        r'!\[\]\((.*?/images/)([^)]+)\)',
+        r'![](images/\2)',
+        markdown.replace("\\", "/")
+    )
+
+
+def pdf_to_markdown(file_path: str, image_dir: str) -> str:
+    """Convert a whole PDF with pymupdf4llm, writing images to `image_dir` and linking them relative to documents/."""
+    import pymupdf4llm
+
+    Path(image_dir).mkdir(parents=True, exist_ok=True)
+    markdown = pymupdf4llm.to_markdown(
+        file_path,
+        write_images=True,
+        image_path=str(image_dir)
+    )
+
+    # Re-point image links in the markdown
+    return relink_images(markdown)
+
+
+def pdf_page_count(file_path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(file_path) as doc:
+        return doc.page_count
+
+
+def pdf_pages_to_markdown(file_path: str, image_dir: str, pages: list[int]) -> list[str]:
+    """Markdown for each of `pages` (0-based), in order; runs in a worker process."""
+    import pymupdf4llm
+
+    Path(image_dir).mkdir(parents=True, exist_ok=True)
+    page_chunks = pymupdf4llm.to_markdown(
+        file_path,
+        pages=pages,
+        write_images=True,
+        image_path=str(image_dir),
+        page_chunks=True,
+    )
+    return [relink_images(chunk["text"]) for chunk in page_chunks]
+
+
+async def stream_pdf_pages(
+    file_path: str,
+    image_dir: str,
+    executor: Executor,
+    pages_per_task: int = 4,
+    prefetch: int = 4,
+) -> AsyncIterator[str]:
+    """Yield a PDF's markdown page by page, in order, converting page ranges in `executor`.
+
+    At most `prefetch` ranges are converted ahead of the consumer, so memory
+    stays bounded by a few pages however large the document is.
+    """
+    loop = asyncio.get_running_loop()
+    total = await loop.run_in_executor(executor, pdf_page_count, file_path)
+    ranges = iter([list(range(s, min(s + pages_per_task, total))) for s in range(0, total, pages_per_task)])
+
+    def submit():
+        pages = next(ranges, None)
+        if pages is not None:
+            pending.append(loop.run_in_executor(executor, pdf_pages_to_markdown, file_path, image_dir, pages))
+
+    pending: deque = deque()
+    for _ in range(prefetch):
+        submit()
+    try:
+        while pending:
+            pages = await pending.popleft()
+            submit()
+            for page in pages:
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def stream_document(file_path: str, executor: Executor, image_root: str, pages_per_task: int = 4) -> Optional[AsyncIterator[str]]:
+    """Page stream for formats that support it (PDF), else None so the caller extracts the whole file."""
+    if Path(file_path).suffix.lower() != ".pdf":
+        return None
+    return stream_pdf_pages(str(file_path), document_image_dir(image_root, file_path), executor, pages_per_task)
+
+
+def html_to_markdown(html: str) -> str:
+    import trafilatura
+
+    return trafilatura.extract(
+        html,
+        include_comments=False,
+        include_tables=True,
+        include_images=True,
+        output_format='markdown'
+    ) or ""
+
+
+def extract_markdown(file_path: str, image_root: str) -> str:
+    """Pick an extractor by extension; images referenced in the output are not captioned yet."""
+    path = Path(file_path)
+    ext = path.suffix.lower()
+
+    if ext == ".pdf":
+        return pdf_to_markdown(str(path), document_image_dir(image_root, file_path))
+
+    if ext in (".html", ".htm"):
+        return html_to_markdown(path.read_text(encoding="utf-8", errors="ignore"))
+
+    if ext == ".url":
+        import trafilatura
+        downloaded = trafilatura.fetch_url(path.read_text().strip())
+        return html_to_markdown(downloaded) if downloaded else ""
+
+    # Fallback to MarkItDown for other formats
+    from markitdown import MarkItDown
+    return MarkItDown().convert(str(path)).text_content
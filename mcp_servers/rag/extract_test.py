@@ -0,0 +1,129 @@
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag import extract
+from rag.extract import document_image_dir, relink_images, stream_document, stream_pdf_pages
+
+
+class StubConverter:
+    """Stands in for pymupdf4llm: page `i` converts to "page i", and each range is recorded."""
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.ranges: list[list[int]] = []
+        self.image_dirs: set[str] = set()
+        self._lock = threading.Lock()
+
+    def page_count(self, file_path: str) -> int:
+        return self.pages
+
+    def convert(self, file_path: str, image_dir: str, pages: list[int]) -> list[str]:
+        with self._lock:
+            self.ranges.append(pages)
+            self.image_dirs.add(image_dir)
+        return [f"page {i}" for i in pages]
+
+    def __enter__(self):
+        self.saved = extract.pdf_page_count, extract.pdf_pages_to_markdown
+        extract.pdf_page_count, extract.pdf_pages_to_markdown = self.page_count, self.convert
+        return self
+
+    def __exit__(self, *exc):
+        extract.pdf_page_count, extract.pdf_pages_to_markdown = self.saved
+
+
+def test_image_dirs_are_per_document():
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = Path(tmp) / "a" / "report.pdf", Path(tmp) / "b" / "report.pdf"
+        root = str(Path(tmp) / "images")
+        one, two = document_image_dir(root, str(first)), document_image_dir(root, str(second))
+        assert one != two
+        assert Path(one).parent == Path(two).parent == Path(root)
+        assert Path(one).name.startswith("report-")
+        assert document_image_dir(root, str(first)) == one  # stable across runs
+
+
+def test_relink_images_points_into_documents_images():
+    markdown = "![](C:\\docs\\images\\report-1a2b3c4d\\p1-0.png) and ![](/srv/documents/images/report-1a2b3c4d/p2-0.png)"
+    assert relink_images(markdown) == (
+        "![](images/report-1a2b3c4d/p1-0.png) and ![](images/report-1a2b3c4d/p2-0.png)"
+    )
+
+
+def test_pages_stream_in_order_with_bounded_prefetch():
+    async def go(converter: StubConverter, pool) -> list[str]:
+        out = []
+        async for page in stream_pdf_pages("doc.pdf", "images/doc", pool, pages_per_task=2, prefetch=2):
+            if not out:
+                # first page in hand: the two prefetched ranges plus the one queued behind them
+                assert len(converter.ranges) <= 3
+            out.append(page)
+        return out
+
+    with StubConverter(pages=9) as converter, ThreadPoolExecutor(4) as pool:
+        pages = asyncio.run(go(converter, pool))
+    assert pages == [f"page {i}" for i in range(9)]
+    assert sorted(converter.ranges) == [[0, 1], [2, 3], [4, 5], [6, 7], [8]]
+
+
+def test_stopping_early_cancels_queued_ranges():
+    gate = threading.Event()
+
+    class Slow(StubConverter):
+        def convert(self, file_path, image_dir, pages):
+            if pages[0]:
+                gate.wait(1)  # later ranges are still queued when the consumer stops
+            return super().convert(file_path, image_dir, pages)
+
+    async def go(pool):
+        stream = stream_pdf_pages("doc.pdf", "images/doc", pool, pages_per_task=1, prefetch=3)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    with Slow(pages=20) as converter, ThreadPoolExecutor(1) as pool:
+        assert asyncio.run(go(pool)) == "page 0"
+        gate.set()
+    assert converter.ranges == [[0], [1]]  # the range already running finishes; the queued ones never start
+
+
+def test_stream_document_only_streams_pdfs():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = str(Path(tmp) / "images")
+        pdf = str(Path(tmp) / "report.pdf")
+
+        async def go(pool):
+            assert stream_document(str(Path(tmp) / "notes.md"), pool, root) is None
+            return [page async for page in stream_document(pdf, pool, root, pages_per_task=3)]
+
+        with StubConverter(pages=4) as converter, ThreadPoolExecutor(2) as pool:
+            assert asyncio.run(go(pool)) == ["page 0", "page 1", "page 2", "page 3"]
+        assert converter.image_dirs == {document_image_dir(root, pdf)}
+
+
+def test_pdf_page_count_reads_the_file():
+    import pymupdf
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "three.pdf"
+        doc = pymupdf.open()
+        for _ in range(3):
+            doc.new_page()
+        doc.save(str(path))
+        doc.close()
+        assert extract.pdf_page_count(str(path)) == 3
+
+
+if __name__ == "__main__":
+    test_image_dirs_are_per_document()
+    test_relink_images_points_into_documents_images()
+    test_pages_stream_in_order_with_bounded_prefetch()
+    test_stopping_early_cancels_queued_ranges()
+    test_stream_document_only_streams_pdfs()
+    test_pdf_page_count_reads_the_file()
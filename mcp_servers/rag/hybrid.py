@@ -0,0 +1,16 @@
+from typing import Iterable
+
+RRF_K = 60  # damping constant from the original RRF paper; larger values flatten rank differences
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[int]], k: int = RRF_K) -> list[tuple[int, float]]:
+    """Fuse several best-first ID rankings into one, scoring each ID by sum(1 / (k + rank)).
+
+    Only ranks are used, so BM25 scores and L2 distances never need to be put
+    on a common scale.
+    """
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
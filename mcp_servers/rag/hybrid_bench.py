@@ -0,0 +1,98 @@
+"""Hit-rate and latency of vector-only, BM25-only and hybrid (RRF) retrieval.
+
+Queries are generated from the indexed chunks themselves, so the chunk a
+query was cut from is the expected hit:
+
+  exact   — the chunk's rarest terms (names, invoice numbers, codes)
+  phrase  — a random run of consecutive words from the chunk
+
+Query embeddings come from Ollama (through the embedding cache), exactly as
+in the server.
+
+    python rag/hybrid_bench.py --queries 100 --k 5
+"""
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import EmbeddingEngine
+from rag.index_manager import IndexManager
+
+INDEX_DIR = Path(__file__).resolve().parent.parent / "faiss_index"
+
+
+def tokens(text: str) -> list[str]:
+    return re.findall(r"\w+", text)
+
+
+def make_queries(rows: list[dict], n: int, rng: np.random.Generator) -> list[tuple[str, str, int]]:
+    """(kind, query, expected id) triples."""
+    df = Counter()
+    for row in rows:
+        df.update({t.lower() for t in tokens(row["chunk"])})
+
+    queries = []
+    for i in rng.choice(len(rows), size=min(n, len(rows)), replace=False):
+        row = rows[int(i)]
+        words = tokens(row["chunk"])
+        if len(words) < 8:
+            continue
+        rare = sorted({w for w in words if len(w) >= 4}, key=lambda w: (df[w.lower()], w))[:2]
+        if rare:
+            queries.append(("exact", " ".join(rare), row["id"]))
+        start = int(rng.integers(0, len(words) - 7))
+        queries.append(("phrase", " ".join(words[start:start + 8]), row["id"]))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument("--queries", type=int, default=100, help="chunks to cut queries from")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--base-url", default="http://localhost:11434")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manager = IndexManager(args.index_dir)
+    if manager.current() is None:
+        sys.exit(f"No index in {args.index_dir}; run the RAG server once to build it")
+    rows = list(manager.store.iter_rows())
+    queries = make_queries(rows, args.queries, np.random.default_rng(args.seed))
+
+    engine = EmbeddingEngine(args.model, args.base_url, cache=EmbeddingCache(args.index_dir / "embedding_cache.sqlite"))
+    vectors = engine.embed([q for _, q, _ in queries])  # embedding time is the same for every mode; keep it out
+    print(f"{len(rows)} chunks, {len(queries)} queries, hit@{args.k} = expected chunk in the top {args.k}\n")
+
+    modes = {
+        "vector": lambda vec, text: manager.search(vec, args.k),
+        "bm25": lambda vec, text: [{"id": i} for i, _ in manager.store.keyword_search(text, args.k)],
+        "hybrid": lambda vec, text: manager.hybrid_search(vec, text, args.k, candidates=args.candidates),
+    }
+    print(f"{'mode':<8} {'hit exact':>10} {'hit phrase':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode, search in modes.items():
+        hits = Counter()
+        totals = Counter(kind for kind, _, _ in queries)
+        latencies = []
+        for (kind, text, expected), vec in zip(queries, vectors):
+            start = time.perf_counter()
+            results = search(vec.reshape(1, -1), text)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits[kind] += any(r["id"] == expected for r in results)
+        rate = {kind: hits[kind] / totals[kind] if totals[kind] else 0.0 for kind in ("exact", "phrase")}
+        print(f"{mode:<8} {rate['exact']:10.3f} {rate['phrase']:11.3f} "
+              f"{np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 99):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
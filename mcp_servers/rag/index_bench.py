@@ -0,0 +1,108 @@
+"""Recall@k and latency benchmark for the document index tiers.
+
+Vectors come from faiss_index/index.bin (rows described by chunks.sqlite);
+`--synthetic` grows the corpus with jittered copies so larger-scale
+trade-offs can be explored before the real corpus gets there.
+
+    python rag/index_bench.py --synthetic 200000 --k 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.chunk_store import ChunkStore
+from rag.index_factory import IndexConfig, build_index, apply_search_params
+from rag.index_manager import CHUNKS_FILENAME
+
+INDEX_DIR = Path(__file__).resolve().parent.parent / "faiss_index"
+
+
+def load_corpus(index_dir: Path) -> np.ndarray:
+    index = faiss.read_index(str(index_dir / "index.bin"))
+    rows = ChunkStore(index_dir / CHUNKS_FILENAME).count()
+    if isinstance(index, faiss.IndexIDMap):
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    else:
+        vectors = index.reconstruct_n(0, index.ntotal)
+    print(f"Loaded {len(vectors)} vectors ({rows} chunk rows) of dim {index.d}")
+    return vectors
+
+
+def grow(vectors: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    if n <= 0:
+        return vectors
+    scale = vectors.std(axis=0, keepdims=True) * 0.25
+    base = vectors[rng.integers(0, len(vectors), n)]
+    extra = base + rng.standard_normal(base.shape).astype(np.float32) * scale
+    return np.vstack([vectors, extra.astype(np.float32)])
+
+
+def run(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> tuple[float, float, float]:
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, I = index.search(q.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(I[0]) & set(expected))
+    latencies = np.array(latencies) * 1000
+    return hits / truth.size, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument("--synthetic", type=int, default=0, help="extra jittered vectors to add")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = grow(load_corpus(args.index_dir), args.synthetic, rng)
+    ids = np.arange(len(corpus), dtype=np.int64)
+    queries = corpus[rng.integers(0, len(corpus), args.queries)]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.01
+
+    exact = build_index(IndexConfig("flat"), corpus, ids)
+    _, truth = exact.search(queries, args.k)
+    print(f"Corpus: {len(corpus)} vectors, {args.queries} queries, recall@{args.k} against exact search\n")
+    print(f"{'tier':<10} {'param':<14} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+
+    sweeps = {
+        "flat": ("-", [None]),
+        "ivf_flat": ("nprobe", [1, 4, 16, 64]),
+        "ivf_pq": ("nprobe", [1, 4, 16, 64]),
+        "hnsw": ("efSearch", [16, 32, 64, 128]),
+    }
+    for kind, (param, values) in sweeps.items():
+        config = IndexConfig(kind, min_vectors=0, nlist=args.nlist, pq_m=args.pq_m)
+        start = time.perf_counter()
+        try:
+            index = build_index(config, corpus, ids)
+        except RuntimeError as e:
+            print(f"{kind:<10} skipped: {e}")
+            continue
+        build_time = time.perf_counter() - start
+
+        for value in values:
+            if param == "nprobe":
+                config.nprobe = value
+            elif param == "efSearch":
+                config.ef_search = value
+            apply_search_params(index, config)
+            recall, p50, p99 = run(index, queries, truth, args.k)
+            label = f"{param}={value}" if value is not None else param
+            print(f"{kind:<10} {label:<14} {recall:7.3f} {p50:8.3f} {p99:8.3f} {build_time:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
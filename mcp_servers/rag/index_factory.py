@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+MIN_POINTS_PER_CENTROID = 39  # below this FAISS k-means warns and clusters poorly
+
+
+@dataclass
+class IndexConfig:
+    kind: str = "flat"           # one of INDEX_TYPES
+    min_vectors: int = 10_000    # stay on exact flat search until the corpus is this large
+    nlist: int = 1024            # IVF cells (capped by corpus size)
+    pq_m: int = 16               # PQ sub-quantizers; must divide the embedding dimension
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16             # IVF cells visited per query
+    ef_search: int = 64          # HNSW candidate list size per query
+
+    def __post_init__(self):
+        if self.kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{self.kind}', expected one of {INDEX_TYPES}")
+
+
+def effective_kind(config: IndexConfig, n_vectors: int) -> str:
+    """The tier to build for a corpus of `n_vectors`: flat until training pays off."""
+    if config.kind == "flat" or n_vectors < config.min_vectors:
+        return "flat"
+    return config.kind
+
+
+def kind_of(index: faiss.Index) -> str:
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    return kind_of(index) != "hnsw"
+
+
+def is_lossy(index: faiss.Index) -> bool:
+    return kind_of(index) == "ivf_pq"
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Every ID stored in an index built by `build_index`, in no particular order."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    if kind_of(index) == "flat":
+        return np.arange(index.ntotal, dtype=np.int64)  # the old positional IndexFlatL2
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    parts = [np.empty(0, dtype=np.int64)]
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ptr = invlists.get_ids(list_no)
+            parts.append(faiss.rev_swig_ptr(ptr, size).astype(np.int64))
+            invlists.release_ids(list_no, ptr)
+    return np.concatenate(parts)
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray, ids: np.ndarray, dim: Optional[int] = None) -> faiss.Index:
+    """Build (and train, if needed) an index holding `vectors` under `ids`.
+
+    Every tier accepts `add_with_ids` and `reconstruct(id)`: flat and HNSW are
+    wrapped in IndexIDMap2, IVF indexes keep IDs natively with a hashtable
+    direct map so vectors can still be removed and reconstructed.
+    """
+    dim = dim or vectors.shape[1]
+    kind = effective_kind(config, len(vectors))
+
+    if kind == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    elif kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        hnsw.hnsw.efConstruction = config.ef_construction
+        index = faiss.IndexIDMap2(hnsw)
+    else:
+        nlist = max(1, min(config.nlist, len(vectors) // MIN_POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.pq_m, config.pq_bits)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.train(vectors)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+    apply_search_params(index, config)
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def apply_search_params(index: faiss.Index, config: IndexConfig):
+    kind = kind_of(index)
+    params = faiss.ParameterSpace()
+    if kind in ("ivf_flat", "ivf_pq"):
+        params.set_index_parameter(index, "nprobe", config.nprobe)
+    elif kind == "hnsw":
+        params.set_index_parameter(index, "efSearch", config.ef_search)
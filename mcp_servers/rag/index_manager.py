@@ -0,0 +1,264 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from rag.common import mcp_log, atomic_write_bytes, atomic_write_text
+from rag.chunk_store import ChunkStore
+from rag.embeddings import NORMALIZATION, l2_normalize
+from rag.hybrid import RRF_K, reciprocal_rank_fusion
+from rag.index_factory import IndexConfig, apply_search_params, build_index, index_ids, is_lossy, kind_of
+
+INDEX_FILENAME = "index.bin"
+CHUNKS_FILENAME = "chunks.sqlite"
+TOMBSTONES_FILENAME = "tombstones.npy"
+GENERATION_FILENAME = "generation.json"
+LEGACY_METADATA_FILENAME = "metadata.json"
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    generation: int
+    index: faiss.Index
+    params: Optional[faiss.SearchParameters] = None  # filters tombstoned IDs, if any
+    selector: Optional[faiss.IDSelector] = None      # kept alive alongside `params`
+    ids: Optional[np.ndarray] = None                 # sorted live IDs; keyword hits outside it are hidden
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Mask of the `ids` this generation can return."""
+        if self.ids is None or not len(self.ids):
+            return np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return self.ids[pos] == ids
+
+
+class IndexManager:
+    """Keeps the FAISS index resident between searches.
+
+    Chunk rows live in a SQLite `ChunkStore` keyed by vector ID, so a search
+    only reads the k rows it returns. Readers grab one immutable
+    `IndexSnapshot` per query; `publish()` writes a new generation to disk and
+    the next `current()` call in this or any other process notices the changed
+    generation marker and swaps the snapshot reference. Vector IDs are never
+    reused, so rows fetched for an older snapshot still belong to its vectors.
+
+    The marker also records how the published vectors were normalized. An
+    index from before embeddings were L2-normalized is re-normalized in
+    memory on load, so its distances match the unit query vectors until
+    DocumentIndex rewrites it; one that only keeps PQ codes can't be, and is
+    not served.
+    """
+
+    def __init__(self, index_dir: Path, mmap: bool = True, config: Optional[IndexConfig] = None):
+        self.index_dir = Path(index_dir)
+        self.config = config or IndexConfig()
+        self.index_file = self.index_dir / INDEX_FILENAME
+        self.tombstones_file = self.index_dir / TOMBSTONES_FILENAME
+        self.generation_file = self.index_dir / GENERATION_FILENAME
+        self.mmap = mmap
+        self._lock = threading.Lock()
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._stamp = None
+        self.store = ChunkStore(self.index_dir / CHUNKS_FILENAME)
+        self._migrate_legacy_metadata()
+
+    def _migrate_legacy_metadata(self):
+        legacy = self.index_dir / LEGACY_METADATA_FILENAME
+        if not legacy.exists():
+            return
+        if self.store.count() == 0:
+            rows = self.store.import_json(legacy)
+            mcp_log("INFO", f"Migrated {rows} chunks from {LEGACY_METADATA_FILENAME} into {CHUNKS_FILENAME}")
+        # Keep the original next to the store rather than deleting it; it is not read again.
+        backup = legacy.with_name(LEGACY_METADATA_FILENAME + ".bak")
+        os.replace(legacy, backup)
+        mcp_log("INFO", f"Moved {LEGACY_METADATA_FILENAME} to {backup.name}")
+
+    def _marker_stamp(self):
+        # os.replace() gives the marker a new inode on every publish, so the
+        # stat tuple changes even if two publishes land in the same mtime tick.
+        for path in (self.generation_file, self.index_file):
+            try:
+                st = os.stat(path)
+                return (str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _read_marker(self) -> dict:
+        try:
+            return json.loads(self.generation_file.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _read_index(self) -> faiss.Index:
+        if self.mmap:
+            try:
+                return faiss.read_index(str(self.index_file), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                mcp_log("WARN", f"Memory-mapped read not supported for this index, loading fully: {e}")
+        return faiss.read_index(str(self.index_file))
+
+    def _read_tombstones(self, expected: int) -> np.ndarray:
+        if not expected:
+            return np.empty(0, dtype=np.int64)
+        return np.load(self.tombstones_file)
+
+    def _load(self, attempts: int = 3) -> bool:
+        for _ in range(attempts):
+            stamp = self._marker_stamp()
+            if stamp is None:
+                return False
+            marker = self._read_marker()
+            try:
+                index = self._read_index()
+                dead = self._read_tombstones(marker.get("tombstones", 0))
+            except (FileNotFoundError, ValueError, RuntimeError) as e:
+                mcp_log("WARN", f"Index reload failed, retrying: {e}")
+                time.sleep(0.05)
+                continue
+
+            consistent = (
+                index.ntotal == marker.get("ntotal", index.ntotal)
+                and len(dead) == marker.get("tombstones", 0)
+            )
+            if consistent and stamp == self._marker_stamp():
+                if not self._normalized(marker):
+                    index = self._renormalized(index)
+                    if index is None:
+                        return False
+                self._snapshot = self._make_snapshot(marker.get("generation", 0), index, dead)
+                self._stamp = stamp
+                mcp_log("INFO", f"Loaded index generation {self._snapshot.generation} ({index.ntotal} vectors)")
+                return True
+            # A writer is mid-publish; wait for the marker to settle.
+            time.sleep(0.05)
+
+        mcp_log("WARN", "Index files inconsistent after retries; keeping previous generation")
+        return False
+
+    def _normalized(self, marker: dict) -> bool:
+        if "normalization" in marker:
+            return marker["normalization"] == NORMALIZATION
+        # Generations published before the marker carried it; DocumentIndex records it once saved
+        return self.store.get_meta("normalization") == NORMALIZATION
+
+    def _renormalized(self, index: faiss.Index) -> Optional[faiss.Index]:
+        if is_lossy(index):
+            mcp_log("WARN", "Index holds raw, un-normalized PQ codes; not serving it until it is rebuilt")
+            return None
+        mcp_log("INFO", f"Re-normalizing {index.ntotal} raw vectors in memory until the index is rewritten")
+        ids = index_ids(index)
+        vectors = index.reconstruct_batch(ids) if len(ids) else np.empty((0, index.d), dtype=np.float32)
+        return build_index(IndexConfig(kind_of(index), min_vectors=0), l2_normalize(vectors), ids, index.d)
+
+    def _make_snapshot(self, generation: int, index: faiss.Index, dead: np.ndarray) -> IndexSnapshot:
+        apply_search_params(index, self.config)
+        ids = np.setdiff1d(index_ids(index), dead)
+        if not len(dead):
+            return IndexSnapshot(generation, index, ids=ids)
+        # HNSW keeps removed vectors in the graph; exclude the tombstoned IDs.
+        selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(dead))
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.config.ef_search)
+        return IndexSnapshot(generation, index, params, selector, ids)
+
+    def current(self) -> Optional[IndexSnapshot]:
+        if self._snapshot is None or self._marker_stamp() != self._stamp:
+            with self._lock:
+                if self._snapshot is None or self._marker_stamp() != self._stamp:
+                    self._load()
+        return self._snapshot
+
+    def _vector_hits(self, snapshot: IndexSnapshot, query_vec: np.ndarray, k: int) -> list[tuple[int, float]]:
+        D, I = snapshot.index.search(query_vec, k, params=snapshot.params)
+        return [(int(idx), float(dist)) for dist, idx in zip(D[0], I[0]) if idx >= 0]
+
+    def _keyword_hits(self, snapshot: IndexSnapshot, query_text: str, k: int) -> list[int]:
+        """Top-k BM25 hits among the IDs `snapshot` holds.
+
+        The FTS table covers every row in the store, including rows inserted
+        for a generation that is not published yet and rows whose vectors the
+        live generation already dropped; both are skipped, widening the
+        query until k visible hits are found or the matches run out.
+        """
+        limit = k
+        while True:
+            rows = self.store.keyword_search(query_text, limit)
+            ids = np.array([idx for idx, _ in rows], dtype=np.int64)
+            visible = ids[snapshot.contains(ids)]
+            if len(visible) >= k or len(rows) < limit:
+                return visible[:k].tolist()
+            limit *= 4
+
+    def _rows(self, hits: list[tuple[int, float]]) -> list[dict]:
+        rows = self.store.fetch(idx for idx, _ in hits)
+        results = []
+        for idx, score in hits:
+            row = rows.get(idx)
+            if row is None:
+                continue  # removed by a publish that landed after this snapshot
+            row["score"] = score
+            results.append(row)
+        return results
+
+    def search(self, query_vec: np.ndarray, k: int) -> list[dict]:
+        """Vector-only search; `score` is the L2 distance."""
+        snapshot = self.current()
+        if snapshot is None:
+            return []
+        return self._rows(self._vector_hits(snapshot, query_vec, k))
+
+    def hybrid_search(self, query_vec: np.ndarray, query_text: str, k: int, candidates: int = 20, rrf_k: int = RRF_K) -> list[dict]:
+        """Fuse the top `candidates` vector and BM25 hits with RRF; `score` is the fused score (higher is better)."""
+        snapshot = self.current()
+        if snapshot is None:
+            return []
+        candidates = max(candidates, k)
+        vector_ids = [idx for idx, _ in self._vector_hits(snapshot, query_vec, candidates)]
+        keyword_ids = self._keyword_hits(snapshot, query_text, candidates)
+        return self._rows(reciprocal_rank_fusion([vector_ids, keyword_ids], rrf_k)[:k])
+
+    def publish(self, index: faiss.Index, tombstones: Optional[np.ndarray] = None) -> int:
+        """Atomically write a new generation and make it visible to readers.
+
+        Rows for every live vector must already be in the chunk store;
+        `tombstones` lists IDs still in the index whose rows are gone.
+        """
+        dead = np.asarray(tombstones if tombstones is not None else [], dtype=np.int64)
+        with self._lock:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            generation = self._read_marker().get("generation", 0) + 1
+
+            fd, tmp = tempfile.mkstemp(dir=self.index_dir, prefix=f".{INDEX_FILENAME}.", suffix=".tmp")
+            os.close(fd)
+            try:
+                faiss.write_index(index, tmp)
+                os.replace(tmp, self.index_file)
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+            if len(dead):
+                buf = io.BytesIO()
+                np.save(buf, dead)
+                atomic_write_bytes(self.tombstones_file, buf.getvalue())
+            else:
+                self.tombstones_file.unlink(missing_ok=True)
+            # Marker goes last: readers only trust files whose counts match it.
+            # Only DocumentIndex publishes, and it only ever holds L2-normalized vectors
+            marker = {
+                "generation": generation,
+                "ntotal": index.ntotal,
+                "tombstones": len(dead),
+                "normalization": NORMALIZATION,
+            }
+            atomic_write_text(self.generation_file, json.dumps(marker))
+            self._load()
+        return generation
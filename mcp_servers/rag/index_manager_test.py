@@ -0,0 +1,267 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.doc_index import DocumentIndex
+from rag.embeddings import NORMALIZATION
+from rag.index_factory import IndexConfig, build_index, index_ids
+from rag.index_manager import IndexManager
+
+DIM = 8
+
+
+def entries(doc: str, text: str, n: int) -> list[dict]:
+    return [{"doc": doc, "chunk_id": f"{doc}_{i}", "chunk": f"{text} {i}"} for i in range(n)]
+
+
+def vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def keyword_docs(manager: IndexManager, query: str) -> set[str]:
+    query_vec = vectors(1, 99)
+    return {row["doc"] for row in manager.hybrid_search(query_vec, query, k=10, candidates=10)}
+
+
+def test_hybrid_search_only_sees_the_published_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = IndexManager(Path(tmp))
+        doc_index = DocumentIndex(Path(tmp), manager)
+        doc_index.replace_document("old.md", "h1", vectors(3, 1), entries("old.md", "falcon engine", 3))
+        doc_index.save()
+        assert keyword_docs(manager, "falcon") == {"old.md"}
+
+        # Written but not published: BM25 must not surface the new rows yet.
+        doc_index.replace_document("new.md", "h2", vectors(3, 2), entries("new.md", "falcon wing", 3))
+        doc_index.replace_document("old.md", "h3", vectors(2, 3), entries("old.md", "raptor engine", 2))
+        assert keyword_docs(manager, "falcon wing raptor") == {"old.md"}
+        assert all(row["chunk"].startswith("falcon engine") for row in manager.hybrid_search(vectors(1, 4), "falcon", 10))
+
+        doc_index.save()
+        rows = manager.hybrid_search(vectors(1, 5), "falcon raptor", k=10)
+        assert {row["chunk"].split()[0] for row in rows} == {"falcon", "raptor"}
+        assert not any(row["chunk"].startswith("falcon engine") for row in rows)
+
+
+def test_keyword_hits_widen_past_hidden_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = IndexManager(Path(tmp))
+        doc_index = DocumentIndex(Path(tmp), manager)
+        doc_index.replace_document("live.md", "h1", vectors(2, 1), entries("live.md", "falcon", 2))
+        doc_index.save()
+        doc_index.replace_document("pending.md", "h2", vectors(40, 2), entries("pending.md", "falcon falcon falcon", 40))
+        assert [manager.store.fetch([i])[i]["doc"] for i in manager._keyword_hits(manager.current(), "falcon", 2)] == ["live.md"] * 2
+
+
+def test_index_ids_for_every_tier():
+    ids = np.arange(100, 400, dtype=np.int64)
+    data = vectors(len(ids), 7)
+    for kind in ("flat", "hnsw", "ivf_flat", "ivf_pq"):
+        config = IndexConfig(kind=kind, min_vectors=1, nlist=4, pq_m=2)
+        assert np.array_equal(np.sort(index_ids(build_index(config, data, ids))), ids), kind
+
+
+def test_legacy_metadata_is_kept_as_backup():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "metadata.json"
+        legacy.write_text(json.dumps([{"doc": "a.md", "chunk_id": "a_0", "chunk": "text"}]))
+        manager = IndexManager(Path(tmp))
+        assert manager.store.fetch([0])[0]["chunk_id"] == "a_0"
+        assert not legacy.exists()
+        assert json.loads((Path(tmp) / "metadata.json.bak").read_text())[0]["chunk_id"] == "a_0"
+        IndexManager(Path(tmp))  # nothing left to migrate on the next start
+
+
+def test_reader_hot_reloads_each_published_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = DocumentIndex(Path(tmp), IndexManager(Path(tmp)))
+        writer.replace_document("a.md", "h1", vectors(3, 1), entries("a.md", "falcon", 3))
+        assert writer.save() == 1
+        assert json.loads((Path(tmp) / "generation.json").read_text()) == {
+            "generation": 1, "ntotal": 3, "tombstones": 0, "normalization": NORMALIZATION,
+        }
+
+        reader = IndexManager(Path(tmp))  # a second server process
+        first = reader.current()
+        assert first.generation == 1
+        assert reader.search(vectors(3, 1)[:1], k=1)[0]["doc"] == "a.md"
+
+        writer.replace_document("a.md", "h2", vectors(2, 2), entries("a.md", "raptor", 2))
+        writer.replace_document("b.md", "h3", vectors(2, 3), entries("b.md", "eagle", 2))
+        assert writer.save() == 2
+
+        # no restart: the next query notices the marker and swaps the snapshot
+        assert reader.current().generation == 2
+        assert reader.search(vectors(2, 2)[:1], k=1)[0]["chunk"] == "raptor 0"
+        assert reader.search(vectors(2, 3)[1:2], k=1)[0]["doc"] == "b.md"
+        assert reader.current().index.ntotal == 4
+        # a query still holding the old snapshot finishes against it
+        assert first.index.ntotal == 3 and first.generation == 1
+
+
+def test_snapshot_is_reused_until_the_marker_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = DocumentIndex(Path(tmp), IndexManager(Path(tmp)))
+        writer.replace_document("a.md", "h1", vectors(3, 1), entries("a.md", "falcon", 3))
+        writer.save()
+
+        reader = IndexManager(Path(tmp))
+        loads = []
+        load = reader._load
+        reader._load = lambda attempts=3: loads.append(1) or load(attempts)
+        snapshot = reader.current()
+        assert reader.current() is snapshot and reader.current() is snapshot
+        assert len(loads) == 1
+
+        writer.save()  # republish, same contents
+        assert reader.current() is not snapshot and reader.current().generation == 2
+        assert len(loads) == 2
+
+
+def test_index_is_memory_mapped():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = DocumentIndex(Path(tmp), IndexManager(Path(tmp)))
+        writer.replace_document("a.md", "h1", vectors(3, 1), entries("a.md", "falcon", 3))
+        writer.save()
+
+        flags = []
+        read_index = faiss.read_index
+
+        def recording(path, *args):
+            flags.append(args[0] if args else 0)
+            return read_index(path, *args)
+
+        faiss.read_index = recording
+        try:
+            mapped = IndexManager(Path(tmp))
+            assert mapped.current().index.ntotal == 3
+            assert flags == [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY]
+
+            flags.clear()
+            assert IndexManager(Path(tmp), mmap=False).current().index.ntotal == 3
+            assert flags == [0]
+
+            # index types FAISS can't map are read fully instead
+            def no_mmap(path, *args):
+                flags.append(args[0] if args else 0)
+                if args:
+                    raise RuntimeError("mmap not supported")
+                return read_index(path)
+
+            flags.clear()
+            faiss.read_index = no_mmap
+            fallback = IndexManager(Path(tmp))
+            assert fallback.search(vectors(3, 1)[:1], k=1)[0]["doc"] == "a.md"
+            assert flags == [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY, 0]
+        finally:
+            faiss.read_index = read_index
+
+
+def test_load_retries_while_a_publish_is_in_flight():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = DocumentIndex(Path(tmp), IndexManager(Path(tmp)))
+        writer.replace_document("a.md", "h1", vectors(3, 1), entries("a.md", "falcon", 3))
+        writer.save()
+        reader = IndexManager(Path(tmp))
+        assert reader.current().generation == 1
+
+        # index.bin replaced, marker not yet: counts disagree, so the reader waits and retries
+        marker = reader._read_marker
+        markers = iter([{"generation": 2, "ntotal": 5, "tombstones": 0}])
+        reader._read_marker = lambda: next(markers, None) or marker()
+        assert reader._load(attempts=3)
+        assert reader.current().generation == 1
+
+        # a torn read fails once, then succeeds
+        read = reader._read_index
+        failures = iter([RuntimeError("read error: truncated file")])
+
+        def flaky():
+            error = next(failures, None)
+            if error:
+                raise error
+            return read()
+
+        reader._read_index = flaky
+        assert reader._load(attempts=2)
+
+        # never settles: keep serving the previous snapshot
+        reader._read_marker = lambda: {"generation": 9, "ntotal": 99, "tombstones": 0}
+        previous = reader.current()
+        assert not reader._load(attempts=2)
+        assert reader._snapshot is previous
+        assert reader.search(vectors(3, 1)[:1], k=1)[0]["doc"] == "a.md"
+
+
+def write_raw_index(index_dir: Path, index: faiss.Index, marker: dict = None) -> IndexManager:
+    """An index.bin from before embeddings were normalized, with its rows and (optionally) a marker."""
+    manager = IndexManager(index_dir)
+    manager.store.insert([{"id": i, "doc": "raw.md", "chunk_id": f"raw_{i}", "chunk": f"raw {i}"} for i in range(index.ntotal)])
+    faiss.write_index(index, str(index_dir / "index.bin"))
+    if marker is not None:
+        (index_dir / "generation.json").write_text(json.dumps(marker))
+    return manager
+
+
+def test_raw_legacy_index_is_renormalized_before_serving():
+    # Chunk 1 points the same way as the query but has a large norm: L2 on raw vectors picks chunk 0
+    raw = np.array([[1.0, 0.0], [12.0, 16.0]], dtype=np.float32)
+    query = np.array([[0.8, 0.6]], dtype=np.float32)
+    for marker in (None, {"generation": 3, "ntotal": 2, "tombstones": 0}):
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = faiss.IndexFlatL2(2)
+            legacy.add(raw)
+            write_raw_index(Path(tmp), legacy, marker)
+
+            reader = IndexManager(Path(tmp))
+            assert reader.search(query, k=1)[0]["chunk_id"] == "raw_1"
+            served = reader.current().index
+            assert np.allclose(np.linalg.norm(served.reconstruct_batch(np.arange(2)), axis=1), 1.0)
+            # only the in-memory copy changes; DocumentIndex rewrites the file
+            assert type(faiss.read_index(str(Path(tmp) / "index.bin"))) is faiss.IndexFlatL2
+
+
+def test_index_saved_with_normalization_meta_is_served_as_is():
+    with tempfile.TemporaryDirectory() as tmp:
+        unit = np.array([[1.0, 0.0], [0.6, 0.8]], dtype=np.float32)
+        index = build_index(IndexConfig(), unit, np.arange(2, dtype=np.int64))
+        # published by a version that kept the normalization in the store meta only
+        manager = write_raw_index(Path(tmp), index, {"generation": 1, "ntotal": 2, "tombstones": 0})
+        manager.store.set_meta("normalization", NORMALIZATION)
+        reader = IndexManager(Path(tmp))
+
+        def renormalized(index):
+            raise AssertionError("re-normalized an index that is already unit length")
+
+        reader._renormalized = renormalized
+        assert reader.search(unit[1:], k=1)[0]["chunk_id"] == "raw_1"
+
+
+def test_raw_pq_index_is_not_served():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = vectors(300, 5) * 30
+        index = build_index(IndexConfig("ivf_pq", min_vectors=1, nlist=2, pq_m=2), data, np.arange(300, dtype=np.int64))
+        write_raw_index(Path(tmp), index)
+        reader = IndexManager(Path(tmp))
+        assert reader.current() is None
+        assert reader.search(data[:1], k=1) == []
+
+
+if __name__ == "__main__":
+    test_hybrid_search_only_sees_the_published_generation()
+    test_keyword_hits_widen_past_hidden_rows()
+    test_index_ids_for_every_tier()
+    test_legacy_metadata_is_kept_as_backup()
+    test_reader_hot_reloads_each_published_generation()
+    test_snapshot_is_reused_until_the_marker_changes()
+    test_index_is_memory_mapped()
+    test_load_retries_while_a_publish_is_in_flight()
+    test_raw_legacy_index_is_renormalized_before_serving()
+    test_index_saved_with_normalization_meta_is_served_as_is()
+    test_raw_pq_index_is_not_served()
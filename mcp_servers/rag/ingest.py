@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import numpy as np
+
+from rag.common import mcp_log, atomic_write_text
+from rag.doc_index import DocumentIndex
+
+EXTRACTED = "extracted"
+CHUNKED = "chunked"
+INDEXED = "indexed"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.md5(Path(path).read_bytes()).hexdigest()
+
+
+class IngestJournal:
+    """Append-only JSONL log of the last stage each (file, md5) pair finished.
+
+    Every line is flushed and fsynced, so after a crash the journal says
+    exactly which stage output on disk can be trusted.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.stages: dict[tuple[str, str], str] = {}
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash
+                self.stages[(rec["file"], rec["hash"])] = rec["stage"]
+
+    def stage(self, name: str, fhash: str) -> Optional[str]:
+        return self.stages.get((name, fhash))
+
+    def record(self, name: str, fhash: str, stage: str):
+        self.stages[(name, fhash)] = stage
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"file": name, "hash": fhash, "stage": stage}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        """Drop finished entries so the journal only describes in-flight work."""
+        self.stages = {k: v for k, v in self.stages.items() if v != INDEXED}
+        lines = [json.dumps({"file": n, "hash": h, "stage": s}) for (n, h), s in self.stages.items()]
+        atomic_write_text(self.path, "".join(line + "\n" for line in lines))
+
+
+@dataclass
+class IngestStages:
+    extract: Callable[[str], str]                        # picklable; runs in the process pool
+    chunk: Callable[[str], list[str]]                    # blocking LLM work; runs in a thread
+    embed: Callable[[list[str]], Awaitable[np.ndarray]]
+    enrich: Optional[Callable[[str], Awaitable[str]]] = None  # async I/O such as captioning
+    # Page stream for formats that support it (else None): pages are converted in
+    # the process pool and enriched/chunked/embedded window by window as they arrive
+    stream: Optional[Callable[[str, Executor], Optional[AsyncIterator[str]]]] = None
+    # Follow-up work per changed file, e.g. triplet extraction; runs once the new generation is live
+    after_index: Optional[Callable[[str, list[str]], Awaitable[object]]] = None
+
+
+@dataclass
+class PreparedFile:
+    path: Path
+    fhash: str
+    chunks: list[str]
+    vectors: Optional[np.ndarray] = None
+
+
+class IngestionPipeline:
+    """Extract → enrich → chunk → embed for many files at once, then one index write.
+
+    Extraction runs in a process pool; captioning, chunking and embedding are
+    awaited concurrently across files with bounded parallelism. Formats with
+    a page stream (PDF) are converted a few pages per task across the pool
+    and flow through the later stages window by window. Hashing and
+    index writes go to threads, so `run()` can share an event loop with a
+    serving MCP server. Each stage's output is written under `work_dir` and
+    checkpointed in the journal, so a restarted run resumes every file from
+    its last finished stage.
+    """
+
+    def __init__(
+        self,
+        doc_index: DocumentIndex,
+        stages: IngestStages,
+        work_dir: Path,
+        workers: int = 4,
+        llm_concurrency: int = 2,
+        stream_window_words: int = 1024,
+    ):
+        self.doc_index = doc_index
+        self.stages = stages
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.llm_concurrency = llm_concurrency
+        self.stream_window_words = stream_window_words  # pages are buffered up to this size before chunking
+        self.journal = IngestJournal(self.work_dir / "journal.jsonl")
+
+    def _artifact(self, fhash: str, suffix: str) -> Path:
+        return self.work_dir / f"{fhash}{suffix}"
+
+    async def _prepare(self, pool, llm: asyncio.Semaphore, embed_slot: asyncio.Semaphore, path: Path, fhash: str) -> Optional[PreparedFile]:
+        loop = asyncio.get_running_loop()
+        name = path.name
+        stage = self.journal.stage(name, fhash)
+        md_file, chunks_file = self._artifact(fhash, ".md"), self._artifact(fhash, ".chunks.json")
+        try:
+            if stage == CHUNKED and chunks_file.exists():
+                mcp_log("RESUME", f"{name}: reusing chunks from previous run")
+                chunks = json.loads(chunks_file.read_text(encoding="utf-8"))
+            elif stage != EXTRACTED and self.stages.stream and (pages := self.stages.stream(str(path), pool)) is not None:
+                chunks, vectors = await self._stream(llm, embed_slot, path, pages)
+                atomic_write_text(chunks_file, json.dumps(chunks))
+                self.journal.record(name, fhash, CHUNKED)
+                return PreparedFile(path, fhash, chunks, vectors)
+            else:
+                if stage == EXTRACTED and md_file.exists():
+                    mcp_log("RESUME", f"{name}: reusing extracted markdown from previous run")
+                    markdown = md_file.read_text(encoding="utf-8")
+                else:
+                    mcp_log("PROC", f"Extracting: {name}")
+                    markdown = await loop.run_in_executor(pool, self.stages.extract, str(path))
+                    if self.stages.enrich and markdown.strip():
+                        async with llm:
+                            markdown = await self.stages.enrich(markdown)
+                    atomic_write_text(md_file, markdown)
+                    self.journal.record(name, fhash, EXTRACTED)
+
+                if not markdown.strip():
+                    mcp_log("WARN", f"No content extracted from {name}")
+                    return PreparedFile(path, fhash, [])
+
+                async with llm:
+                    mcp_log("INFO", f"Chunking {name} ({len(markdown.split())} words)")
+                    chunks = await asyncio.to_thread(self.stages.chunk, markdown)
+                atomic_write_text(chunks_file, json.dumps(chunks))
+                self.journal.record(name, fhash, CHUNKED)
+
+            async with embed_slot:
+                mcp_log("INFO", f"Embedding {len(chunks)} chunks from {name}")
+                vectors = await self.stages.embed(chunks) if chunks else None
+            return PreparedFile(path, fhash, chunks, vectors)
+
+        except Exception as e:
+            mcp_log("ERROR", f"Failed to process {name}: {e}")
+            return None
+
+    async def _stream(self, llm: asyncio.Semaphore, embed_slot: asyncio.Semaphore, path: Path, pages: AsyncIterator[str]) -> tuple[list[str], Optional[np.ndarray]]:
+        """Enrich, chunk and embed a page stream in windows of ~`stream_window_words`.
+
+        Later pages keep converting in the pool while a window is being
+        captioned, chunked and embedded, and only one window of markdown is
+        held at a time.
+        """
+        mcp_log("PROC", f"Streaming pages: {path.name}")
+        chunks: list[str] = []
+        vectors: list[np.ndarray] = []
+        window: list[str] = []
+        words = 0
+
+        async def flush():
+            markdown = "\n\n".join(window)
+            window.clear()
+            if self.stages.enrich and markdown.strip():
+                async with llm:
+                    markdown = await self.stages.enrich(markdown)
+            if not markdown.strip():
+                return
+            async with llm:
+                part = [c for c in await asyncio.to_thread(self.stages.chunk, markdown) if c.strip()]
+            if part:
+                async with embed_slot:
+                    vectors.append(await self.stages.embed(part))
+                chunks.extend(part)
+
+        async for page in pages:
+            window.append(page)
+            words += len(page.split())
+            if words >= self.stream_window_words:
+                await flush()
+                words = 0
+        if window:
+            await flush()
+
+        mcp_log("INFO", f"Streamed {len(chunks)} chunks from {path.name}")
+        return chunks, np.vstack(vectors) if vectors else None
+
+    def _index(self, prepared: list[PreparedFile]) -> int:
+        changed = 0
+        for item in prepared:
+            name = item.path.name
+            if item.vectors is None or not len(item.vectors):
+                changed += bool(self.doc_index.remove_document(name))
+                continue
+            entries = [
+                {"doc": name, "chunk": chunk, "chunk_id": f"{item.path.stem}_{i}"}
+                for i, chunk in enumerate(item.chunks)
+            ]
+            self.doc_index.replace_document(name, item.fhash, item.vectors, entries)
+            changed += 1
+
+        if changed:
+            generation = self.doc_index.save()
+            mcp_log("SAVE", f"Published index generation {generation} with {changed} updated files")
+        for item in prepared:
+            self.journal.record(item.path.name, item.fhash, INDEXED)
+            for suffix in (".md", ".chunks.json"):
+                self._artifact(item.fhash, suffix).unlink(missing_ok=True)
+        return changed
+
+    async def run(self, files: list[Path]) -> int:
+        pending = []
+        for path in files:
+            fhash = await asyncio.to_thread(file_hash, path)
+            if self.doc_index.is_current(path.name, fhash):
+                mcp_log("SKIP", f"Skipping unchanged file: {path.name}")
+                continue
+            pending.append((path, fhash))
+
+        if not pending:
+            return 0
+
+        llm = asyncio.Semaphore(self.llm_concurrency)
+        embed_slot = asyncio.Semaphore(1)  # the embedding engine parallelises within a file
+        # Full pool even for a single file: a streamed PDF converts page ranges in parallel
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            results = await asyncio.gather(*(
+                self._prepare(pool, llm, embed_slot, path, fhash) for path, fhash in pending
+            ))
+
+        # Index writes and the publish block, so keep them off the event loop
+        prepared = [r for r in results if r is not None]
+        changed = await asyncio.to_thread(self._index, prepared)
+        self.journal.compact()
+        if self.stages.after_index:
+            await asyncio.gather(*(self._after_index(item) for item in prepared if item.chunks))
+        return changed
+
+    async def _after_index(self, item: PreparedFile):
+        try:
+            await self.stages.after_index(item.path.name, item.chunks)
+        except Exception as e:
+            mcp_log("ERROR", f"Post-index step failed for {item.path.name}: {e}")
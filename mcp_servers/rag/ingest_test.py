@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.doc_index import DocumentIndex
+from rag.index_manager import IndexManager
+from rag.ingest import CHUNKED, EXTRACTED, INDEXED, IngestJournal, IngestionPipeline, IngestStages, PreparedFile
+
+DIM = 8
+
+
+class Killed(BaseException):
+    """Stands in for the process dying: not an Exception, so _prepare can't swallow it."""
+
+
+def extract(path: str) -> str:
+    # Runs in the process pool, so calls are counted in a file next to the input
+    with open(path + ".extracted", "a", encoding="utf-8") as f:
+        f.write("x\n")
+    return Path(path).read_text(encoding="utf-8")
+
+
+def extract_calls(path: Path) -> int:
+    marker = Path(str(path) + ".extracted")
+    return len(marker.read_text().splitlines()) if marker.exists() else 0
+
+
+def vector(text: str) -> np.ndarray:
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    v = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class StubStages:
+    """Chunk/embed stubs that record what they were asked to do."""
+
+    def __init__(self, kill_on: str = ""):
+        self.chunked: list[str] = []
+        self.embedded: list[str] = []
+        self.kill_on = kill_on
+
+    def chunk(self, markdown: str) -> list[str]:
+        self.chunked.append(markdown)
+        return [p.strip() for p in markdown.split("\n\n") if p.strip()]
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if self.kill_on and any(self.kill_on in t for t in texts):
+            raise Killed()
+        self.embedded.extend(texts)
+        return np.stack([vector(t) for t in texts])
+
+    def stages(self, **kwargs) -> IngestStages:
+        return IngestStages(extract=extract, chunk=self.chunk, embed=self.embed, **kwargs)
+
+
+def make_pipeline(root: Path, stub: StubStages, **kwargs) -> tuple[IngestionPipeline, IndexManager]:
+    """A fresh pipeline over the on-disk state, as after a restart."""
+    manager = IndexManager(root / "index")
+    doc_index = DocumentIndex(root / "index", manager)
+    return IngestionPipeline(doc_index, stub.stages(**kwargs), root / "work", workers=1), manager
+
+
+def test_journal_survives_restart_and_torn_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "journal.jsonl"
+        journal = IngestJournal(path)
+        journal.record("a.md", "h1", EXTRACTED)
+        journal.record("a.md", "h1", CHUNKED)
+        journal.record("b.md", "h2", INDEXED)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"file": "c.md", "ha')  # crash mid-write
+
+        reopened = IngestJournal(path)
+        assert reopened.stage("a.md", "h1") == CHUNKED
+        assert reopened.stage("b.md", "h2") == INDEXED
+        assert reopened.stage("c.md", "h3") is None
+
+        reopened.compact()
+        assert IngestJournal(path).stages == {("a.md", "h1"): CHUNKED}
+
+
+def test_killed_run_resumes_without_reembedding_finished_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        docs = root / "docs"
+        docs.mkdir()
+        a, b = docs / "a.md", docs / "b.md"
+        a.write_text("alpha one\n\nalpha two", encoding="utf-8")
+        b.write_text("bravo one\n\nbravo two", encoding="utf-8")
+
+        first = StubStages()
+        pipeline, _ = make_pipeline(root, first)
+        assert asyncio.run(pipeline.run([a])) == 1
+
+        # b dies while embedding: a is already indexed, b got as far as its chunks
+        dying = StubStages(kill_on="bravo")
+        pipeline, _ = make_pipeline(root, dying)
+        try:
+            asyncio.run(pipeline.run([a, b]))
+        except Killed:
+            pass
+        else:
+            raise AssertionError("expected the run to die")
+        assert dying.embedded == []
+        assert IngestJournal(root / "work" / "journal.jsonl").stage("b.md", hashlib.md5(b.read_bytes()).hexdigest()) == CHUNKED
+
+        resumed = StubStages()
+        pipeline, manager = make_pipeline(root, resumed)
+        assert asyncio.run(pipeline.run([a, b])) == 1
+        assert resumed.embedded == ["bravo one", "bravo two"]  # nothing from a
+        assert resumed.chunked == []  # b's chunks came from the work dir
+        assert extract_calls(a) == 1 and extract_calls(b) == 1
+        assert manager.search(vector("bravo two")[None, :], k=1)[0]["chunk"] == "bravo two"
+        assert manager.search(vector("alpha one")[None, :], k=1)[0]["chunk"] == "alpha one"
+        assert not list((root / "work").glob("*.chunks.json"))
+
+
+def test_changed_files_are_reingested():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        a, b = root / "a.md", root / "b.md"
+        a.write_text("alpha one", encoding="utf-8")
+        b.write_text("bravo one", encoding="utf-8")
+        pipeline, _ = make_pipeline(root, StubStages())
+        assert asyncio.run(pipeline.run([a, b])) == 2
+
+        a.write_text("alpha revised", encoding="utf-8")
+        stub = StubStages()
+        pipeline, manager = make_pipeline(root, stub)
+        assert asyncio.run(pipeline.run([a, b])) == 1
+        assert stub.embedded == ["alpha revised"]
+
+        texts = {row["chunk"] for row in manager.search(vector("alpha revised")[None, :], k=5)}
+        assert texts == {"alpha revised", "bravo one"}
+
+        assert asyncio.run(make_pipeline(root, StubStages())[0].run([a, b])) == 0
+
+
+def test_stream_processes_pages_window_by_window():
+    async def pages():
+        for i in range(5):
+            yield f"page {i} words here"
+
+    enriched: list[str] = []
+
+    async def enrich(markdown: str) -> str:
+        enriched.append(markdown)
+        return markdown.upper()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        stub = StubStages()
+        pipeline, _ = make_pipeline(root, stub, enrich=enrich)
+        pipeline.stream_window_words = 8  # two pages per window
+
+        async def go():
+            return await pipeline._stream(asyncio.Semaphore(1), asyncio.Semaphore(1), root / "x.pdf", pages())
+
+        chunks, vectors = asyncio.run(go())
+        assert len(enriched) == 3  # pages 0-1, 2-3, 4
+        assert chunks == ["PAGE 0 WORDS HERE", "PAGE 1 WORDS HERE", "PAGE 2 WORDS HERE",
+                          "PAGE 3 WORDS HERE", "PAGE 4 WORDS HERE"]
+        assert vectors.shape == (5, DIM)
+        assert np.allclose(vectors[4], vector("PAGE 4 WORDS HERE"))
+
+
+def test_prepare_streams_when_available_and_checkpoints_chunks():
+    async def pages():
+        yield "first page"
+        yield "second page"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        pdf = root / "doc.pdf"
+        pdf.write_bytes(b"%PDF")
+        stub = StubStages()
+        pipeline, _ = make_pipeline(root, stub, stream=lambda path, pool: pages())
+
+        async def go():
+            return await pipeline._prepare(None, asyncio.Semaphore(1), asyncio.Semaphore(1), pdf, "h")
+
+        prepared = asyncio.run(go())
+        assert prepared.chunks == ["first page", "second page"]
+        assert prepared.vectors.shape == (2, DIM)
+        assert extract_calls(pdf) == 0
+        assert pipeline.journal.stage("doc.pdf", "h") == CHUNKED
+        assert json.loads((root / "work" / "h.chunks.json").read_text()) == prepared.chunks
+
+
+def test_index_removes_empty_documents_and_runs_after_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        a, b = root / "a.md", root / "b.md"
+        a.write_text("alpha one", encoding="utf-8")
+        b.write_text("bravo one", encoding="utf-8")
+        seen: list[tuple[str, list[str]]] = []
+
+        async def after_index(name: str, chunks: list[str]):
+            seen.append((name, chunks))
+            if name == "b.md":
+                raise RuntimeError("extractor down")  # logged, never fails the run
+
+        pipeline, manager = make_pipeline(root, StubStages(), after_index=after_index)
+        assert asyncio.run(pipeline.run([a, b])) == 2
+        assert sorted(seen) == [("a.md", ["alpha one"]), ("b.md", ["bravo one"])]
+
+        # An item with no vectors (file emptied) removes the document from the index
+        changed = pipeline._index([PreparedFile(a, "empty", [])])
+        assert changed == 1
+        assert "a.md" not in pipeline.doc_index.docs
+        assert [row["chunk"] for row in manager.search(vector("alpha one")[None, :], k=5)] == ["bravo one"]
+        assert pipeline.journal.stage("a.md", "empty") == INDEXED
+
+
+if __name__ == "__main__":
+    test_journal_survives_restart_and_torn_lines()
+    test_killed_run_resumes_without_reembedding_finished_documents()
+    test_changed_files_are_reingested()
+    test_stream_processes_pages_window_by_window()
+    test_prepare_streams_when_available_and_checkpoints_chunks()
+    test_index_removes_empty_documents_and_runs_after_index()
@@ -0,0 +1,258 @@
+import json
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from rapidfuzz import fuzz, process
+
+from rag.common import mcp_log
+
+# (subject, relation_subtype, object); relations never contain commas, subjects rarely do
+TRIPLET_LINE = re.compile(r"^\s*(?:\d+[.)]\s*|[-*]\s*)?\(\s*([^,]+?)\s*,\s*([^,]+?)\s*,\s*(.+?)\s*\)\s*[.,;]?\s*$")
+
+
+class Edge(NamedTuple):
+    subject: int
+    relation: str
+    object: int
+    doc: str
+
+
+def parse_triplets(output: str) -> list[tuple[str, str, str]]:
+    """(subject, relation, object) from the extractor's raw output; notes and malformed lines are skipped."""
+    triplets = []
+    for line in output.splitlines():
+        match = TRIPLET_LINE.match(line)
+        if match:
+            subject, relation, obj = (part.strip().strip("'\"`") for part in match.groups())
+            if subject and relation and obj:
+                triplets.append((subject, relation, obj))
+    return triplets
+
+
+def entity_key(name: str) -> str:
+    """Gensol_promoters, "Gensol promoters" and gensol  promoters are the same node."""
+    return " ".join(re.sub(r"[_\s]+", " ", name).strip().strip("'\"`.").lower().split())
+
+
+class KnowledgeGraph:
+    """Entity/relation graph over extracted triplets, persisted in SQLite and resident in memory.
+
+    Every edge keeps the document it came from so lookups can be limited to
+    documents that are still indexed. Entities are matched exactly on their
+    normalized name first and fuzzily (rapidfuzz WRatio) otherwise, and both
+    endpoints of an edge hold it in their adjacency list, so 1-2 hop lookups
+    never touch the database.
+
+    `refresh` pulls in triplets written since the last call: JSONL sources
+    are read from the byte offset recorded in the database, the legacy JSON
+    array only when its size changes.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # one reader per source at a time, or offsets would race
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS edges (
+                subject INTEGER NOT NULL,
+                relation TEXT NOT NULL,
+                object INTEGER NOT NULL,
+                doc TEXT NOT NULL,
+                PRIMARY KEY (subject, relation, object, doc)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, offset INTEGER NOT NULL);
+            """
+        )
+        self._conn.commit()
+        self.names: dict[int, str] = {}
+        self._ids: dict[str, int] = {}          # normalized name -> entity id
+        self._keys: list[str] = []               # fuzzy match choices
+        self._key_ids: list[int] = []
+        self.edges: list[Edge] = []
+        self._adjacency: dict[int, list[int]] = defaultdict(list)  # entity id -> indexes into self.edges
+        for entity_id, key, name in self._conn.execute("SELECT id, key, name FROM entities"):
+            self._add_entity(entity_id, key, name)
+        for edge in self._conn.execute("SELECT subject, relation, object, doc FROM edges"):
+            self._add_edge(Edge(*edge))
+
+    # ── in-memory index ──────────────────────────────────────────
+
+    def _add_entity(self, entity_id: int, key: str, name: str):
+        self.names[entity_id] = name
+        self._ids[key] = entity_id
+        self._keys.append(key)
+        self._key_ids.append(entity_id)
+
+    def _add_edge(self, edge: Edge):
+        self.edges.append(edge)
+        self._adjacency[edge.subject].append(len(self.edges) - 1)
+        if edge.object != edge.subject:
+            self._adjacency[edge.object].append(len(self.edges) - 1)
+
+    def _entity(self, name: str) -> Optional[int]:
+        key = entity_key(name)
+        if not key:
+            return None
+        if key not in self._ids:
+            entity_id = self._conn.execute(
+                "INSERT INTO entities(key, name) VALUES (?, ?)", (key, name.replace("_", " ").strip())
+            ).lastrowid
+            self._add_entity(entity_id, key, name.replace("_", " ").strip())
+        return self._ids[key]
+
+    # ── updates ──────────────────────────────────────────────────
+
+    def add(self, doc: str, triplets: Iterable[tuple[str, str, str]]) -> int:
+        """Add triplets found in `doc`; returns how many edges were new."""
+        added = 0
+        with self._lock:
+            for subject, relation, obj in triplets:
+                s, o = self._entity(subject), self._entity(obj)
+                if s is None or o is None:
+                    continue
+                edge = Edge(s, relation.strip().lower(), o, doc)
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO edges(subject, relation, object, doc) VALUES (?, ?, ?, ?)", edge
+                ).rowcount
+                if inserted:
+                    self._add_edge(edge)
+                    added += 1
+            self._conn.commit()
+        return added
+
+    def _offset(self, path: Path) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT offset FROM sources WHERE path = ?", (str(path),)).fetchone()
+        return row[0] if row else 0
+
+    def _set_offset(self, path: Path, offset: int):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sources(path, offset) VALUES (?, ?)", (str(path), offset))
+            self._conn.commit()
+
+    def refresh_jsonl(self, path: Path) -> int:
+        """Ingest records appended to the TripletExtractor output since the last refresh."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        offset = self._offset(path)
+        size = path.stat().st_size
+        if size < offset:
+            offset = 0  # file was replaced; INSERT OR IGNORE makes re-reading harmless
+        if size == offset:
+            return 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # leave a torn last line for the next refresh
+        added = 0
+        for line in data[:complete].decode("utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            added += self.add(record.get("doc") or "", parse_triplets(record.get("triplets", "")))
+        self._set_offset(path, offset + complete)
+        return added
+
+    def refresh_json(self, path: Path) -> int:
+        """Ingest the legacy triplet_output.json array (no document names) whenever it changes size."""
+        path = Path(path)
+        if not path.exists() or path.stat().st_size == self._offset(path):
+            return 0
+        size = path.stat().st_size
+        records = json.loads(path.read_text(encoding="utf-8"))
+        added = sum(self.add(record.get("doc") or "", parse_triplets(record.get("triplets", ""))) for record in records)
+        self._set_offset(path, size)
+        return added
+
+    def refresh(self, sources: Iterable[Path]) -> int:
+        added = 0
+        with self._refresh_lock:
+            for path in sources:
+                path = Path(path)
+                added += self.refresh_json(path) if path.suffix == ".json" else self.refresh_jsonl(path)
+        if added:
+            mcp_log("GRAPH", f"Added {added} edges; {len(self.names)} entities, {len(self.edges)} edges")
+        return added
+
+    # ── lookups ──────────────────────────────────────────────────
+
+    def match(self, name: str, limit: int = 3, cutoff: float = 85.0) -> list[tuple[int, float]]:
+        """(entity id, score) for `name`: the exact normalized match alone, else the best fuzzy matches."""
+        key = entity_key(name)
+        if key in self._ids:
+            return [(self._ids[key], 100.0)]
+        hits = process.extract(key, self._keys, scorer=fuzz.WRatio, limit=limit, score_cutoff=cutoff)
+        return [(self._key_ids[i], score) for _, score, i in hits]
+
+    def _neighbours(self, entity: int, docs: Optional[set[str]]) -> list[tuple[int, Edge]]:
+        out = []
+        for i in self._adjacency.get(entity, ()):
+            edge = self.edges[i]
+            if docs is None or not edge.doc or edge.doc in docs:
+                out.append((edge.object if edge.subject == entity else edge.subject, edge))
+        return out
+
+    def paths(
+        self,
+        source: str,
+        target: Optional[str] = None,
+        hops: int = 2,
+        limit: int = 20,
+        docs: Optional[set[str]] = None,
+    ) -> list[tuple[int, list[Edge]]]:
+        """Paths of at most `hops` (1 or 2) edges from `source`, ending at `target` if given.
+
+        Returns (start entity, edges) pairs, shortest paths first. Edges are
+        followed in either direction; `docs` limits them to those documents
+        (legacy edges without a document always qualify).
+        """
+        hops = max(1, min(hops, 2))
+        with self._lock:
+            starts = [entity for entity, _ in self.match(source)]
+            ends = {entity for entity, _ in self.match(target)} if target else None
+            results: list[tuple[int, list[Edge]]] = []
+            second: list[tuple[int, list[Edge]]] = []
+            for start in starts:
+                for mid, edge in self._neighbours(start, docs):
+                    if ends is None or mid in ends:
+                        results.append((start, [edge]))
+                    if hops < 2 or mid == start:
+                        continue
+                    for end, next_edge in self._neighbours(mid, docs):
+                        if end != start and next_edge is not edge and (ends is None or end in ends):
+                            second.append((start, [edge, next_edge]))
+                    if ends is None and len(results) + len(second) >= limit:
+                        break
+            return (results + second)[:limit]
+
+    def describe(self, start: int, path: list[Edge]) -> str:
+        """Render a path walking from `start`, e.g. Gensol --sources_funds--> Go-Auto [Source: sebi.pdf]."""
+        text, current, docs = self.names[start], start, []
+        for edge in path:
+            if edge.subject == current:
+                current = edge.object
+                text += f" --{edge.relation}--> {self.names[current]}"
+            else:
+                current = edge.subject
+                text += f" <--{edge.relation}-- {self.names[current]}"
+            if edge.doc and edge.doc not in docs:
+                docs.append(edge.doc)
+        return text + (f" [Source: {', '.join(docs)}]" if docs else "")
+
+    def stats(self) -> dict:
+        return {"entities": len(self.names), "edges": len(self.edges)}
@@ -0,0 +1,92 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.knowledge_graph import KnowledgeGraph, entity_key, parse_triplets
+
+TRIPLETS = """1. (Gensol_Engineering, sources_funds, Go-Auto)
+2. (Go-Auto, supplies, BluSmart)
+- (Anmol Singh Jaggi, promoter_of, Gensol Engineering)
+Note: the filing does not name the auditor.
+(broken, line"""
+
+
+def write_jsonl(path: Path, records: list[dict]):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_parse_triplets_skips_notes_and_malformed_lines():
+    assert parse_triplets(TRIPLETS) == [
+        ("Gensol_Engineering", "sources_funds", "Go-Auto"),
+        ("Go-Auto", "supplies", "BluSmart"),
+        ("Anmol Singh Jaggi", "promoter_of", "Gensol Engineering"),
+    ]
+    assert entity_key("Gensol_Engineering") == entity_key('"gensol  engineering"') == "gensol engineering"
+
+
+def test_build_graph_and_adjacency():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "triplets.jsonl"
+        write_jsonl(source, [{"doc": "sebi.pdf", "triplets": TRIPLETS}])
+        graph = KnowledgeGraph(Path(tmp) / "graph.db")
+        assert graph.refresh([source]) == 3
+        assert graph.stats() == {"entities": 4, "edges": 3}
+
+        gensol = graph.match("Gensol Engineering")[0][0]
+        go_auto = graph.match("Go-Auto")[0][0]
+        assert len(graph._adjacency[gensol]) == 2  # subject of one edge, object of another
+        assert len(graph._adjacency[go_auto]) == 2
+        assert {edge.doc for edge in graph.edges} == {"sebi.pdf"}
+
+        assert graph.refresh([source]) == 0  # nothing appended since the recorded offset
+        write_jsonl(source, [{"doc": "news.md", "triplets": "(BluSmart, operates_in, Delhi)"}])
+        assert graph.refresh([source]) == 1
+
+        reopened = KnowledgeGraph(Path(tmp) / "graph.db")
+        assert reopened.stats() == {"entities": 5, "edges": 4}
+        assert reopened.refresh([source]) == 0
+
+
+def test_exact_fuzzy_and_missing_lookups():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(Path(tmp) / "graph.db")
+        graph.add("sebi.pdf", parse_triplets(TRIPLETS))
+
+        exact = graph.match("gensol_engineering")
+        assert exact == [(graph._ids["gensol engineering"], 100.0)]
+
+        fuzzy = graph.match("Gensol Enginering")
+        assert fuzzy and fuzzy[0][0] == graph._ids["gensol engineering"] and fuzzy[0][1] < 100.0
+
+        assert graph.match("Reliance Industries") == []
+        assert graph.paths("Reliance Industries") == []
+
+
+def test_paths_follow_two_hops_and_respect_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(Path(tmp) / "graph.db")
+        graph.add("sebi.pdf", parse_triplets(TRIPLETS))
+
+        one_hop = graph.paths("Gensol Engineering", "Go-Auto", hops=1)
+        assert [graph.describe(start, path) for start, path in one_hop] == [
+            "Gensol Engineering --sources_funds--> Go-Auto [Source: sebi.pdf]"
+        ]
+
+        two_hop = graph.paths("Gensol Engineering", "BluSmart", hops=2)
+        assert [graph.describe(start, path) for start, path in two_hop] == [
+            "Gensol Engineering --sources_funds--> Go-Auto --supplies--> BluSmart [Source: sebi.pdf]"
+        ]
+        assert graph.paths("Gensol Engineering", "BluSmart", hops=1) == []
+        assert graph.paths("Gensol Engineering", docs={"other.pdf"}) == []
+
+
+if __name__ == "__main__":
+    test_parse_triplets_skips_notes_and_malformed_lines()
+    test_build_graph_and_adjacency()
+    test_exact_fuzzy_and_missing_lookups()
+    test_paths_follow_two_hops_and_respect_documents()
@@ -0,0 +1,119 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def _numbers(query: str) -> frozenset[str]:
+    return frozenset(re.findall(r"\d+", query))
+
+
+class QueryCache:
+    """Search results keyed by query, valid for one index generation.
+
+    Tier 1 matches the normalized query text exactly and is checked before
+    the query is embedded. Tier 2 compares the query embedding against every
+    cached one and reuses the results of the closest if its cosine
+    similarity is at least `threshold`; queries whose numbers differ
+    (invoice 123 vs invoice 124) never match this way. Entries are evicted
+    LRU beyond `max_entries`, and all of them are dropped as soon as a
+    lookup arrives for a different index generation.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries: OrderedDict[str, tuple[int, Any]] = OrderedDict()  # key -> (slot, results)
+        self._vectors: Optional[np.ndarray] = None                        # slot -> unit query vector
+        self._slot_keys: list[Optional[str]] = [None] * max_entries
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_generation(self, generation: int):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._slot_keys = [None] * self.max_entries
+            self._occupied[:] = False
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self._generation = generation
+
+    def get_exact(self, query: str, generation: int) -> Optional[Any]:
+        key = normalize_query(query)
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[1]
+
+    def get_similar(self, query: str, vector: np.ndarray, generation: int) -> Optional[Any]:
+        """Call after get_exact missed; counts a miss if nothing is close enough."""
+        with self._lock:
+            self._sync_generation(generation)
+            if self._entries and self._vectors is not None:
+                v = self._unit(vector)
+                scores = np.where(self._occupied, self._vectors @ v, -np.inf)
+                numbers = _numbers(query)
+                for slot in np.argsort(-scores):
+                    if scores[slot] < self.threshold:
+                        break
+                    key = self._slot_keys[slot]
+                    if _numbers(key) == numbers:
+                        self._entries.move_to_end(key)
+                        self.semantic_hits += 1
+                        return self._entries[key][1]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, vector: np.ndarray, generation: int, results: Any):
+        key = normalize_query(query)
+        v = self._unit(vector)
+        with self._lock:
+            self._sync_generation(generation)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+            if key in self._entries:
+                slot = self._entries.pop(key)[0]
+            else:
+                if not self._free:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self._slot_keys[evicted] = None
+                    self._occupied[evicted] = False
+                    self._free.append(evicted)
+                slot = self._free.pop()
+            self._vectors[slot] = v
+            self._slot_keys[slot] = key
+            self._occupied[slot] = True
+            self._entries[key] = (slot, results)
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return v / (np.linalg.norm(v) + 1e-12)
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,79 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag.index_factory import IndexConfig, build_index
+from rag.index_manager import IndexManager
+from rag.query_cache import QueryCache
+
+DIM = 16
+
+
+def vec(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def near(v: np.ndarray, seed: int, noise: float) -> np.ndarray:
+    return v + noise * vec(seed)
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = QueryCache(threshold=0.95)
+    cache.put("F22 Raptor engine?", vec(1), 1, ["thrust"])
+    assert cache.get_exact("f22 raptor ENGINE", 1) == ["thrust"]
+    assert cache.get_exact("F22 Raptor wing", 1) is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_near_duplicate_hit_above_threshold():
+    cache = QueryCache(threshold=0.95)
+    cache.put("F22 Raptor engine thrust", vec(7), 1, ["thrust"])
+    assert cache.get_similar("thrust of the F22 Raptor engine", near(vec(7), 2, 0.05), 1) == ["thrust"]
+    assert cache.get_similar("unrelated question", vec(3), 1) is None
+    assert cache.stats()["semantic_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_different_numbers_never_match():
+    cache = QueryCache(threshold=0.95)
+    cache.put("F22 in 2021", vec(7), 1, ["2021 results"])
+    assert cache.get_similar("F22 in 2022", vec(7), 1) is None  # identical vector, different year
+    assert cache.get_similar("the F22 in 2021", near(vec(7), 2, 0.01), 1) == ["2021 results"]
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    for i, query in enumerate(["a", "b"]):
+        cache.put(query, vec(i), 1, [query])
+    cache.get_exact("a", 1)  # "b" is now least recently used
+    cache.put("c", vec(3), 1, ["c"])
+    assert cache.get_exact("b", 1) is None
+    assert cache.get_exact("a", 1) == ["a"] and cache.get_exact("c", 1) == ["c"]
+
+
+def test_publish_invalidates_cached_results():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = IndexManager(Path(tmp))
+        vectors = np.stack([vec(i) for i in range(4)])
+        manager.publish(build_index(IndexConfig(), vectors, np.arange(4, dtype=np.int64)))
+        cache = QueryCache()
+        generation = manager.current().generation
+        cache.put("F22 engine", vec(9), generation, ["old"])
+        assert cache.get_exact("F22 engine", manager.current().generation) == ["old"]
+
+        manager.publish(build_index(IndexConfig(), vectors[:2], np.arange(2, dtype=np.int64)))
+        assert manager.current().generation == generation + 1
+        assert cache.get_exact("F22 engine", manager.current().generation) is None
+        assert cache.get_similar("F22 engine", vec(9), manager.current().generation) is None
+        assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    test_exact_hit_ignores_case_and_punctuation()
+    test_near_duplicate_hit_above_threshold()
+    test_different_numbers_never_match()
+    test_lru_eviction()
+    test_publish_invalidates_cached_results()
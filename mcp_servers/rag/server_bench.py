@@ -0,0 +1,88 @@
+"""Search latency of the RAG MCP server under parallel clients.
+
+Starts mcp_server_2.py over stdio (so ingestion runs alongside, as in
+production), then fires `--requests` searches from `--clients` concurrent
+callers and reports p50/p99. With `--pdf`, a convert_pdf_to_markdown call
+is kept in flight the whole time to show searches aren't stalled behind it.
+
+    python rag/server_bench.py --clients 16 --requests 200 --pdf documents/INVG67564.pdf
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+QUERIES = [
+    "invoice number and total amount",
+    "who won the cricket world cup",
+    "DLF sustainability report energy consumption",
+    "Canvas LMS assignment submission",
+    "leave policy notice period",
+    "Capbridge",
+]
+
+
+async def pdf_load(session: ClientSession, path: str, stop: asyncio.Event) -> list[float]:
+    durations = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await session.call_tool("convert_pdf_to_markdown", {"input": {"file_path": path}})
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def run(args):
+    params = StdioServerParameters(command=sys.executable, args=["mcp_server_2.py"], cwd=str(SERVER_DIR))
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            # Warm up: waits for the first published index and primes the embedding cache
+            for query in QUERIES:
+                await session.call_tool("search_stored_documents_rag", {"input": {"query": query}})
+
+            stop = asyncio.Event()
+            background = asyncio.create_task(pdf_load(session, args.pdf, stop)) if args.pdf else None
+
+            latencies: list[float] = []
+            errors = 0
+            remaining = iter(range(args.requests))
+
+            async def client():
+                nonlocal errors
+                for i in remaining:
+                    start = time.perf_counter()
+                    result = await session.call_tool(
+                        "search_stored_documents_rag", {"input": {"query": QUERIES[i % len(QUERIES)]}}
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    errors += bool(result.isError)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            pdf_durations = await background if background else []
+
+    print(f"{args.requests} searches from {args.clients} clients in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.1f} req/s), {errors} errors")
+    print(f"search p50 {np.percentile(latencies, 50):.1f} ms, p99 {np.percentile(latencies, 99):.1f} ms")
+    if pdf_durations:
+        print(f"{len(pdf_durations)} PDF conversions in flight meanwhile, mean {np.mean(pdf_durations):.2f}s each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pdf", help="PDF to keep converting in the background (path as the server sees it)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from rag.common import mcp_log
+
+PROMPT_HEADER = """Extract all factual triplets from the following text in the format: (subject, relation, object).
+
+Each triplet must represent a factual relationship between two entities or concepts, clearly grounded in the text. Use the format:
+
+(subject, relation_subtype, object)
+
+✅ RULES FOR RELATION FORMAT:
+- The relation MUST be a two-word phrase using the format: relation_subtype (e.g., 'scores_run', 'represents_symbol', 'uses_technology')
+- Do NOT use generic or vague verbs like 'is', 'has', 'does', 'are', etc.
+- Do NOT use long phrases or full clauses as relation names.
+- The two words must meaningfully describe the action or relationship — avoid filler verbs.
+- Example good relations: 'represents_symbol', 'scores_run', 'uses_tool', 'develops_product'
+- Example bad relations: 'is_a', 'does_work', 'has_property', 'is_part_of'
+
+✅ RULES FOR TRIPLET COMPLETENESS:
+- Do NOT return incomplete triplets.
+- No field in the triplet (subject, relation, or object) can be empty or vague.
+- You MUST infer missing elements using context from nearby sentences. Look both forward and backward in the text to resolve ambiguities or implied references.
+- If necessary, rephrase or complete implied relations using concrete nouns or phrases available in the context.
+
+✅ OTHER GUIDELINES:
+- Focus only on factual or narrative text. Ignore metadata, code, log statements, or markup.
+- Avoid repeating the same triplet unless clearly stated multiple times with new context.
+- Do not add explanations or notes — just return the raw triplet list, one per line.
+
+Your output should be a clean list of factual triplets, one per line, formatted exactly as:
+(subject, relation_subtype, object)
+"""
+
+
+def segment_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TripletExtractor:
+    """Incremental (subject, relation, object) extraction over text segments.
+
+    Each segment is sent to Ollama's /api/generate once: results are
+    appended to a JSONL file, one record per segment keyed by
+    sha256(model, text), and segments whose hash is already in the file are
+    skipped. Requests run concurrently, bounded by `concurrency`.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        model: str,
+        base_url: str = "http://localhost:11434",
+        concurrency: int = 2,
+        timeout: float = 600.0,
+    ):
+        self.output_path = Path(output_path)
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.done: set[str] = set()
+        self._write_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(concurrency)  # shared by every document being extracted
+        if self.output_path.exists():
+            for line in self.output_path.read_text(encoding="utf-8").splitlines():
+                try:
+                    self.done.add(json.loads(line)["hash"])
+                except (json.JSONDecodeError, KeyError):
+                    continue  # torn final line from a crash
+
+    def pending(self, segments: list[str]) -> list[tuple[int, str]]:
+        """(index, segment) for every distinct, non-empty segment not extracted yet."""
+        seen, todo = set(), []
+        for i, segment in enumerate(segments):
+            h = segment_hash(self.model, segment)
+            if segment.strip() and h not in self.done and h not in seen:
+                seen.add(h)
+                todo.append((i, segment))
+        return todo
+
+    async def _append(self, record: dict):
+        async with self._write_lock:
+            line = json.dumps(record) + "\n"
+            await asyncio.to_thread(self._write_line, line)
+            self.done.add(record["hash"])
+
+    def _write_line(self, line: str):
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _extract_one(self, client: httpx.AsyncClient, doc: str, index: int, segment: str) -> bool:
+        async with self._slots:
+            try:
+                response = await client.post("/api/generate", json={
+                    "model": self.model,
+                    "prompt": f"{PROMPT_HEADER}\n\n{segment}",
+                    "stream": False,
+                })
+                response.raise_for_status()
+                output = response.json().get("response", "").strip()
+            except Exception as e:
+                mcp_log("ERROR", f"Triplet extraction failed for {doc} segment {index}: {e}")
+                return False
+        await self._append({
+            "hash": segment_hash(self.model, segment),
+            "doc": doc,
+            "segment_index": index,
+            "text": segment,
+            "triplets": output,
+        })
+        return True
+
+    async def extract(self, doc: str, segments: list[str]) -> int:
+        """Extract triplets for the segments of `doc` not seen before; returns how many were added."""
+        todo = self.pending(segments)
+        if not todo:
+            return 0
+        mcp_log("TRIPLETS", f"{doc}: extracting {len(todo)} of {len(segments)} segments")
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            results = await asyncio.gather(*(
+                self._extract_one(client, doc, i, segment) for i, segment in todo
+            ))
+        return sum(results)
+
+
+def read_records(output_path: Path, docs: Optional[set[str]] = None) -> list[dict]:
+    """All records in the JSONL output, optionally only those for `docs`."""
+    records = []
+    path = Path(output_path)
+    if not path.exists():
+        return records
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if docs is None or record.get("doc") in docs:
+            records.append(record)
+    return records
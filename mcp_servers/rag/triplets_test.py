@@ -0,0 +1,123 @@
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from rag import triplets
+from rag.knowledge_graph import KnowledgeGraph
+from rag.triplets import PROMPT_HEADER, TripletExtractor, read_records, segment_hash
+
+MODEL = "phi4:latest"
+
+
+class StubOllama:
+    """Answers /api/generate through httpx.MockTransport; segments containing FAIL get a 500."""
+
+    def __init__(self):
+        self.prompts: list[str] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        assert request.url.path == "/api/generate" and body["model"] == MODEL and body["stream"] is False
+        segment = body["prompt"][len(PROMPT_HEADER):].strip()
+        self.prompts.append(segment)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if "FAIL" in segment:
+            return httpx.Response(500, json={"error": "model crashed"})
+        subject = segment.split()[0]
+        return httpx.Response(200, json={"response": f"({subject}, mentions_topic, {segment.split()[-1]})\n"})
+
+    def __enter__(self):
+        self.saved = triplets.httpx.AsyncClient
+        transport = httpx.MockTransport(self.handler)
+        triplets.httpx.AsyncClient = lambda **kwargs: self.saved(transport=transport, **kwargs)
+        return self
+
+    def __exit__(self, *exc):
+        triplets.httpx.AsyncClient = self.saved
+
+
+def test_extract_appends_one_record_per_new_segment():
+    with tempfile.TemporaryDirectory() as tmp, StubOllama() as ollama:
+        output = Path(tmp) / "triplets.jsonl"
+        extractor = TripletExtractor(output, MODEL)
+        segments = ["Gensol funds GoAuto", "  ", "BluSmart leases EVs", "Gensol funds GoAuto"]
+        assert asyncio.run(extractor.extract("sebi.pdf", segments)) == 2
+        assert sorted(ollama.prompts) == ["BluSmart leases EVs", "Gensol funds GoAuto"]
+
+        records = sorted(read_records(output), key=lambda r: r["segment_index"])
+        assert [(r["doc"], r["segment_index"], r["text"]) for r in records] == [
+            ("sebi.pdf", 0, "Gensol funds GoAuto"), ("sebi.pdf", 2, "BluSmart leases EVs")]
+        assert records[0]["hash"] == segment_hash(MODEL, "Gensol funds GoAuto")
+        assert records[0]["triplets"] == "(Gensol, mentions_topic, GoAuto)"
+
+
+def test_restart_skips_extracted_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "triplets.jsonl"
+        with StubOllama():
+            asyncio.run(TripletExtractor(output, MODEL).extract("a.md", ["Alpha one", "Alpha two"]))
+        with open(output, "a", encoding="utf-8") as f:
+            f.write('{"hash": "torn')  # crash mid-append
+
+        with StubOllama() as ollama:
+            extractor = TripletExtractor(output, MODEL)
+            assert extractor.pending(["Alpha one", "Alpha three"]) == [(1, "Alpha three")]
+            assert asyncio.run(extractor.extract("a.md", ["Alpha one", "Alpha two", "Alpha three"])) == 1
+            assert ollama.prompts == ["Alpha three"]
+            assert asyncio.run(extractor.extract("b.md", ["Alpha one"])) == 0  # same text, any document
+
+        # another model re-extracts everything
+        assert TripletExtractor(output, "qwen2.5").pending(["Alpha one"]) == [(0, "Alpha one")]
+
+
+def test_failed_segments_are_retried_later():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "triplets.jsonl"
+        with StubOllama():
+            extractor = TripletExtractor(output, MODEL)
+            assert asyncio.run(extractor.extract("a.md", ["Alpha FAIL", "Alpha ok"])) == 1
+        assert [r["text"] for r in read_records(output)] == ["Alpha ok"]
+        assert extractor.pending(["Alpha FAIL", "Alpha ok"]) == [(0, "Alpha FAIL")]
+
+
+def test_requests_are_bounded_by_concurrency():
+    with tempfile.TemporaryDirectory() as tmp, StubOllama() as ollama:
+        extractor = TripletExtractor(Path(tmp) / "triplets.jsonl", MODEL, concurrency=2)
+        assert asyncio.run(extractor.extract("a.md", [f"Segment {i}" for i in range(7)])) == 7
+        assert ollama.peak == 2
+
+
+def test_output_feeds_the_knowledge_graph():
+    with tempfile.TemporaryDirectory() as tmp, StubOllama():
+        output = Path(tmp) / "triplets.jsonl"
+        extractor = TripletExtractor(output, MODEL)
+        asyncio.run(extractor.extract("a.md", ["Gensol funds GoAuto"]))
+        asyncio.run(extractor.extract("b.md", ["BluSmart leases EVs"]))
+        assert [r["doc"] for r in read_records(output, docs={"b.md"})] == ["b.md"]
+
+        graph = KnowledgeGraph(Path(tmp) / "graph.sqlite")
+        assert graph.refresh([output]) == 2
+        assert [graph.describe(start, path) for start, path in graph.paths("Gensol", hops=1)] == [
+            "Gensol --mentions_topic--> GoAuto [Source: a.md]"
+        ]
+
+
+if __name__ == "__main__":
+    test_extract_appends_one_record_per_new_segment()
+    test_restart_skips_extracted_segments()
+    test_failed_segments_are_retried_later()
+    test_requests_are_bounded_by_concurrency()
+    test_output_feeds_the_knowledge_graph()
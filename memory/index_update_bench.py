@@ -0,0 +1,96 @@
+"""Index-update latency as session history grows.
+
+Fills a scratch session store with synthetic sessions and, each time the
+history reaches a checkpoint, appends --batch more and times the
+build_or_update_index() call that picks them up. With the record-id
+journal and append-only month shards that time should stay flat from 1k
+to 100k sessions. NER and embeddings are skipped (they cost the same per
+new session whatever the history size).
+
+    python memory/index_update_bench.py --sessions 100000 --batch 10
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory.memory_indexer import build_or_update_index
+from memory.session_store import SessionStore
+
+TOPICS = ["F22 Raptor", "Gensol", "DLF", "cricket", "India GDP", "Tesla", "log10 and cos", "Virat Kohli"]
+
+
+def synthetic_session(i: int, rng: np.random.Generator, day: str) -> dict:
+    topic = TOPICS[int(rng.integers(len(TOPICS)))]
+    session_id = f"synthetic-{i:08d}"
+    return {
+        "context": {"graph": {"nodes": [{"id": str(n), "description": f"step {n} about {topic}"} for n in range(6)]}},
+        "session": {
+            "session_id": session_id,
+            "original_query": f"Query {i}: what is new about {topic}?",
+            "summarizer_snapshots": [{
+                "summary_output": f"Session {i} found several facts about {topic}. " * 8,
+                "timestamp": f"{day}T12:00:00Z",
+            }],
+        },
+        "status": "success",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10, help="new sessions per timed update")
+    parser.add_argument("--per-day", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5, help="timed updates per checkpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    checkpoints = [c for c in (1_000, 10_000, 25_000, 50_000, 100_000, 250_000, 1_000_000) if c <= args.sessions]
+    rng = np.random.default_rng(args.seed)
+    scratch = Path(tempfile.mkdtemp(prefix="session_bench_"))
+    store = SessionStore(scratch / "store")
+    index_base = scratch / "index"
+    index_base.mkdir()
+    no_legacy = scratch / "session_logs"  # keep the one-time legacy migration away from the real logs
+
+    def append(i: int):
+        day_number = i // args.per_day
+        day = f"{2025 + day_number // 336}-{day_number // 28 % 12 + 1:02d}-{day_number % 28 + 1:02d}"
+        store.append(f"synthetic-{i:08d}", "final", synthetic_session(i, rng, day), day=day)
+
+    print(f"{'history':>9} {'fill s':>7} {f'update ms (+{args.batch})':>18} {'p50':>7} {'max':>7} {'shard MB':>9}")
+    try:
+        written = 0
+        for checkpoint in checkpoints:
+            start = time.perf_counter()
+            while written < checkpoint:
+                append(written)
+                written += 1
+            build_or_update_index(store, index_base, enrich=False, logs_base=no_legacy)  # catch up on the fill, untimed
+            fill = time.perf_counter() - start
+
+            timings = []
+            for _ in range(args.repeats):
+                for _ in range(args.batch):
+                    append(written)
+                    written += 1
+                start = time.perf_counter()
+                new = build_or_update_index(store, index_base, enrich=False, logs_base=no_legacy)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert sum(len(v) for v in new.values()) == args.batch
+            shard_mb = sum(p.stat().st_size for p in index_base.glob("*.jsonl")) / 1e6
+            print(f"{checkpoint:9d} {fill:7.1f} {np.mean(timings):18.2f} {np.median(timings):7.2f} "
+                  f"{max(timings):7.2f} {shard_mb:9.1f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Recall and latency of fuzzy-only vs hybrid (fuzzy + vector) memory search.
+
+Builds both scorers over the stored session summaries and asks, for every
+distinct past question, three kinds of query:
+
+  exact      the original question
+  summary    a sentence from the session's summary (same topic, other words)
+  paraphrase the question reworded by an Ollama model (--paraphrase-model)
+
+A hit means a top-k result is a session that asked the same normalized
+question. Run from the repository root:
+
+    python memory/memory_bench.py --k 3 --paraphrase-model phi4
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory.memory_search import MemoryIndex, normalize_query
+from memory.memory_vectors import OLLAMA_BASE_URL, SessionVectorIndex, VECTOR_DIR
+
+PARAPHRASE_PROMPT = "Rewrite this question using different words but the same meaning. Reply with the question only.\n\n{query}"
+
+
+def summary_sentence(summary: str, rng: np.random.Generator) -> str:
+    sentences = [s.strip(" *-") for s in re.split(r"(?<=[.!?])\s+|\n+", summary) if 6 <= len(s.split()) <= 40]
+    return sentences[int(rng.integers(len(sentences)))] if sentences else ""
+
+
+def paraphrases(queries: list[str], model: str, cache_file: Path) -> dict[str, str]:
+    cached = json.loads(cache_file.read_text(encoding="utf-8")) if cache_file.exists() else {}
+    for query in queries:
+        if query not in cached:
+            response = requests.post(f"{OLLAMA_BASE_URL}/api/generate", json={
+                "model": model, "prompt": PARAPHRASE_PROMPT.format(query=query), "stream": False
+            }, timeout=300)
+            response.raise_for_status()
+            cached[query] = response.json()["response"].strip()
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps(cached, indent=2), encoding="utf-8")
+    return cached
+
+
+def evaluate(index: MemoryIndex, queries: list[tuple[str, str]], k: int) -> tuple[float, float, float]:
+    hits, latencies = 0, []
+    for query, target in queries:
+        start = time.perf_counter()
+        results = index.search(query, top_k=k)
+        latencies.append(time.perf_counter() - start)
+        hits += any(normalize_query(r["original_query"] or "") == target for r in results)
+    ms = np.array(latencies) * 1000
+    return hits / len(queries), float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--vector-weight", type=float, default=0.5)
+    parser.add_argument("--vector-dir", type=Path, default=VECTOR_DIR)
+    parser.add_argument("--paraphrase-model", help="Ollama model used to reword questions; skipped if unset")
+    parser.add_argument("--paraphrase-cache", type=Path, default=VECTOR_DIR / "bench_paraphrases.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fuzzy = MemoryIndex(refresh_interval=0)
+    fuzzy.refresh(force=True)
+    vectors = SessionVectorIndex(args.vector_dir)
+    start = time.perf_counter()
+    added = vectors.add(fuzzy.entries)
+    print(f"{len(fuzzy.entries)} sessions; embedded {added} new in {time.perf_counter() - start:.1f}s")
+    hybrid = MemoryIndex(refresh_interval=0, vector_index=vectors, vector_weight=args.vector_weight)
+    hybrid.refresh(force=True)
+
+    rng = np.random.default_rng(args.seed)
+    targets: dict[str, dict] = {}
+    for entry in fuzzy.entries:
+        targets.setdefault(normalize_query(entry.get("original_query") or ""), entry)
+    targets.pop("", None)
+
+    query_sets = {
+        "exact": [(e["original_query"], t) for t, e in targets.items()],
+        "summary": [(s, t) for t, e in targets.items() if (s := summary_sentence(e.get("summary_output") or "", rng))],
+    }
+    if args.paraphrase_model:
+        reworded = paraphrases([e["original_query"] for e in targets.values()], args.paraphrase_model, args.paraphrase_cache)
+        query_sets["paraphrase"] = [(reworded[e["original_query"]], t) for t, e in targets.items()]
+
+    print(f"\n{'queries':<11} {'n':>4} {'scorer':<7} {f'recall@{args.k}':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, queries in query_sets.items():
+        for label, index in (("fuzzy", fuzzy), ("hybrid", hybrid)):
+            recall, p50, p99 = evaluate(index, queries, args.k)
+            print(f"{name:<11} {len(queries):4d} {label:<7} {recall:9.3f} {p50:8.2f} {p99:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,34 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 from rapidfuzz.utils import default_process  # Add this at the top if needed
 import re
-import spacy
-nlp = spacy.load("en_core_web_sm")
+from memory.ner import get_ner
+from memory.memory_vectors import SessionVectorIndex, get_vector_index
+from memory.session_store import SessionStore, get_session_store
 
 def extract_named_entities(text: str) -> List[str]:
-    doc = nlp(text)
-    return [ent.text.lower() for ent in doc.ents if ent.label_ in {"GPE", "ORG", "PERSON"}]
+    return get_ner().entities(text)
 
 
 # Constants
-LOGS_BASE = Path("memory/session_logs")
-INDEX_BASE = Path("memory/session_summaries_index")
-META_FILE = INDEX_BASE / ".index_meta.json"
+LOGS_BASE = Path("memory/session_logs")  # legacy per-session JSON logs; new sessions go to the session store
+INDEX_BASE = Path("memory/session_summaries_index")  # legacy <month>.json files plus append-only <month>.jsonl shards
 INDEX_BASE.mkdir(parents=True, exist_ok=True)
 
-# Load or initialize metadata
-if META_FILE.exists():
-    with open(META_FILE, "r", encoding="utf-8") as f:
-        folder_meta = json.load(f)
-else:
-    folder_meta = {}
+def load_meta(index_base: Path = INDEX_BASE) -> Dict:
+    meta_file = index_base / ".index_meta.json"
+    if meta_file.exists():
+        with open(meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_meta(meta: Dict, index_base: Path = INDEX_BASE):
+    tmp = index_base / ".index_meta.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, index_base / ".index_meta.json")
 
 def normalize_query(text: str) -> str:
     text = re.sub(r"query\s*\d+:\s*", "", text, flags=re.IGNORECASE)
@@ -32,104 +37,161 @@ def normalize_query(text: str) -> str:
     text = re.sub(r"\s+", " ", text)
     return text.lower().strip()
 
-def is_valid_logfile(file_path: Path) -> bool:
-    return file_path.suffix == ".json" and file_path.is_file()
-
-def extract_summary_entry(file_path: Path) -> List[Dict]:
+def summary_entries(data: Dict, with_entities: bool = True) -> List[Dict]:
+    """Index entries for one session log; without entities, `named_entities` is left for the caller to fill in batch."""
+    session = data.get("session", {})
+    session_id = session.get("session_id")
+    original_query = session.get("original_query")
+    snapshots = session.get("summarizer_snapshots", [])
+
+    entities = extract_named_entities(original_query or "") if with_entities and snapshots else []
+    entries = []
+    for snap in snapshots:
+        summary = snap.get("summary_output")
+        timestamp = snap.get("timestamp", "unknown")
+        if summary:
+            entries.append({
+                "session_id": session_id,
+                "original_query": original_query,
+                "normalized_query": normalize_query(original_query or ""),
+                "named_entities": entities,
+                "summary_output": summary,
+                "timestamp": timestamp
+            })
+    return entries
+
+def extract_summary_entry(file_path: Path, with_entities: bool = True) -> List[Dict]:
+    """summary_entries() for a legacy per-session JSON log."""
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
-
-        session = data.get("session", {})
-        session_id = session.get("session_id")
-        original_query = session.get("original_query")
-        snapshots = session.get("summarizer_snapshots", [])
-
-        entries = []
-        for snap in snapshots:
-            summary = snap.get("summary_output")
-            timestamp = snap.get("timestamp", "unknown")
-            if summary:
-                entries.append({
-                    "session_id": session_id,
-                    "original_query": original_query,
-                    "normalized_query": normalize_query(original_query or ""),
-                    "named_entities": extract_named_entities(original_query or ""),
-                    "summary_output": summary,
-                    "timestamp": timestamp
-                })
-        return entries
+        return summary_entries(data, with_entities)
     except Exception as e:
         print(f"[ERROR] Failed to parse {file_path}: {e}")
         return []
 
-def get_month_key_from_path(path: Path) -> str:
+def update_session_vectors(entries: List[Dict], vector_index: Optional[SessionVectorIndex] = None) -> int:
+    """Embed sessions missing from the vector index; an unreachable embedder only delays it to the next update."""
     try:
-        parts = path.parts
-        year = parts[-4]
-        month = parts[-3]
-        return f"{year}-{month}"
-    except Exception:
-        return "unknown"
-
-def build_or_update_index():
-    indexed_files = set()
-    index_data: Dict[str, List[Dict]] = {}
-    updated_folders = {}
-
-    for root, _, files in os.walk(LOGS_BASE):
-        root_path = Path(root)
-        if len(root_path.parts) < 4:
-            continue  # Skip malformed folders
-
-        month_key = get_month_key_from_path(root_path)
-        if month_key == "unknown":
-            continue
-
-        folder_key = str(root_path.relative_to(LOGS_BASE))
-        latest_mtime = max((os.path.getmtime(root_path / f) for f in files if is_valid_logfile(root_path / f)), default=0)
-
-        if folder_key in folder_meta and latest_mtime <= folder_meta[folder_key]:
-            continue  # Skip already indexed folder
-
-        index_file = INDEX_BASE / f"{month_key}.json"
-        if index_file.exists():
+        return (vector_index if vector_index is not None else get_vector_index()).add(entries)
+    except Exception as e:
+        print(f"[WARN] Session vectors not updated: {e}")
+        return 0
+
+def append_to_shard(month_key: str, entries: List[Dict], index_base: Path = INDEX_BASE):
+    """Month shards are append-only JSONL: adding sessions never rewrites what is already indexed."""
+    with open(index_base / f"{month_key}.jsonl", "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def log_day(path: Path, logs_dir: Path) -> str:
+    """YYYY-MM-DD of a legacy log, from its YYYY/MM/DD folder (or its mtime)."""
+    parts = path.relative_to(logs_dir).parts
+    if len(parts) == 4 and all(p.isdigit() for p in parts[:3]):
+        return f"{parts[0]}-{parts[1]}-{parts[2]}"
+    return datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d")
+
+def migrate_legacy_logs(store: SessionStore, logs_dir: Path = LOGS_BASE, delete: bool = False) -> Dict[str, int]:
+    """Append legacy <session_id>.json / <session_id>_steps.json logs to the store under their day.
+
+    Sessions already in the store are skipped, so it is safe to re-run.
+    """
+    counts = {"files": 0, "migrated": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    if not logs_dir.exists():
+        return counts
+    files = sorted(logs_dir.rglob("*.json"), key=lambda p: (log_day(p, logs_dir), p.name))
+    counts["files"] = len(files)
+    for path in files:
+        is_steps = path.name.endswith("_steps.json")
+        session_id = path.name[:-len("_steps.json")] if is_steps else path.stem
+        kind = "step" if is_steps else "final"
+        size = path.stat().st_size
+        if store.has(session_id, kind):
+            counts["skipped"] += 1
+        else:
             try:
-                with open(index_file, "r", encoding="utf-8") as f:
-                    existing = json.load(f)
-                    index_data[month_key] = existing
-                    for entry in existing:
-                        indexed_files.add(entry["session_id"])
-            except Exception:
-                index_data[month_key] = []
-
-        for file in files:
-            file_path = root_path / file
-            if not is_valid_logfile(file_path):
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[ERROR] Skipping {path}: {e}")
+                counts["failed"] += 1
                 continue
-
-            entries = extract_summary_entry(file_path)
-            if not entries:
-                continue
-
-            if month_key not in index_data:
-                index_data[month_key] = []
-
-            for entry in entries:
-                if entry["session_id"] not in indexed_files:
-                    index_data[month_key].append(entry)
-                    indexed_files.add(entry["session_id"])
-
-        updated_folders[folder_key] = latest_mtime
-
-    for month_key, data in index_data.items():
-        out_path = INDEX_BASE / f"{month_key}.json"
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-
-    # Save updated metadata
-    folder_meta.update(updated_folders)
-    with open(META_FILE, "w", encoding="utf-8") as f:
-        json.dump(folder_meta, f, indent=2)
-
-    return index_data
+            day = log_day(path, logs_dir)
+            for record in (data if is_steps else [data]):
+                store.append(session_id, kind, record, day=day)
+            counts["migrated"] += 1
+            counts["bytes"] += size
+        if delete:
+            path.unlink()
+    return counts
+
+def legacy_indexed_sessions(index_base: Path = INDEX_BASE) -> set:
+    """Session ids already in the legacy <month>.json index files."""
+    indexed = set()
+    for index_file in index_base.glob("[!.]*.json"):
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                indexed.update(e.get("session_id") for e in json.load(f) if isinstance(e, dict))
+        except Exception as e:
+            print(f"[ERROR] Failed to read {index_file}: {e}")
+    return indexed
+
+def build_or_update_index(
+    store: Optional[SessionStore] = None,
+    index_base: Path = INDEX_BASE,
+    enrich: bool = True,
+    logs_base: Path = LOGS_BASE,
+) -> Dict[str, List[Dict]]:
+    """Index the final session records written since the last call; returns the new entries by month.
+
+    The session store's record ids are a journal: `store_cursor` in the
+    index metadata is the last id consumed, so an update reads only newer
+    records and never lists or stats the log directories. The first call
+    migrates legacy memory/session_logs into the store (`legacy_through`
+    marks the last record that migration could have written); migrated
+    sessions the legacy <month>.json files already index are not appended
+    to the shards again.
+    """
+    store = store or get_session_store()
+    meta = load_meta(index_base)
+    if "legacy_through" not in meta:
+        counts = migrate_legacy_logs(store, logs_base)
+        if counts["migrated"]:
+            print(f"[INFO] Moved {counts['migrated']} legacy session logs from {logs_base} into the session store")
+        meta["legacy_through"] = store.last_id()
+        index_base.mkdir(parents=True, exist_ok=True)
+        save_meta(meta, index_base)
+
+    cursor = meta.get("store_cursor", 0)
+    legacy_through = meta["legacy_through"]
+    already_indexed = legacy_indexed_sessions(index_base) if cursor < legacy_through else set()
+    new_by_month: Dict[str, List[Dict]] = {}
+    new_entries: List[Dict] = []
+
+    last = cursor
+    for record_id, record in store.records("final", after_id=cursor):
+        last = record_id
+        if record_id <= legacy_through and record["session_id"] in already_indexed:
+            continue
+        entries = summary_entries(record["data"], with_entities=False)
+        new_by_month.setdefault(record["day"][:7], []).extend(entries)
+        new_entries.extend(entries)
+    if last == cursor:
+        return {}
+
+    if enrich:
+        # One batched NER pass over the new queries; texts seen before come from the cache
+        for entry, entities in zip(new_entries, get_ner().entities_many(e["original_query"] or "" for e in new_entries)):
+            entry["named_entities"] = entities
+        update_session_vectors(new_entries)
+
+    index_base.mkdir(parents=True, exist_ok=True)
+    for month_key, entries in new_by_month.items():
+        if entries:
+            append_to_shard(month_key, entries, index_base)
+
+    # Shards are written before the cursor moves: a crash in between re-appends, and readers dedupe by session_id
+    meta["store_cursor"] = last
+    save_meta(meta, index_base)
+    return new_by_month
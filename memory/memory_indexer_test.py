@@ -0,0 +1,82 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory.memory_indexer import build_or_update_index, load_meta
+from memory.session_store import SessionStore
+
+
+def session_log(session_id: str, query: str) -> dict:
+    return {"session": {
+        "session_id": session_id,
+        "original_query": query,
+        "summarizer_snapshots": [{"summary_output": f"answer to {query}", "timestamp": "t"}],
+    }}
+
+
+def shard_ids(index_base: Path) -> list:
+    return [json.loads(line)["session_id"]
+            for shard in sorted(index_base.glob("*.jsonl"))
+            for line in shard.read_text(encoding="utf-8").splitlines()]
+
+
+def update(store, root: Path):
+    return build_or_update_index(store, root / "index", enrich=False, logs_base=root / "session_logs")
+
+
+def test_cursor_reads_only_new_final_records():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = SessionStore(root / "store")
+        store.append("a", "final", session_log("a", "F22 engine"), day="2025-01-05")
+        store.append("a", "step", {"ignored": True}, day="2025-01-05")
+        store.append("b", "final", session_log("b", "Mars rover"), day="2025-02-01")
+
+        new = update(store, root)
+        assert {month: [e["session_id"] for e in entries] for month, entries in new.items()} == {
+            "2025-01": ["a"], "2025-02": ["b"]}
+        assert shard_ids(root / "index") == ["a", "b"]
+        assert load_meta(root / "index")["store_cursor"] == 3
+
+        assert update(store, root) == {}  # nothing appended since
+        store.append("c", "final", session_log("c", "Python GIL"), day="2025-02-02")
+        assert [e["session_id"] for e in update(store, root)["2025-02"]] == ["c"]
+        assert shard_ids(root / "index") == ["a", "b", "c"]
+
+
+def test_legacy_logs_are_migrated_once_without_reindexing():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        day_dir = root / "session_logs" / "2024" / "11" / "20"
+        day_dir.mkdir(parents=True)
+        for session_id in ("old-indexed", "old-unindexed"):
+            (day_dir / f"{session_id}.json").write_text(json.dumps(session_log(session_id, session_id)), encoding="utf-8")
+        (day_dir / "old-indexed_steps.json").write_text(json.dumps([{"step": 0}, {"step": 1}]), encoding="utf-8")
+        index_base = root / "index"
+        index_base.mkdir()
+        # The old indexer's month file already holds one of them
+        (index_base / "2024-11.json").write_text(json.dumps([{"session_id": "old-indexed"}]), encoding="utf-8")
+
+        store = SessionStore(root / "store")
+        store.append("new", "final", session_log("new", "fresh"), day="2025-03-01")
+
+        new = update(store, root)
+        assert store.has("old-indexed") and store.has("old-unindexed")
+        assert store.steps("old-indexed") == [{"step": 0}, {"step": 1}]
+        assert [r["day"] for _, r in store.records() if r["session_id"].startswith("old")] == ["2024-11-20"] * 2
+        assert sorted(shard_ids(index_base)) == ["new", "old-unindexed"]
+        assert "2024-11" in new and "2025-03" in new
+
+        # Later updates neither migrate again nor re-append anything
+        through = load_meta(index_base)["legacy_through"]
+        assert update(store, root) == {}
+        assert store.last_id() == through
+        assert sorted(shard_ids(index_base)) == ["new", "old-unindexed"]
+
+
+if __name__ == "__main__":
+    test_cursor_reads_only_new_final_records()
+    test_legacy_logs_are_migrated_once_without_reindexing()
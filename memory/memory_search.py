@@ -1,16 +1,21 @@
 import json
 import random
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict
-from memory.memory_indexer import build_or_update_index, INDEX_BASE
+from typing import List, Dict, Optional
+from memory.memory_indexer import build_or_update_index, summary_entries, update_session_vectors, INDEX_BASE
+from memory.memory_vectors import SessionVectorIndex, get_vector_index
 from rapidfuzz import process, fuzz
+import numpy as np
 import re
-import spacy
-nlp = spacy.load("en_core_web_sm")
+from memory.ner import get_ner
+
+VECTOR_WEIGHT = 0.5  # share of the 0-100 score taken from embedding similarity; 0 is fuzzy-only
+VECTOR_CANDIDATES = 50  # nearest sessions taken from FAISS when no entity narrows the search
 
 def extract_named_entities(text: str) -> set:
-    doc = nlp(text)
-    return {ent.text.lower() for ent in doc.ents if ent.label_ in {"GPE", "ORG", "PERSON"}}
+    return set(get_ner().entities(text))
 
 def normalize_query(text: str) -> str:
     text = re.sub(r"query\s*\d+:\s*", "", text, flags=re.IGNORECASE)
@@ -19,66 +24,194 @@ def normalize_query(text: str) -> str:
     return text.lower().strip()
 
 
-class MemorySearch:
-    def __init__(self):
-        self.index_data = self.load_index()
+class MemoryIndex:
+    """Process-wide, in-memory view of the session summary index.
+
+    Entries are loaded once and then kept current incrementally: `refresh`
+    re-indexes session logs at most every `refresh_interval` seconds and
+    reads only what was appended to the month shards since, while
+    `add_session` takes a freshly saved session log right away. Queries are
+    scored with one vectorized `process.cdist` call; when the query names
+    entities, only entries sharing one of them (looked up in an inverted
+    index) are scored.
+
+    With a `vector_index`, the fuzzy score is blended with the cosine
+    similarity between the query and each session's query + summary
+    embedding, so paraphrases of past questions are found too. If the query
+    can't be embedded the search falls back to fuzzy scoring alone.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 30.0,
+        vector_index: Optional[SessionVectorIndex] = None,
+        vector_weight: float = VECTOR_WEIGHT,
+    ):
+        self.refresh_interval = refresh_interval
+        self.vector_index = vector_index
+        self.vector_weight = vector_weight if vector_index is not None else 0.0
+        self.entries: List[Dict] = []
+        self.normalized: List[str] = []
+        self.entity_index: Dict[str, List[int]] = {}   # entity -> positions in self.entries
+        self._positions: Dict[str, int] = {}           # session_id -> position in self.entries
+        self._file_state: Dict[Path, object] = {}       # legacy file -> (mtime, size); shard -> bytes read
+        self._last_refresh = float("-inf")
+        self._lock = threading.Lock()
+
+    def _add(self, entry: Dict) -> bool:
+        session_id = entry.get("session_id")
+        if session_id in self._positions:
+            return False
+        position = len(self.entries)
+        self._positions[session_id] = position
+        self.entries.append(entry)
+        self.normalized.append(entry.get("normalized_query") or normalize_query(entry.get("original_query") or ""))
+        for ent in set(entry.get("named_entities", [])):
+            self.entity_index.setdefault(ent, []).append(position)
+        return True
 
-    def load_index(self) -> List[Dict]:
-        build_or_update_index()  # Ensure latest index
-        all_entries = []
-        for index_file in sorted(INDEX_BASE.glob("*.json")):
+    def _load_file(self, index_file: Path) -> int:
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"[ERROR] Failed to read {index_file}: {e}")
+            return 0
+        return sum(self._add(e) for e in entries if isinstance(e, dict))
+
+    def _load_shard(self, shard: Path) -> int:
+        """Read what was appended to a JSONL month shard since the last call."""
+        offset = self._file_state.get(shard, 0)
+        with open(shard, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # a line still being written is picked up next time
+        self._file_state[shard] = offset + complete
+        added = 0
+        for line in data[:complete].decode("utf-8").splitlines():
             try:
-                with open(index_file, "r", encoding="utf-8") as f:
-                    entries = json.load(f)
-                    valid_entries = [e for e in entries if isinstance(e, dict)]
-                    all_entries.extend(valid_entries)
-            except Exception as e:
-                print(f"[ERROR] Failed to read {index_file}: {e}")
-        return all_entries
+                added += self._add(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return added
 
-    def search_memory(self, query: str, top_k: int = 3) -> List[Dict]:
-        if not self.index_data:
+    def refresh(self, force: bool = False) -> int:
+        """Pick up sessions logged since the last refresh; returns how many entries were added."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+            build_or_update_index()  # Ensure latest index
+            added = 0
+            for index_file in sorted(INDEX_BASE.glob("[!.]*.json")):
+                # Legacy month files are rewritten in place, so they are re-read when they change
+                stat = index_file.stat()
+                state = (stat.st_mtime_ns, stat.st_size)
+                if self._file_state.get(index_file) != state:
+                    added += self._load_file(index_file)
+                    self._file_state[index_file] = state
+            for shard in sorted(INDEX_BASE.glob("*.jsonl")):
+                added += self._load_shard(shard)
+            entries = list(self.entries)
+        if added and self.vector_index is not None:
+            update_session_vectors(entries, self.vector_index)  # catches up on sessions an earlier update missed
+        return added
+
+    def add_session(self, data: Dict) -> int:
+        """Index a just-saved session log without waiting for the next refresh."""
+        entries = summary_entries(data)
+        with self._lock:
+            added = sum(self._add(e) for e in entries)
+        if added and self.vector_index is not None:
+            update_session_vectors(entries, self.vector_index)
+        return added
+
+    def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        if self.vector_index is None or not len(self.vector_index) or self.vector_weight <= 0:
+            return None
+        try:
+            return self.vector_index.embed_query(query)
+        except Exception as e:
+            print(f"[WARN] Query embedding failed, using fuzzy scores only: {e}")
+            return None
+
+    def _similarities(self, query_vec: np.ndarray, positions: np.ndarray, everything: bool) -> np.ndarray:
+        """Cosine similarity of the query to the sessions at `positions`."""
+        if not everything:
+            return self.vector_index.similarity(query_vec, [self.entries[p]["session_id"] for p in positions])
+        # Whole history: only the FAISS nearest neighbours get a vector score
+        sims = np.zeros(len(positions), dtype=np.float32)
+        for session_id, score in self.vector_index.search(query_vec, VECTOR_CANDIDATES):
+            position = self._positions.get(session_id)
+            if position is not None:
+                sims[position] = score
+        return sims
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+        if not self.entries:
             return []
 
         norm_query = normalize_query(query)
         query_ents = extract_named_entities(query)
+        query_vec = self._embed_query(query)  # network call, kept outside the lock
 
-        def hybrid_score(q1, q2, named_ents):
-            score = fuzz.token_set_ratio(q1, q2)
-            if query_ents & set(named_ents):
-                score += 100  # NER boost
-            return score
-
-        candidates = [
-            (entry["normalized_query"], entry["named_entities"])
-            for entry in self.index_data
-        ]
-
-        scored = []
-        for i, (norm_candidate, candidate_ents) in enumerate(candidates):
-            score = hybrid_score(norm_query, norm_candidate, candidate_ents)
-            scored.append((score, i))
-
-        # Sort and filter by NER overlap
-        scored.sort(reverse=True)
-        top_matches = [
-            (score, i) for (score, i) in scored
-            if query_ents & set(self.index_data[i].get("named_entities", []))
-        ][:top_k]
-
-        if not top_matches:
-            top_matches = scored[:top_k]
-
-        return [
-            {
-                "score": score,
-                "session_id": self.index_data[i].get("session_id"),
-                "original_query": self.index_data[i].get("original_query"),
-                "summary_output": self.index_data[i].get("summary_output"),
-                "timestamp": self.index_data[i].get("timestamp")
-            }
-            for score, i in top_matches
-        ]
+        with self._lock:
+            # Entries sharing a named entity always outrank the rest, so score only those when there are any
+            boosted = sorted({i for ent in query_ents for i in self.entity_index.get(ent, ())})
+            if boosted:
+                positions = np.array(boosted)
+                choices = [self.normalized[i] for i in boosted]
+                bonus = 100  # NER boost
+            else:
+                positions = np.arange(len(self.entries))
+                choices = self.normalized
+                bonus = 0
+
+            scores = process.cdist([norm_query], choices, scorer=fuzz.token_set_ratio, dtype=np.float64)[0]
+            if query_vec is not None:
+                sims = self._similarities(query_vec, positions, everything=not boosted)
+                scores = (1 - self.vector_weight) * scores + self.vector_weight * 100 * np.clip(sims, 0, 1)
+            scores = scores + bonus
+            # Highest score first, later entries first on ties
+            order = np.lexsort((-positions, -scores))[:top_k]
+
+            return [
+                {
+                    "score": float(scores[j]),
+                    "session_id": self.entries[positions[j]].get("session_id"),
+                    "original_query": self.entries[positions[j]].get("original_query"),
+                    "summary_output": self.entries[positions[j]].get("summary_output"),
+                    "timestamp": self.entries[positions[j]].get("timestamp")
+                }
+                for j in order
+            ]
+
+
+_memory_index: Optional[MemoryIndex] = None
+_memory_index_lock = threading.Lock()
+
+
+def get_memory_index() -> MemoryIndex:
+    """The shared MemoryIndex for this process, refreshed if it is due."""
+    global _memory_index
+    with _memory_index_lock:
+        if _memory_index is None:
+            _memory_index = MemoryIndex(vector_index=get_vector_index())
+    _memory_index.refresh()
+    return _memory_index
+
+
+class MemorySearch:
+    def __init__(self, index: Optional[MemoryIndex] = None):
+        self.index = index or get_memory_index()
+
+    @property
+    def index_data(self) -> List[Dict]:
+        return self.index.entries
+
+    def search_memory(self, query: str, top_k: int = 3) -> List[Dict]:
+        return self.index.search(query, top_k)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory import memory_indexer, memory_search
+from memory.memory_search import MemoryIndex
+from memory.memory_vectors import SessionVectorIndex
+from memory.memory_vectors_test import FakeEmbed
+
+# Stand-in for spaCy: capitalised words after the first are entities
+fake_entities = lambda text: {w.lower() for w in text.split()[1:] if w[:1].isupper()}
+
+
+def entry(session_id: str, query: str, entities=(), summary: str = "") -> dict:
+    return {
+        "session_id": session_id,
+        "original_query": query,
+        "summary_output": summary or f"answer to {query}",
+        "timestamp": "t",
+        "named_entities": list(entities),
+    }
+
+
+def session_log(session_id: str, query: str) -> dict:
+    return {"session": {
+        "session_id": session_id,
+        "original_query": query,
+        "summarizer_snapshots": [{"summary_output": f"answer to {query}", "timestamp": "t"}],
+    }}
+
+
+class Patched:
+    """Points MemoryIndex at a scratch index directory with a counting, no-op indexer."""
+
+    def __init__(self, index_base: Path):
+        self.index_base = index_base
+        self.updates = 0
+
+    def build_or_update_index(self, *args, **kwargs):
+        self.updates += 1
+        return {}
+
+    def __enter__(self):
+        self.saved = (memory_search.build_or_update_index, memory_search.INDEX_BASE,
+                      memory_search.extract_named_entities, memory_indexer.extract_named_entities)
+        memory_search.build_or_update_index = self.build_or_update_index
+        memory_search.INDEX_BASE = self.index_base
+        memory_search.extract_named_entities = fake_entities
+        memory_indexer.extract_named_entities = lambda text: sorted(fake_entities(text))
+        return self
+
+    def __exit__(self, *exc):
+        (memory_search.build_or_update_index, memory_search.INDEX_BASE,
+         memory_search.extract_named_entities, memory_indexer.extract_named_entities) = self.saved
+
+
+def append_shard(path: Path, entries, torn: str = ""):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(e) + "\n" for e in entries) + torn)
+
+
+def test_refresh_respects_interval_and_reads_only_new_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        (base / "2025-01.json").write_text(json.dumps([entry("old", "legacy question")]), encoding="utf-8")
+        shard = base / "2025-02.jsonl"
+        append_shard(shard, [entry("a", "F22 engine")], torn='{"session_id": "b", "orig')
+
+        with Patched(base) as patched:
+            index = MemoryIndex(refresh_interval=3600)
+            assert index.refresh() == 2
+            assert [e["session_id"] for e in index.entries] == ["old", "a"]
+
+            with open(shard, "a", encoding="utf-8") as f:
+                f.write('inal_query": "Mars rover"}\n')
+            assert index.refresh() == 0  # not due yet
+            assert patched.updates == 1
+            assert index.refresh(force=True) == 1
+            assert patched.updates == 2
+            assert [e["session_id"] for e in index.entries] == ["old", "a", "b"]
+
+            # a rewritten legacy file is re-read; sessions already known are not duplicated
+            (base / "2025-01.json").write_text(
+                json.dumps([entry("old", "legacy question"), entry("new", "another question")]), encoding="utf-8")
+            assert index.refresh(force=True) == 1
+            assert len(index.entries) == 4
+
+            due = MemoryIndex(refresh_interval=0)
+            assert due.refresh() == 4 and due.refresh() == 0 and patched.updates == 5
+
+
+def test_add_session_is_incremental():
+    with tempfile.TemporaryDirectory() as tmp:
+        with Patched(Path(tmp)):
+            embed = FakeEmbed()
+            vectors = SessionVectorIndex(Path(tmp) / "vectors", embed=embed)
+            index = MemoryIndex(vector_index=vectors)
+            assert index.add_session(session_log("s1", "Tell me about Gensol")) == 1
+            assert index.add_session(session_log("s1", "Tell me about Gensol")) == 0
+            assert index.entries[0]["named_entities"] == ["gensol"]
+            assert index.entity_index == {"gensol": [0]}
+            # embedded into the index this MemoryIndex was given, once
+            assert vectors.sessions == ["s1"] and len(embed.texts) == 1
+            assert index.search("Gensol")[0]["session_id"] == "s1"
+
+
+def test_entity_index_limits_scoring_to_matching_sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        append_shard(base / "2025-03.jsonl", [
+            entry("e1", "Who founded Gensol", ["gensol"]),
+            entry("e2", "Who founded the company", []),
+            entry("e3", "Revenue of Gensol and BluSmart", ["gensol", "blusmart"]),
+        ])
+        with Patched(base):
+            index = MemoryIndex()
+            index.refresh(force=True)
+            assert index.entity_index == {"gensol": [0, 2], "blusmart": [2]}
+
+            results = index.search("Who founded Gensol", top_k=3)
+            # e2 reads closest after e1 but shares no entity, so it is not scored at all
+            assert [r["session_id"] for r in results] == ["e1", "e3"]
+            assert all(r["score"] >= 100 for r in results)
+
+            results = index.search("who founded the company", top_k=1)
+            assert results[0]["session_id"] == "e2" and results[0]["score"] == 100.0
+
+
+def test_vector_similarity_finds_paraphrases():
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        sessions = [
+            entry("engine", "F22 engine", summary="thrust"),
+            entry("rover", "Mars rover", summary="curiosity"),
+            entry("gil", "Python GIL", summary="threads"),
+        ]
+        append_shard(base / "2025-04.jsonl", sessions)
+        with Patched(base):
+            fuzzy = MemoryIndex()
+            fuzzy.refresh(force=True)
+
+            vectors = SessionVectorIndex(base / "vectors", embed=FakeEmbed())
+            blended = MemoryIndex(vector_index=vectors, vector_weight=0.5)
+            blended.refresh(force=True)
+            assert vectors.sessions == ["engine", "rover", "gil"]  # refresh catches the vectors up
+
+            query = "propulsion powerplant"
+            assert max(r["score"] for r in fuzzy.search(query, top_k=3)) < 50
+            top = blended.search(query, top_k=3)[0]
+            assert top["session_id"] == "engine" and top["score"] > 45
+
+            # an embedder outage falls back to fuzzy scores instead of failing the search
+            def down(texts):
+                raise ConnectionError("ollama down")
+            vectors.embed = down
+            assert blended.search("Mars rover", top_k=1)[0]["session_id"] == "rover"
+
+
+if __name__ == "__main__":
+    test_refresh_respects_interval_and_reads_only_new_lines()
+    test_add_session_is_incremental()
+    test_entity_index_limits_scoring_to_matching_sessions()
+    test_vector_similarity_finds_paraphrases()
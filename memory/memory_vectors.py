@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import requests
+
+EMBED_MODEL = "nomic-embed-text"
+OLLAMA_BASE_URL = "http://localhost:11434"
+VECTOR_DIR = Path("memory/session_vectors")
+EMBED_BATCH_SIZE = 32
+
+
+def session_text(entry: Dict) -> str:
+    """What gets embedded for a session: the question and what was found."""
+    return f"{entry.get('original_query') or ''}\n{entry.get('summary_output') or ''}".strip()
+
+
+def ollama_embed(texts: List[str], model: str = EMBED_MODEL, base_url: str = OLLAMA_BASE_URL) -> np.ndarray:
+    """Embed with Ollama's batched /api/embed, falling back to one /api/embeddings call per text."""
+    vectors: List[List[float]] = []
+    with requests.Session() as session:
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            response = session.post(f"{base_url}/api/embed", json={"model": model, "input": batch}, timeout=120)
+            if response.status_code in (404, 405):
+                for text in batch:
+                    one = session.post(f"{base_url}/api/embeddings", json={"model": model, "prompt": text}, timeout=120)
+                    one.raise_for_status()
+                    vectors.append(one.json()["embedding"])
+                continue
+            response.raise_for_status()
+            vectors.extend(response.json()["embeddings"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class SessionVectorIndex:
+    """FAISS inner-product index over unit-normalized session embeddings.
+
+    Vector i belongs to `self.sessions[i]`; both are appended to and saved
+    together (index.faiss, sessions.json), so adding sessions never
+    re-embeds the ones already stored.
+    """
+
+    def __init__(self, directory: Path = VECTOR_DIR, embed: Callable[[List[str]], np.ndarray] = ollama_embed):
+        self.directory = Path(directory)
+        self.embed = embed
+        self.index: Optional[faiss.Index] = None
+        self.sessions: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        index_file, sessions_file = self.directory / "index.faiss", self.directory / "sessions.json"
+        if index_file.exists() and sessions_file.exists():
+            index = faiss.read_index(str(index_file))
+            sessions = json.loads(sessions_file.read_text(encoding="utf-8"))
+            if index.ntotal == len(sessions):
+                self.index, self.sessions = index, sessions
+                self.positions = {s: i for i, s in enumerate(sessions)}
+            else:
+                print(f"[WARN] {index_file} and {sessions_file} disagree; rebuilding session vectors")
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def missing(self, entries: Iterable[Dict]) -> List[Dict]:
+        seen, todo = set(), []
+        for entry in entries:
+            session_id = entry.get("session_id")
+            if session_id and session_id not in self.positions and session_id not in seen:
+                seen.add(session_id)
+                todo.append(entry)
+        return todo
+
+    def add(self, entries: Iterable[Dict]) -> int:
+        """Embed and store the sessions not indexed yet; returns how many were added."""
+        todo = self.missing(entries)
+        if not todo:
+            return 0
+        vectors = self._unit(self.embed([session_text(e) for e in todo]))
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(vectors.shape[1])
+            self.index.add(vectors)
+            for entry in todo:
+                self.positions[entry["session_id"]] = len(self.sessions)
+                self.sessions.append(entry["session_id"])
+            self._save()
+        return len(todo)
+
+    def _save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_index = self.directory / "index.faiss.tmp"
+        tmp_sessions = self.directory / "sessions.json.tmp"
+        faiss.write_index(self.index, str(tmp_index))
+        tmp_sessions.write_text(json.dumps(self.sessions), encoding="utf-8")
+        os.replace(tmp_index, self.directory / "index.faiss")
+        os.replace(tmp_sessions, self.directory / "sessions.json")
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._unit(self.embed([query]))
+
+    def search(self, query_vec: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Top-k (session_id, cosine similarity)."""
+        with self._lock:
+            if self.index is None or not self.sessions:
+                return []
+            scores, ids = self.index.search(query_vec, min(k, len(self.sessions)))
+        return [(self.sessions[i], float(s)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+    def similarity(self, query_vec: np.ndarray, session_ids: List[str]) -> np.ndarray:
+        """Cosine similarity to each of `session_ids`; 0 for sessions without a vector."""
+        out = np.zeros(len(session_ids), dtype=np.float32)
+        with self._lock:
+            known = [(j, self.positions[s]) for j, s in enumerate(session_ids) if s in self.positions]
+            if known:
+                vectors = self.index.reconstruct_batch(np.array([p for _, p in known], dtype=np.int64))
+                out[[j for j, _ in known]] = vectors @ query_vec[0]
+        return out
+
+
+_vector_index: Optional[SessionVectorIndex] = None
+_vector_lock = threading.Lock()
+
+
+def get_vector_index() -> SessionVectorIndex:
+    """The shared SessionVectorIndex for this process."""
+    global _vector_index
+    with _vector_lock:
+        if _vector_index is None:
+            _vector_index = SessionVectorIndex()
+        return _vector_index
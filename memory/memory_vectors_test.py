@@ -0,0 +1,98 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory.memory_vectors import SessionVectorIndex, session_text
+
+# Each word votes for a topic, so paraphrases land on the same direction
+TOPICS = {
+    "engine": 0, "thrust": 0, "propulsion": 0, "powerplant": 0,
+    "rover": 1, "mars": 1, "curiosity": 1,
+    "python": 2, "gil": 2, "threads": 2,
+}
+
+
+class FakeEmbed:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        out = np.full((len(texts), 4), 0.01, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, TOPICS.get(word.strip("?.,"), 3)] += 1
+        return out
+
+
+def entry(session_id: str, query: str, summary: str = "") -> dict:
+    return {"session_id": session_id, "original_query": query, "summary_output": summary}
+
+
+def test_add_embeds_only_new_sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        embed = FakeEmbed()
+        index = SessionVectorIndex(Path(tmp), embed=embed)
+        assert index.add([entry("a", "F22 engine", "thrust figures"), entry("b", "Mars rover")]) == 2
+        assert embed.texts == ["F22 engine\nthrust figures", "Mars rover"]
+
+        # repeats, in the same batch or already stored, are not embedded again
+        assert index.add([entry("a", "F22 engine"), entry("c", "Python GIL"), entry("c", "Python GIL")]) == 1
+        assert embed.texts[-1] == "Python GIL" and len(embed.texts) == 3
+        assert index.sessions == ["a", "b", "c"]
+        assert session_text({"original_query": None, "summary_output": "only"}) == "only"
+
+
+def test_search_and_similarity_use_cosine():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SessionVectorIndex(Path(tmp), embed=FakeEmbed())
+        assert index.search(index.embed_query("anything"), 3) == []
+        index.add([entry("a", "F22 engine"), entry("b", "Mars rover"), entry("c", "Python GIL")])
+
+        query = index.embed_query("what propulsion powerplant")
+        hits = index.search(query, 5)
+        assert hits[0][0] == "a" and len(hits) == 3
+        assert 0.9 < hits[0][1] <= 1.0001
+
+        sims = index.similarity(query, ["b", "unknown", "a"])
+        assert sims[1] == 0.0
+        assert sims[2] == max(sims) and np.isclose(sims[2], hits[0][1])
+
+
+def test_reload_keeps_vectors():
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionVectorIndex(Path(tmp), embed=FakeEmbed()).add([entry("a", "F22 engine"), entry("b", "Mars rover")])
+        embed = FakeEmbed()
+        reopened = SessionVectorIndex(Path(tmp), embed=embed)
+        assert reopened.sessions == ["a", "b"] and reopened.positions == {"a": 0, "b": 1}
+        assert reopened.add([entry("a", "F22 engine")]) == 0 and embed.texts == []
+        assert not list(Path(tmp).glob("*.tmp"))
+
+
+def test_mismatched_files_are_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionVectorIndex(Path(tmp), embed=FakeEmbed()).add([entry("a", "F22 engine"), entry("b", "Mars rover")])
+        # a crash between the two renames: sessions.json names a session index.faiss lacks
+        (Path(tmp) / "sessions.json").write_text(json.dumps(["a", "b", "c"]), encoding="utf-8")
+
+        embed = FakeEmbed()
+        index = SessionVectorIndex(Path(tmp), embed=embed)
+        assert index.index is None and len(index) == 0 and index.positions == {}
+
+        assert index.add([entry("a", "F22 engine"), entry("b", "Mars rover"), entry("c", "Python GIL")]) == 3
+        assert len(embed.texts) == 3
+        assert faiss.read_index(str(Path(tmp) / "index.faiss")).ntotal == 3
+        assert SessionVectorIndex(Path(tmp), embed=FakeEmbed()).sessions == ["a", "b", "c"]
+
+
+if __name__ == "__main__":
+    test_add_embeds_only_new_sessions()
+    test_search_and_similarity_use_cosine()
+    test_reload_keeps_vectors()
+    test_mismatched_files_are_rebuilt()
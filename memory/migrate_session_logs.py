@@ -0,0 +1,46 @@
+"""Move legacy per-session JSON logs into the append-only session store.
+
+Reads memory/session_logs/YYYY/MM/DD/<session_id>.json (final plans) and
+<session_id>_steps.json (step lists) and appends them to the session store
+under the same day. Sessions already in the store are skipped, so the tool
+can be re-run safely. The memory indexer does the same once on its first
+update; run this by hand to compress the migrated records or delete the
+legacy files. Run from the repository root:
+
+    python memory/migrate_session_logs.py [--compress] [--delete]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory.memory_indexer import LOGS_BASE, migrate_legacy_logs
+from memory.session_store import SESSION_STORE_DIR, SessionStore
+
+
+def store_size(store_dir: Path) -> int:
+    return sum(p.stat().st_size for p in store_dir.rglob("*.jsonl*"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=Path, default=LOGS_BASE)
+    parser.add_argument("--store", type=Path, default=SESSION_STORE_DIR)
+    parser.add_argument("--compress", action="store_true", help="zstd-compress the migrated records")
+    parser.add_argument("--delete", action="store_true", help="remove each legacy file once it is in the store")
+    args = parser.parse_args()
+
+    store = SessionStore(args.store, compress=args.compress)
+    before = store_size(args.store)
+    counts = migrate_legacy_logs(store, args.logs, delete=args.delete)
+    after = store_size(args.store) - before
+
+    print(f"{counts['files']} legacy files: {counts['migrated']} migrated, "
+          f"{counts['skipped']} already in the store, {counts['failed']} unreadable")
+    if counts["migrated"]:
+        print(f"{counts['bytes'] / 1e6:.2f} MB of JSON -> {after / 1e6:.2f} MB appended to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+NER_MODEL = "en_core_web_sm"
+ENTITY_LABELS = {"GPE", "ORG", "PERSON"}
+# Only the entity recognizer is needed; en_core_web_sm's ner has its own tok2vec
+DISABLED_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+NER_CACHE = Path("memory/ner_cache.sqlite")
+
+
+class NERService:
+    """Named entities for memory queries, shared by the indexer and search.
+
+    The spaCy model is loaded on first use, once per process, with every
+    component but `ner` disabled. Results (all entities with their labels)
+    are stored in SQLite keyed by sha256(model, text), so a text is only ever
+    run through the model once; cache misses in a batch go through
+    `nlp.pipe` together.
+    """
+
+    def __init__(self, model: str = NER_MODEL, cache_path: Path = NER_CACHE, batch_size: int = 64):
+        self.model = model
+        self.cache_path = Path(cache_path)
+        self.batch_size = batch_size
+        self._nlp = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            with self._load_lock:
+                if self._nlp is None:
+                    import spacy
+                    self._nlp = spacy.load(self.model, disable=DISABLED_PIPES)
+        return self._nlp
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entities (hash TEXT PRIMARY KEY, ents TEXT NOT NULL) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _cached(self, keys: List[str]) -> Dict[str, list]:
+        found = {}
+        with self._lock:
+            db = self._db()
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = db.execute(
+                    f"SELECT hash, ents FROM entities WHERE hash IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update((h, json.loads(ents)) for h, ents in rows)
+        return found
+
+    def _store(self, results: Dict[str, list]):
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO entities(hash, ents) VALUES (?, ?)",
+                [(h, json.dumps(ents)) for h, ents in results.items()],
+            )
+            db.commit()
+
+    def entities_many(self, texts: Iterable[str], labels: Optional[set] = ENTITY_LABELS) -> List[List[str]]:
+        """Lower-cased entities of each text, in order, restricted to `labels` (None for all)."""
+        texts = list(texts)
+        if not texts:
+            return []
+        keys = [self._key(t) for t in texts]
+        found = self._cached(list(set(keys)))
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            fresh = {
+                k: [[ent.text, ent.label_] for ent in doc.ents]
+                for k, doc in zip(missing, self.nlp.pipe(missing.values(), batch_size=self.batch_size))
+            }
+            self._store(fresh)
+            found.update(fresh)
+        return [
+            [text.lower() for text, label in found[k] if labels is None or label in labels]
+            for k in keys
+        ]
+
+    def entities(self, text: str, labels: Optional[set] = ENTITY_LABELS) -> List[str]:
+        return self.entities_many([text], labels)[0]
+
+
+_ner: Optional[NERService] = None
+_ner_lock = threading.Lock()
+
+
+def get_ner() -> NERService:
+    """The shared NERService for this process; the model itself loads on first use."""
+    global _ner
+    with _ner_lock:
+        if _ner is None:
+            _ner = NERService()
+        return _ner
@@ -0,0 +1,116 @@
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory import ner
+from memory.ner import DISABLED_PIPES, NERService
+
+# Labels the stub recognizer hands out, by token
+LABELS = {"Gensol": "ORG", "Delhi": "GPE", "Anmol": "PERSON", "Monday": "DATE"}
+
+
+class StubNLP:
+    """Tags known words; counts how many texts go through `pipe`."""
+
+    def __init__(self):
+        self.piped = []
+
+    def pipe(self, texts, batch_size=64):
+        for text in texts:
+            self.piped.append(text)
+            ents = [SimpleNamespace(text=w, label_=LABELS[w]) for w in text.split() if w in LABELS]
+            yield SimpleNamespace(ents=ents)
+
+
+class StubSpacy:
+    def __init__(self):
+        self.loads = []
+        self.nlp = StubNLP()
+
+    def load(self, model, disable=()):
+        self.loads.append((model, list(disable)))
+        return self.nlp
+
+
+def with_spacy(fn):
+    """Run `fn(spacy)` with a stub spacy module importable under that name."""
+    stub = StubSpacy()
+    saved = sys.modules.get("spacy")
+    sys.modules["spacy"] = stub
+    try:
+        fn(stub)
+    finally:
+        if saved is None:
+            del sys.modules["spacy"]
+        else:
+            sys.modules["spacy"] = saved
+
+
+def test_model_loads_lazily_and_once():
+    def check(spacy):
+        with tempfile.TemporaryDirectory() as tmp:
+            service = NERService(cache_path=Path(tmp) / "ner.sqlite")
+            assert spacy.loads == []
+            assert service.entities_many([]) == []
+            assert spacy.loads == []  # nothing to recognise, nothing loaded
+
+            assert service.entities("Gensol opened in Delhi") == ["gensol", "delhi"]
+            assert service.entities("Anmol on Monday") == ["anmol"]  # DATE is not an entity label here
+            assert service.entities("Anmol on Monday", labels=None) == ["anmol", "monday"]
+            assert spacy.loads == [("en_core_web_sm", DISABLED_PIPES)]
+
+    with_spacy(check)
+
+
+def test_cached_texts_skip_the_model():
+    def check(spacy):
+        with tempfile.TemporaryDirectory() as tmp:
+            service = NERService(cache_path=Path(tmp) / "ner.sqlite")
+            texts = ["Gensol in Delhi", "Anmol", "Gensol in Delhi"]
+            assert service.entities_many(texts) == [["gensol", "delhi"], ["anmol"], ["gensol", "delhi"]]
+            assert spacy.nlp.piped == ["Gensol in Delhi", "Anmol"]  # duplicates go through once
+
+            assert service.entities_many(["Anmol", "Delhi", "Gensol in Delhi"]) == [["anmol"], ["delhi"], ["gensol", "delhi"]]
+            assert spacy.nlp.piped == ["Gensol in Delhi", "Anmol", "Delhi"]  # only the miss
+
+    with_spacy(check)
+
+
+def test_cache_survives_restart():
+    def check(spacy):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ner.sqlite"
+            NERService(cache_path=path).entities_many(["Gensol in Delhi", "Anmol"])
+            spacy.nlp.piped.clear()
+            spacy.loads.clear()
+
+            restarted = NERService(cache_path=path)
+            assert restarted.entities_many(["Anmol", "Gensol in Delhi"]) == [["anmol"], ["gensol", "delhi"]]
+            assert spacy.nlp.piped == [] and spacy.loads == []  # served from SQLite, model never loaded
+
+            # the key includes the model, so another model doesn't reuse these results
+            other = NERService(model="en_core_web_lg", cache_path=path)
+            other.entities("Anmol")
+            assert spacy.loads == [("en_core_web_lg", DISABLED_PIPES)] and spacy.nlp.piped == ["Anmol"]
+
+    with_spacy(check)
+
+
+def test_get_ner_is_shared():
+    saved = ner._ner
+    ner._ner = None
+    try:
+        assert ner.get_ner() is ner.get_ner()
+        assert ner.get_ner()._nlp is None  # constructing the service doesn't load the model
+    finally:
+        ner._ner = saved
+
+
+if __name__ == "__main__":
+    test_model_loads_lazily_and_once()
+    test_cached_texts_skip_the_model()
+    test_cache_survives_restart()
+    test_get_ner_is_shared()
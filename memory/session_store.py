@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # compression is optional
+    zstandard = None
+
+SESSION_STORE_DIR = Path("memory/session_store")
+COMPRESS = False  # zstd-compress new records (needs the zstandard package)
+
+
+class SessionStore:
+    """Append-only session log store: daily JSONL segments plus a SQLite index.
+
+    Every record (a session's final plan, or one step) is one compact JSON
+    line appended to `<base>/YYYY/MM/YYYY-MM-DD.jsonl`, or an independent
+    zstd frame in `...jsonl.zst` when `compress` is on. Nothing is ever
+    rewritten. `index.sqlite` maps each record to its segment, byte offset
+    and length, indexed by session_id and by day, so a session is read with
+    one seek and new records are found without listing directories.
+
+    Appends take SQLite's write lock first, so concurrent writers (threads
+    or processes) never interleave within a segment.
+    """
+
+    def __init__(self, base_dir: Path = SESSION_STORE_DIR, compress: bool = COMPRESS):
+        if compress and zstandard is None:
+            raise ImportError("Compressed session logs need the zstandard package: pip install zstandard")
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.base_dir / "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                day TEXT NOT NULL,
+                path TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_session ON records(session_id, kind);
+            CREATE INDEX IF NOT EXISTS records_day ON records(day);
+            """
+        )
+
+    # ── writes ───────────────────────────────────────────────────
+
+    def _segment(self, day: str) -> Path:
+        year, month, _ = day.split("-")
+        suffix = ".jsonl.zst" if self.compress else ".jsonl"
+        return Path(year) / month / f"{day}{suffix}"
+
+    def _encode(self, record: Dict) -> bytes:
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        return zstandard.ZstdCompressor().compress(line) if self.compress else line
+
+    def append(self, session_id: str, kind: str, data: Dict, day: Optional[str] = None) -> int:
+        """Append one record; returns its id, which increases with every append."""
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        relative = self._segment(day)
+        payload = self._encode({"session_id": session_id, "kind": kind, "day": day, "data": data})
+        path = self.base_dir / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                with open(path, "ab") as f:
+                    offset = f.tell()
+                    f.write(payload)
+                record_id = self._conn.execute(
+                    "INSERT INTO records(session_id, kind, day, path, offset, length) VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, kind, day, relative.as_posix(), offset, len(payload)),
+                ).lastrowid
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return record_id
+
+    # ── reads ────────────────────────────────────────────────────
+
+    def _read(self, path: str, offset: int, length: int) -> Dict:
+        with open(self.base_dir / path, "rb") as f:
+            f.seek(offset)
+            return self._decode(path, f.read(length))
+
+    @staticmethod
+    def _decode(path: str, payload: bytes) -> Dict:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise ImportError(f"{path} is zstd-compressed; install the zstandard package to read it")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return json.loads(payload)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, session_id: str, kind: str = "final") -> Optional[Dict]:
+        """Data of the latest `kind` record for a session."""
+        rows = self._query(
+            "SELECT path, offset, length FROM records WHERE session_id = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+            (session_id, kind),
+        )
+        return self._read(*rows[0])["data"] if rows else None
+
+    def steps(self, session_id: str) -> List[Dict]:
+        rows = self._query(
+            "SELECT path, offset, length FROM records WHERE session_id = ? AND kind = 'step' ORDER BY id", (session_id,)
+        )
+        return [self._read(*row)["data"] for row in rows]
+
+    def has(self, session_id: str, kind: str = "final") -> bool:
+        return bool(self._query("SELECT 1 FROM records WHERE session_id = ? AND kind = ? LIMIT 1", (session_id, kind)))
+
+    def records(self, kind: str = "final", day: Optional[str] = None, after_id: int = 0) -> Iterator[Tuple[int, Dict]]:
+        """(id, record) in append order, optionally for one day and/or after a known id.
+
+        Cost is proportional to the records returned: the id range comes
+        straight from the primary key and consecutive records in the same
+        segment are read through one open file.
+        """
+        sql = "SELECT id, path, offset, length FROM records WHERE id > ? AND kind = ?"
+        params: tuple = (after_id, kind)
+        if day is not None:
+            sql += " AND day = ?"
+            params += (day,)
+        current, f = None, None
+        try:
+            for record_id, path, offset, length in self._query(sql + " ORDER BY id", params):
+                if path != current:
+                    if f is not None:
+                        f.close()
+                    current, f = path, open(self.base_dir / path, "rb")
+                f.seek(offset)
+                yield record_id, self._decode(path, f.read(length))
+        finally:
+            if f is not None:
+                f.close()
+
+    def last_id(self) -> int:
+        return self._query("SELECT COALESCE(MAX(id), 0) FROM records")[0][0]
+
+_stores: Dict[str, SessionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_session_store(base_dir: Path = SESSION_STORE_DIR) -> SessionStore:
+    """One SessionStore per directory in this process."""
+    key = str(Path(base_dir).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SessionStore(base_dir)
+        return _stores[key]
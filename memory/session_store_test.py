@@ -0,0 +1,151 @@
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from memory import session_store
+from memory.session_store import SessionStore
+from utils.utils import append_step_log, save_final_plan
+
+
+def test_append_and_read_back_by_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp))
+        store.append("s1", "step", {"n": 1})
+        store.append("s2", "final", {"answer": "other"})
+        store.append("s1", "step", {"n": 2})
+        store.append("s1", "final", {"answer": "draft"})
+        store.append("s1", "final", {"answer": "done"})
+
+        assert store.get("s1") == {"answer": "done"}  # latest final wins
+        assert store.steps("s1") == [{"n": 1}, {"n": 2}]
+        assert store.has("s2") and not store.has("s2", "step") and not store.has("s3")
+        assert store.get("s3") is None
+
+
+def test_days_get_their_own_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp))
+        first = store.append("a", "final", {"i": 0}, day="2025-01-31")
+        store.append("b", "final", {"i": 1}, day="2025-02-01")
+        store.append("c", "final", {"i": 2}, day="2025-02-01")
+        store.append("c", "step", {"i": 3}, day="2025-02-01")
+
+        assert (Path(tmp) / "2025/01/2025-01-31.jsonl").exists()
+        lines = (Path(tmp) / "2025/02/2025-02-01.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["session_id"] for line in lines] == ["b", "c", "c"]
+
+        assert [r["data"]["i"] for _, r in store.records(day="2025-02-01")] == [1, 2]
+        assert [r["session_id"] for _, r in store.records(after_id=first)] == ["b", "c"]
+        assert [r["data"]["i"] for _, r in store.records("step")] == [3]
+        assert store.last_id() == 4
+
+
+def test_reopened_store_keeps_appending():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp))
+        store.append("s1", "final", {"answer": 1}, day="2025-03-01")
+        store._conn.close()
+
+        reopened = SessionStore(Path(tmp))
+        assert reopened.get("s1") == {"answer": 1}
+        assert reopened.append("s2", "final", {"answer": 2}, day="2025-03-01") == 2
+        assert [r["session_id"] for _, r in reopened.records()] == ["s1", "s2"]
+
+
+def test_concurrent_writers_never_interleave():
+    with tempfile.TemporaryDirectory() as tmp:
+        writers = [SessionStore(Path(tmp)), SessionStore(Path(tmp))]  # two connections, as two processes would have
+
+        def write(store, name):
+            for i in range(50):
+                store.append(name, "step", {"i": i, "pad": "x" * 500}, day="2025-04-01")
+
+        threads = [threading.Thread(target=write, args=(w, f"w{n}")) for n, w in enumerate(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        reader = SessionStore(Path(tmp))
+        for name in ("w0", "w1"):
+            assert [step["i"] for step in reader.steps(name)] == list(range(50))
+        lines = (Path(tmp) / "2025/04/2025-04-01.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 100 and all(json.loads(line)["kind"] == "step" for line in lines)
+
+
+def test_append_waits_for_another_writers_lock():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp))
+        other = sqlite3.connect(str(Path(tmp) / "index.sqlite"), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        writer = threading.Thread(target=store.append, args=("s1", "final", {"ok": True}))
+        writer.start()
+        time.sleep(0.2)
+        assert writer.is_alive()  # blocked on the write lock, nothing written yet
+        assert not any(Path(tmp).rglob("*.jsonl"))
+        other.execute("COMMIT")
+        writer.join(5)
+        assert store.get("s1") == {"ok": True}
+        other.close()
+
+
+def test_compression_without_zstandard():
+    original = session_store.zstandard
+    session_store.zstandard = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                SessionStore(Path(tmp), compress=True)
+            except ImportError as e:
+                assert "zstandard" in str(e)
+            else:
+                raise AssertionError("compress=True accepted without zstandard")
+
+            store = SessionStore(Path(tmp))  # uncompressed logs still work
+            store.append("s1", "final", {"ok": True})
+            assert store.get("s1") == {"ok": True}
+            try:
+                SessionStore._decode("2025/01/2025-01-01.jsonl.zst", b"\x28\xb5\x2f\xfd")
+            except ImportError as e:
+                assert "zstandard" in str(e)
+            else:
+                raise AssertionError("read a .zst segment without zstandard")
+    finally:
+        session_store.zstandard = original
+
+
+def test_compressed_round_trip():
+    if session_store.zstandard is None:
+        return  # optional dependency not installed
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp), compress=True)
+        store.append("s1", "final", {"answer": "zstd"}, day="2025-05-01")
+        assert (Path(tmp) / "2025/05/2025-05-01.jsonl.zst").exists()
+        assert SessionStore(Path(tmp)).get("s1") == {"answer": "zstd"}
+
+
+def test_session_logs_go_through_the_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        append_step_log("s1", {"step": 0}, base_dir=tmp)
+        save_final_plan("s1", {"status": "success"}, base_dir=tmp)
+        store = session_store.get_session_store(Path(tmp))
+        assert store.steps("s1") == [{"step": 0}]
+        assert store.get("s1") == {"status": "success"}
+        store._conn.close()
+
+
+if __name__ == "__main__":
+    test_append_and_read_back_by_session()
+    test_days_get_their_own_segments()
+    test_reopened_store_keeps_appending()
+    test_concurrent_writers_never_interleave()
+    test_append_waits_for_another_writers_lock()
+    test_compression_without_zstandard()
+    test_compressed_round_trip()
+    test_session_logs_go_through_the_store()
@@ -1,7 +1,6 @@
 import os
 import json
 import uuid
-import time
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
@@ -33,7 +32,6 @@ class Perception:
         try:
             log_step("[SENDING PROMPT TO PERCEPTION...]", symbol="→")
             # import pdb; pdb.set_trace()
-            time.sleep(2)
             response = await self.model.generate_text(
                 prompt=full_prompt
             )
@@ -1,10 +1,10 @@
 
 import os
 import json
+import asyncio
 from pathlib import Path
 from utils.utils import log_step, log_error, log_json_block
 from google.genai.errors import ServerError
-import time
 from utils.utils import log_step, log_error, save_final_plan
 from agent.agentSession import SummarizerSnapshot
 from typing import Any, Literal, Optional
@@ -12,6 +12,7 @@ from agent.agentSession import AgentSession
 import uuid
 from datetime import datetime
 from agent.model_manager import ModelManager
+from memory.memory_search import get_memory_index
 
 
 class Summarizer:
@@ -32,7 +33,6 @@ class Summarizer:
             )
 
             log_step("[SENDING PROMPT TO SUMMARIZER...]")
-            time.sleep(2)
             response = await self.model.generate_text(
                 prompt=full_prompt
             )
@@ -97,7 +97,7 @@ class Summarizer:
 
         print("\n🔚 Final Summary:\n", summary)
         session.mark_complete(session.perception_snapshots[-1], final_answer=summary)
-        save_final_plan(ctx.session_id, {
+        final_data = {
             "context": ctx.get_context_snapshot(),
             "session": session.to_json(),
             "status": "success",
@@ -106,6 +106,9 @@ class Summarizer:
             "timestamp": datetime.utcnow().isoformat(),
             "original_query": ctx.original_query,
             "final_summary": session.final_summary,
-        })
+        }
+        save_final_plan(ctx.session_id, final_data)
+        # searchable by the next run without a re-index; NER/embedding run off the event loop
+        await asyncio.to_thread(lambda: get_memory_index().add_session(final_data))
 
         return summary
\ No newline at end of file
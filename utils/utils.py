@@ -145,6 +145,7 @@ import json
 from pathlib import Path
 from datetime import datetime
 from rich import print
+from memory.session_store import SESSION_STORE_DIR, get_session_store
 
 def get_log_folder(session_id: str, base_dir: str = "memory/session_logs") -> Path:
     now = datetime.now()
@@ -158,21 +159,11 @@ def save_json_log(obj: dict, path: Path):
         json.dump(obj, f, indent=2)
     print(f"\n\n[green]📝 Saved JSON log:[/green] {path}\n")
 
-def append_step_log(session_id: str, step_data: dict, base_dir: str = "memory/session_logs"):
-    folder = get_log_folder(session_id, base_dir)
-    step_path = folder / f"{session_id}_steps.json"
-    if step_path.exists():
-        with open(step_path, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    else:
-        logs = []
-
-    logs.append(step_data)
-    with open(step_path, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=2)
-    print(f"[cyan]🔄 Step log updated:[/cyan] {step_path}")
-
-def save_final_plan(session_id: str, final_data: dict, base_dir: str = "memory/session_logs"):
-    folder = get_log_folder(session_id, base_dir)
-    plan_path = folder / f"{session_id}.json"
-    save_json_log(final_data, plan_path)
\ No newline at end of file
+def append_step_log(session_id: str, step_data: dict, base_dir: str = str(SESSION_STORE_DIR)):
+    # One appended line per step instead of re-reading and rewriting the whole steps file
+    get_session_store(base_dir).append(session_id, "step", step_data)
+    print(f"[cyan]🔄 Step log appended:[/cyan] {session_id}")
+
+def save_final_plan(session_id: str, final_data: dict, base_dir: str = str(SESSION_STORE_DIR)):
+    get_session_store(base_dir).append(session_id, "final", final_data)
+    print(f"\n\n[green]📝 Saved session log:[/green] {session_id}\n")
\ No newline at end of file